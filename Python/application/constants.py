@@ -2,4 +2,47 @@
 class Constants:
     MIN_HEIGHT = 0.5
     MAX_HEIGHT = 3.0
-    LANDING_HEIGHT = 0.05
\ No newline at end of file
+    LANDING_HEIGHT = 0.05
+    MIN_SEPARATION = 0.15
+    PREFLIGHT_SAMPLE_RATE = 100
+
+    # Memory write chunks kept in flight per drone, needs the windowed writes from cflib_mods/mem.py
+    MEMORY_WRITE_WINDOW = 4
+
+    # Seconds a single drone may take to connect before the sequence is cancelled
+    CONNECT_TIMEOUT = 30.0
+
+    # Time the takeoff may take, on top of the planned transition time when moving to the starting positions
+    TAKEOFF_DEADLINE = 10.0
+
+    # Period of the telemetry log block every connected drone streams
+    TELEMETRY_PERIOD_MS = 100
+
+    # Write the telemetry of every show to ./recordings
+    RECORD_FLIGHTS = True
+
+    # Trace the phases & drone steps of every show, written to ./recordings as a Chrome trace
+    TRACE_SHOWS = True
+
+    # Uploads running at the same time on each radio channel
+    UPLOADS_PER_CHANNEL = 4
+
+    # Send the lighthouse data once per channel over the broadcast links, instead of once per drone
+    BROADCAST_BASE_STATIONS = True
+    BROADCAST_REPEATS = 3
+    BROADCAST_SETTLE_TIME = 0.1
+
+    # Pose changes of a base station that count as tracking noise, in meters & rotation matrix units
+    BASE_STATION_POSITION_TOLERANCE = 0.01
+    BASE_STATION_ROTATION_TOLERANCE = 0.01
+
+    # Distance kept between drones while moving from takeoff to their starting positions
+    TRANSITION_SEPARATION = 0.3
+
+    # Dynamic limits the uploaded trajectories are checked against
+    MAX_TRAJECTORY_SPEED = 2.0
+    MAX_TRAJECTORY_ACCELERATION = 5.0
+
+    # Volume covered by the lighthouse base stations
+    ARENA_MIN = (-2.5, -2.5, 0.0)
+    ARENA_MAX = (2.5, 2.5, MAX_HEIGHT)
\ No newline at end of file
@@ -1,4 +1,6 @@
 from .applicationController import ApplicationController
 from .baseStationController import BaseStationController
 from .sequenceController import SequenceController
-from .swarmController import SwarmController
\ No newline at end of file
+from .swarmController import SwarmController
+from .uploadScheduler import UploadScheduler
+from .geometryDistributor import GeometryDistributor
\ No newline at end of file
@@ -5,6 +5,7 @@ import cflib.crtp
 from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 
 from application.model import SequenceTestMode
+from application.simulation import SimulatedSwarm, SimulatedLinkDriver
 from application.util import dialogUtil, threadUtil, exceptionUtil, Logger
 from .sequenceController import SequenceController
 from .baseStationController import BaseStationController
@@ -75,6 +76,11 @@ class ApplicationController(QObject):
     def initializeSwarm(self):
         os.environ["USE_CFLINK"] = "cpp"
         cflib.crtp.init_drivers()
+
+        # Virtual drones on sim:// links instead of the radios, if DRONE_SIMULATION is set
+        SimulatedSwarm.CURRENT = SimulatedSwarm.fromEnvironment()
+        if SimulatedSwarm.CURRENT is not None:
+            SimulatedLinkDriver.register()
         self.swarmController = SwarmController(self, self.appSettings)
 
 
@@ -115,6 +121,7 @@ class ApplicationController(QObject):
 
         if self.sequenceController.selectSequence(index):
             self.sequenceSelected.emit()
+            threadUtil.runInBackground(self.sequenceController.preflightCheck, SequenceController.CURRENT)
             # self.resetTestMode.emit()
 
     def removeSequence(self, index):
@@ -316,7 +323,7 @@ class ApplicationController(QObject):
             self.mainWindow.showStatusMessage("No drones found!")
             return
 
-        self.swarmController.parallel(lambda drone: drone.checkBatteryLevel(), self.swarmController.availableDrones)
+        self.swarmController.parallel(lambda drone: drone.checkBatteryLevel(), self.swarmController.availableDrones, phase="battery")
         self.swarmUpdated.emit()
 
     @property
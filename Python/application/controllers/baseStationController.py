@@ -3,7 +3,9 @@ import time
 from cflib.crazyflie.mem import LighthouseBsGeometry
 
 from application.common.exceptions import VRException
-from application.util import exceptionUtil, transformUtil
+from application.constants import Constants
+from application.model import GeometryCache
+from application.util import exceptionUtil, transformUtil, Logger
 
 
 class BaseStation():
@@ -11,6 +13,7 @@ class BaseStation():
     def __init__(self, index, vrSystem):
         self.index = index
         self.vrSystem = vrSystem
+        self.serial = vrSystem.getStringTrackedDeviceProperty(index, openvr.Prop_SerialNumber_String)
         self.positionGeometry = LighthouseBsGeometry()
         self.initialized = False
         self.initialize()
@@ -41,8 +44,39 @@ class BaseStationController():
     def __init__(self, appController):
         self.appController = appController
         self.baseStations = []
+        self.geometryCache = GeometryCache(positionTolerance=Constants.BASE_STATION_POSITION_TOLERANCE,
+                                           rotationTolerance=Constants.BASE_STATION_ROTATION_TOLERANCE)
         self.connectToBaseStations()
 
+        # Base stations moved since the last session, or since the drones last got the geometry
+        self.movedStations = set(self.geometryCache.update(self.stationGeometries))
+        if len(self.movedStations) > 0:
+            Logger.log("Base station(s) moved since the last session: " + ", ".join(sorted(self.movedStations)))
+
+    def checkForMovement(self):
+        """
+        Poll the base station poses again & compare them to the recorded ones. Unmoved base stations
+        keep their recorded pose
+        :return: True if any base station moved since the drones last got the geometry
+        """
+        for station in self.baseStations:
+            try:
+                station.updatePositionMatrix()
+            except VRException as e:
+                Logger.error("Keeping the last pose of base station " + station.serial + ": " + str(e))
+
+        moved = self.geometryCache.update(self.stationGeometries)
+        if len(moved) > 0:
+            Logger.log("Base station(s) moved: " + ", ".join(moved))
+        self.movedStations.update(moved)
+        return len(self.movedStations) > 0
+
+    def sensorsUploaded(self):
+        """
+        The drones hold the current geometry, so earlier moves no longer need a forced upload
+        """
+        self.movedStations = set()
+
     def connectToBaseStations(self):
         vrSystem = self.appController.vrSystem
         for i in range(openvr.k_unMaxTrackedDeviceCount):
@@ -54,6 +88,10 @@ class BaseStationController():
                 except VRException:
                     continue
 
+    @property
+    def stationGeometries(self):
+        return [(station.serial, station.positionGeometry) for station in self.baseStations]
+
     @property
     def geometryOne(self):
         return self.baseStations[0].positionGeometry
@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from threading import Lock
+
+from application.common.exceptions import DroneException, SequenceInterrupt
+from application.util import exceptionUtil
+
+
+class PhaseTiming():
+
+    def __init__(self, name, tasks):
+        self.name = name
+        self.tasks = tasks
+        self.submitTime = time.perf_counter()
+        self.firstStart = None
+        self.slowest = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def startLatency(self):
+        return (self.firstStart - self.submitTime) if self.firstStart is not None else 0.0
+
+    def __str__(self):
+        return "Phase {}: {} drone(s) in {:.2f}s, started after {:.1f} ms, slowest drone {:.2f}s".format(
+            self.name, self.tasks, self.elapsed, self.startLatency * 1000, self.slowest)
+
+
+class DronePool():
+    """
+    Long lived worker threads for running a function for every drone of the swarm, with a worker
+    for every drone so no phase is split into batches. Tasks that haven't started yet are
+    cancelled when the sequence is interrupted, the running ones stop at their next interrupt
+    check. Every run is timed, the timings of the last runs are kept in timings.
+    """
+
+    MAX_TIMINGS = 50
+
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='drone')
+        self.timings = []
+        self.lock = Lock()
+        self.pending = set()
+        exceptionUtil.addInterruptListener(self.cancelPending)
+
+    def shutdown(self):
+        exceptionUtil.removeInterruptListener(self.cancelPending)
+        self.cancelPending()
+        self.executor.shutdown(wait=False)
+
+    def cancelPending(self):
+        with self.lock:
+            for future in self.pending:
+                future.cancel()
+
+    def run(self, function, drones, timeout=None, phase=None, timeoutError=DroneException):
+        """
+        Call the function for every drone & wait for all of them
+        :param function: A function taking a single Drone instance
+        :param drones: The drones to call the function for
+        :param timeout: Seconds a single call may run before the run fails
+        :param phase: Name of the phase, for the timing
+        :param timeoutError: Exception type raised when a call runs past the timeout
+        :return: The results that aren't None, in the order of the drones
+        """
+        timing = PhaseTiming(phase or getattr(function, '__name__', 'task'), len(drones))
+        startTimes = {}
+
+        def task(index, drone):
+            startTime = time.perf_counter()
+            startTimes[index] = startTime
+            with self.lock:
+                if timing.firstStart is None:
+                    timing.firstStart = startTime
+            try:
+                return function(drone)
+            finally:
+                with self.lock:
+                    timing.slowest = max(timing.slowest, time.perf_counter() - startTime)
+
+        futures = [self.executor.submit(task, index, drone) for index, drone in enumerate(drones)]
+        with self.lock:
+            self.pending.update(futures)
+
+        try:
+            self.waitForAll(futures, startTimes, timeout, timeoutError)
+
+            # Failures are raised in the order of the drones, only finished tasks are inspected so a hung one
+            # can't block the run. Tasks that never ran were interrupted
+            finished = [future for future in futures if future.done() and not future.cancelled()]
+            errors = [future.exception() for future in finished if future.exception() is not None]
+            if len(errors) > 0:
+                raise errors[0]
+            stragglers = [future for future in futures if not future.done()]
+            if len(stragglers) > 0:
+                raise timeoutError(str(len(stragglers)) + " drone task(s) did not finish")
+            if any(future.cancelled() for future in futures):
+                raise SequenceInterrupt()
+
+            results = [future.result() for future in futures]
+        finally:
+            with self.lock:
+                self.pending.difference_update(futures)
+            timing.elapsed = time.perf_counter() - timing.submitTime
+            self.timings = (self.timings + [timing])[-DronePool.MAX_TIMINGS:]
+
+        return list(filter(None, results))
+
+    def waitForAll(self, futures, startTimes, timeout, timeoutError=DroneException):
+        remaining = futures
+        pollInterval = None if timeout is None else min(timeout, 0.25)
+
+        while len(remaining) > 0:
+            done, notDone = wait(remaining, timeout=pollInterval, return_when=FIRST_EXCEPTION)
+            remaining = list(notDone)
+
+            # Once a task failed, the ones that haven't started are dropped & the running ones get until the timeout
+            if any(not future.cancelled() and future.exception() is not None for future in done):
+                for future in remaining:
+                    future.cancel()
+                if timeout is not None:
+                    wait(remaining, timeout=timeout)
+                return
+
+            if timeout is not None and len(remaining) > 0:
+                now = time.perf_counter()
+                overdue = [index for index, future in enumerate(futures)
+                           if future in notDone and index in startTimes and now - startTimes[index] > timeout]
+                if len(overdue) > 0:
+                    for future in remaining:
+                        future.cancel()
+                    raise timeoutError("{} drone task(s) did not finish within {:.1f}s".format(len(overdue), timeout))
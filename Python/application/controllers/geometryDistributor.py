@@ -0,0 +1,149 @@
+import struct
+import time
+
+from cflib.crazyflie.mem import MemoryElement, CHAN_WRITE
+from cflib.crtp.crtpstack import CRTPPacket, CRTPPort
+
+from application.model import UploadRegistry
+from application.controllers.uploadScheduler import UploadScheduler
+from application.constants import Constants
+from application.telemetry import Tracer, tracer
+from application.util import Logger
+
+# Only the patched fork exports the write packet size, older builds & upstream cflib use 25 bytes
+try:
+    from cflib.crazyflie.mem import MAX_WRITE_LENGTH
+except ImportError:
+    MAX_WRITE_LENGTH = 25
+
+# Lighthouse memory layout of the firmware, one page per base station
+GEOMETRY_ADDRESS = 0x0000
+CALIBRATION_ADDRESS = 0x1000
+PAGE_SIZE = 0x0100
+
+
+class GeometryDistributor():
+    """
+    Sends the lighthouse geometry & calibration data, which is the same for the whole swarm, once
+    per radio channel over the broadcast links instead of once per drone. Broadcasts aren't
+    acknowledged, so every drone then reads its lighthouse memory back & only drones that didn't
+    get the data are written to one at a time.
+    """
+
+    def __init__(self, swarmController):
+        self.swarmController = swarmController
+        self.broadcasted = 0
+        self.fallbacks = 0
+
+    def distribute(self, drones, geometries, calibrations, verifyFirst=False):
+        """
+        Make sure every drone holds the given base station data, broadcasting it to the channels
+        with drones that don't have it yet & writing it directly to drones that still don't after
+        :param geometries: LighthouseBsGeometry for every base station, by index
+        :param calibrations: LighthouseBsCalibration for every base station, by index
+        :param verifyFirst: Read back every drone before broadcasting, for when the drones likely
+        still hold the data from an earlier run
+        :return: The drones that were sent the data
+        """
+        self.broadcasted = 0
+        self.fallbacks = 0
+        digest = UploadRegistry.digestObjects(geometries, calibrations)
+
+        checked = []
+        if verifyFirst:
+            checked = self.verify(drones, geometries, calibrations)
+            pending = [drone for drone in drones if drone not in checked]
+        else:
+            pending = [drone for drone in drones if not GeometryDistributor.isRecorded(drone, digest)]
+
+        channels = {}
+        for drone in pending:
+            channels.setdefault(UploadScheduler.getChannel(drone.address), []).append(drone)
+
+        broadcasters = self.swarmController.channelBroadcasters
+        for channel, channelDrones in channels.items():
+            # Drones on the channel have to agree on the id of their lighthouse memory,
+            # any that don't are left to the direct writes
+            memoryIds = set(GeometryDistributor.getMemoryId(drone) for drone in channelDrones)
+            if channel not in broadcasters or len(memoryIds) != 1 or None in memoryIds:
+                continue
+
+            with Tracer.span("broadcast base stations", tracer.CHANNEL, channel=channel, drones=len(channelDrones)) as span:
+                size = self.broadcastData(broadcasters[channel], memoryIds.pop(), geometries, calibrations)
+                if span is not None:
+                    span.size = size
+            self.broadcasted += len(channelDrones)
+
+        if self.broadcasted > 0:
+            # Give the drones time to handle the broadcast before reading back
+            time.sleep(Constants.BROADCAST_SETTLE_TIME)
+
+        verified = checked + self.verify([drone for drone in drones if drone not in checked], geometries, calibrations)
+
+        failed = []
+        for drone in drones:
+            if drone not in verified:
+                drone.invalidateUpload(UploadRegistry.BASE_STATIONS)
+                failed.append(drone)
+            elif drone in pending:
+                drone.crazyflie.cf.loc.send_lh_persist_data_packet(list(geometries.keys()), list(calibrations.keys()))
+                drone.recordUpload(UploadRegistry.BASE_STATIONS, digest)
+            elif not GeometryDistributor.isRecorded(drone, digest):
+                drone.recordUpload(UploadRegistry.BASE_STATIONS, digest)
+            else:
+                drone.uploadRegistry.recordSkipped()
+
+        self.fallbacks = len(failed)
+        if len(failed) > 0:
+            self.swarmController.parallel(lambda drone: drone.writeBaseStationData(geometries[0], geometries[1]), failed, phase="write base stations")
+
+        Logger.log("Base station data: {} drone(s) up to date, {} broadcast to, {} written directly".format(
+            len(drones) - len(pending), self.broadcasted, self.fallbacks))
+
+        return [drone for drone in drones if drone in pending or drone in failed]
+
+    def verify(self, drones, geometries, calibrations):
+        return self.swarmController.parallel(
+            lambda drone: drone if drone.verifyBaseStationData(geometries, calibrations) else None, drones, phase="verify base stations")
+
+    @staticmethod
+    def isRecorded(drone, digest):
+        return drone.uploadRegistry is not None and drone.uploadRegistry.isCurrent(drone.address, UploadRegistry.BASE_STATIONS, digest)
+
+    def broadcastData(self, broadcaster, memoryId, geometries, calibrations):
+        """
+        :return: Bytes of data sent, counting every repeat
+        """
+        size = 0
+        for address, data in GeometryDistributor.getPages(geometries, calibrations):
+            for offset in range(0, len(data), MAX_WRITE_LENGTH):
+                pk = CRTPPacket()
+                pk.set_header(CRTPPort.MEM, CHAN_WRITE)
+                pk.data = struct.pack('<BI', memoryId, address + offset) + bytes(data[offset:offset + MAX_WRITE_LENGTH])
+
+                # Nothing is acknowledged, repeat every packet to make up for lost ones
+                for _ in range(0, Constants.BROADCAST_REPEATS):
+                    broadcaster.send_packet(pk)
+                    size += len(pk.data)
+
+        return size
+
+    @staticmethod
+    def getPages(geometries, calibrations):
+        pages = []
+        for index, geometry in geometries.items():
+            data = bytearray()
+            geometry.add_mem_data(data)
+            pages.append((GEOMETRY_ADDRESS + index * PAGE_SIZE, data))
+
+        for index, calibration in calibrations.items():
+            data = bytearray()
+            calibration.add_mem_data(data)
+            pages.append((CALIBRATION_ADDRESS + index * PAGE_SIZE, data))
+
+        return pages
+
+    @staticmethod
+    def getMemoryId(drone):
+        memories = drone.crazyflie.cf.mem.get_mems(MemoryElement.TYPE_LH)
+        return memories[0].id if len(memories) > 0 else None
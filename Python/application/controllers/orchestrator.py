@@ -0,0 +1,120 @@
+import asyncio
+import concurrent.futures
+import time
+from threading import Thread, Lock
+
+from application.common.exceptions import DroneException, SequenceInterrupt
+from application.controllers.dronePool import PhaseTiming
+from application.util import exceptionUtil
+
+
+class Orchestrator():
+    """
+    Runs the waiting phases of a show as a coroutine per drone on a single asyncio event loop,
+    instead of blocking a worker thread per drone. The loop runs in one background thread, which is
+    the only bridge between the sequence & the event loop: the sequence thread hands a phase over &
+    blocks until every drone finished it, while the Qt signals emitted along the way are queued to
+    the GUI thread as before.
+
+    Every phase has an optional deadline. When a drone fails, the deadline passes or the sequence
+    is interrupted, the remaining coroutines of the phase are cancelled & awaited before the phase
+    returns, so no drone is left running a phase that has already ended.
+    """
+
+    MAX_TIMINGS = 50
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.lock = Lock()
+        self.running = set()
+        self.timings = []
+
+    @property
+    def started(self):
+        return self.thread is not None
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = Thread(target=self.loop.run_forever, name='orchestrator', daemon=True)
+            self.thread.start()
+            exceptionUtil.addInterruptListener(self.cancelRunning)
+
+    def stop(self):
+        with self.lock:
+            if not self.started:
+                return
+            exceptionUtil.removeInterruptListener(self.cancelRunning)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+
+    def cancelRunning(self):
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.cancelTasks)
+
+    def cancelTasks(self):
+        for task in list(self.running):
+            task.cancel()
+
+    def runPhase(self, function, drones, deadline=None, phase=None):
+        """
+        Run a coroutine for every drone on the event loop & wait for all of them
+        :param function: A coroutine function taking a single Drone instance
+        :param drones: The drones to run the coroutine for
+        :param deadline: Seconds the whole phase may take before it fails with a DroneException
+        :param phase: Name of the phase, for the timing
+        :return: The results that aren't None, in the order of the drones
+        """
+        self.start()
+        exceptionUtil.checkInterrupt()
+        timing = PhaseTiming(phase or getattr(function, '__name__', 'phase'), len(drones))
+
+        future = asyncio.run_coroutine_threadsafe(self.phase(function, drones, deadline, timing), self.loop)
+        try:
+            results = future.result()
+        except (concurrent.futures.CancelledError, asyncio.CancelledError):
+            raise SequenceInterrupt()
+        finally:
+            timing.elapsed = time.perf_counter() - timing.submitTime
+            self.timings = (self.timings + [timing])[-Orchestrator.MAX_TIMINGS:]
+
+        return list(filter(None, results))
+
+    async def phase(self, function, drones, deadline, timing):
+        self.running.add(asyncio.current_task())
+        tasks = [asyncio.ensure_future(self.task(function, drone, timing)) for drone in drones]
+
+        try:
+            if len(tasks) == 0:
+                return []
+            done, pending = await asyncio.wait(tasks, timeout=deadline, return_when=asyncio.FIRST_EXCEPTION)
+
+            # Failures are raised in the order of the drones
+            errors = [task.exception() for task in tasks if task in done and not task.cancelled() and task.exception() is not None]
+            if len(errors) > 0:
+                raise errors[0]
+            if len(pending) > 0:
+                raise DroneException("{} drone(s) did not finish {} within {:.1f}s".format(len(pending), timing.name, deadline))
+
+            return [task.result() for task in tasks]
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.running.discard(asyncio.current_task())
+
+    async def task(self, function, drone, timing):
+        startTime = time.perf_counter()
+        if timing.firstStart is None:
+            timing.firstStart = startTime
+        try:
+            return await function(drone)
+        finally:
+            timing.slowest = max(timing.slowest, time.perf_counter() - startTime)
\ No newline at end of file
@@ -1,16 +1,16 @@
-import json
-import os
+import asyncio
 import time
-import pathlib
 
 from cflib.crazyflie.light_controller import RingEffect
 
-from application.model import Sequence, DroneState, Drone
+from application.model import DroneState, Drone, SequenceCache, UploadRegistry
 from application.common.exceptions import SequenceInterrupt, DroneException
 from application.util import exceptionUtil, threadUtil, Logger
-from application.planner import DroneMatcher
+from application.planner import DroneMatcher, planTransition
+from application.controllers.uploadScheduler import UploadScheduler
+from application.telemetry import FlightRecorder, flightRecorder, Tracer, tracer
+from application.trajectory import TrajectoryBatch, checkSeparation, checkLimits
 from application.constants import Constants
-from application.util import vectorMath
 
 
 class SequenceController:
@@ -22,9 +22,13 @@ class SequenceController:
         self.settings = settings
 
         self.sequences = []
+        self.sequenceCache = SequenceCache()
         self.sequencePlaying = False
         self.loadSequences()
         self.sequenceIndex = None
+        self.transitionStart = 0.0
+        self.transitionDuration = 0.0
+        self.recorder = FlightRecorder()
 
     def loadSequences(self):
         for sequenceFile in reversed(self.settings.sequences):
@@ -38,24 +42,19 @@ class SequenceController:
         return None
 
     def loadSequence(self, file):
-        path = pathlib.Path(file)
-        location = str(path.parent)
-        name = os.path.splitext(path.name)[0]
-        with open(file, 'r') as jsonFile:
-            sequenceData = json.load(jsonFile)
-            try:
-                sequence = Sequence(name, location, sequenceData)
-                existingIndex = self.findExisting(sequence)
-                if existingIndex is None:
-                    self.sequences.insert(0, sequence)
-                else:
-                    self.sequences.insert(0, self.sequences.pop(existingIndex))
-
-                del self.sequences[10:] # Trim to 10 items or less
-                return True
-            except ValueError:
-                return False
-        return False
+        try:
+            sequence = self.sequenceCache.load(file)
+        except (OSError, ValueError):
+            return False
+
+        existingIndex = self.findExisting(sequence)
+        if existingIndex is None:
+            self.sequences.insert(0, sequence)
+        else:
+            self.sequences.insert(0, self.sequences.pop(existingIndex))
+
+        del self.sequences[10:] # Trim to 10 items or less
+        return True
 
     def removeSequence(self, index):
         if (index >= 0 and index < len(self.sequences)):
@@ -67,12 +66,67 @@ class SequenceController:
         if (index >= 0 and index < len(self.sequences)):
             SequenceController.CURRENT = self.sequences[index]
             self.sequenceIndex = index
+            self.evictUnselected()
             return True
         return False
 
+    def preflightCheck(self, sequence):
+        # Runs in the background, where an uncaught error would go unnoticed
+        try:
+            self.runPreflightCheck(sequence)
+        except Exception as e:
+            Logger.error("Preflight check failed: " + str(e))
+
+    def runPreflightCheck(self, sequence):
+        if sequence is None or sequence.trackCount == 0:
+            return
+
+        try:
+            batch = TrajectoryBatch.fromSequence(sequence)
+        except ValueError as e:
+            Logger.error("Preflight check failed, could not decode trajectories: " + str(e))
+            return
+
+        self.reportLimits(batch)
+        if batch.droneCount > 1:
+            self.reportSeparation(batch)
+
+    def reportLimits(self, batch):
+        report = checkLimits(batch, Constants.MAX_TRAJECTORY_SPEED, Constants.MAX_TRAJECTORY_ACCELERATION,
+                             Constants.ARENA_MIN, Constants.ARENA_MAX, Constants.PREFLIGHT_SAMPLE_RATE)
+        if report.passed:
+            Logger.success("Preflight limits check passed. Peak speed {:.2f}m/s, peak acceleration {:.2f}m/s²".format(
+                report.peakSpeed, report.peakAcceleration))
+            return
+
+        Logger.warn(str(len(report.violations)) + " dynamic limit violation(s)")
+        for violation in report.violations[:10]:
+            Logger.warn(str(violation))
+
+    def reportSeparation(self, batch):
+        report = checkSeparation(batch, Constants.MIN_SEPARATION, Constants.PREFLIGHT_SAMPLE_RATE)
+        if report.passed:
+            if report.closestDistance == float('inf'):
+                Logger.success("Preflight separation check passed")
+            else:
+                Logger.success("Preflight separation check passed. Closest approach {:.2f}m at {:.2f}s".format(
+                    report.closestDistance, report.closestTime))
+            return
+
+        Logger.warn(str(len(report.violations)) + " separation violation(s) below {:.2f}m".format(Constants.MIN_SEPARATION))
+        for violation in report.violations[:10]:
+            Logger.warn(str(violation))
+
     def clearSelection(self):
         SequenceController.CURRENT = None
         self.sequenceIndex = None
+        self.evictUnselected()
+
+    def evictUnselected(self):
+        # Only the selected sequence needs its track payloads resident
+        for sequence in self.sequences:
+            if sequence is not SequenceController.CURRENT:
+                sequence.evictTracks()
 
 
     def run(self):
@@ -85,34 +139,49 @@ class SequenceController:
             Logger.log("SEQUENCE STARTING")
             swarmController = self.appController.swarmController
             sequence = SequenceController.CURRENT
+            self.startTracing()
 
-            # connect to required drones
-            numDrones = min(sequence.drones, self.appController.availableDrones)
-            self.appController.swarmController.connectSwarm(numDrones)
+            # connect to all available drones, any spares are matched out once their positions are known
+            numDrones = self.appController.availableDrones
+            with Tracer.span("connect", tracer.PHASE):
+                self.appController.swarmController.connectSwarm(numDrones)
+            self.startRecording(sequence, swarmController.connectedDrones)
             self.appController.sequenceUpdated.emit()
 
             # ensure all drones have updated light house info & know their positions
             uploadLighthouseData = self.appController.trajectoryEnabled or self.appController.positioningEnabled
-            swarmController.initializeSensors(uploadLighthouseData)
+            with Tracer.span("initialize sensors", tracer.PHASE):
+                swarmController.initializeSensors(uploadLighthouseData)
             self.appController.sequenceUpdated.emit()
 
             # get all drones in position
-            if sequence is not None and sequence.tracks is not None and len(sequence.tracks) > 0:
+            if sequence is not None and sequence.trackCount > 0:
                 startingPositions = sequence.allStartingPositions
-                DroneMatcher.assign(swarmController.connectedDrones, startingPositions)
-                swarmController.parallel(self.uploadFlightData)
-
-            self.synchronizedTakeoff()
-            self.setInitialPositions()
+                priorities = sequence.allPriorities if sequence.hasPriorities else None
+                DroneMatcher.assign(swarmController.connectedDrones, startingPositions, priorities)
+                self.planTransition(swarmController.connectedDrones)
+                self.logAssignment(sequence, swarmController.connectedDrones)
+                for drone in swarmController.connectedDrones:
+                    self.recorder.recordAssignment(drone.telemetryIndex, drone.trackIndex)
+                with Tracer.span("upload flight data", tracer.PHASE):
+                    self.uploadFlightData(swarmController.connectedDrones)
+
+            with Tracer.span("takeoff", tracer.PHASE):
+                self.synchronizedTakeoff()
+            with Tracer.span("starting positions", tracer.PHASE):
+                self.setInitialPositions()
 
             # kick off the actual sequence action4
-            self.runSequence()
+            with Tracer.span("flight", tracer.PHASE):
+                self.runSequence()
 
             # land all drones
-            self.landDrones()
+            with Tracer.span("landing", tracer.PHASE):
+                self.landDrones()
 
             # Wrap up
-            self.completeSequence()
+            with Tracer.span("disconnect", tracer.PHASE):
+                self.completeSequence()
 
         except SequenceInterrupt:
             Logger.log("ABORTING SEQUENCE")
@@ -133,88 +202,181 @@ class SequenceController:
         except Exception:
             raise
 
-    def uploadFlightData(self, drone):
-        sequence = SequenceController.CURRENT
-        track = sequence.getTrack(drone.trackIndex)
-        exceptionUtil.checkInterrupt()
+        finally:
+            self.stopRecording()
+            self.stopTracing()
 
-        if track is not None:
-            Logger.log("Uploading trajectory & LED data", drone.swarmIndex)
+    def startRecording(self, sequence, drones):
+        if not Constants.RECORD_FLIGHTS:
+            return
+
+        metadata = {
+            'sequence': sequence.fullPath if sequence is not None else None,
+            'telemetryPeriodMs': Constants.TELEMETRY_PERIOD_MS,
+            'drones': [{'index': drone.telemetryIndex, 'address': drone.address} for drone in drones]
+        }
+        path = self.recorder.start(metadata)
+        Logger.log("Recording flight data to " + path)
+
+        for drone in drones:
+            drone.telemetry.addListener(lambda sample, index=drone.telemetryIndex: self.recorder.recordSample(index, sample))
+            drone.stateListeners.append(self.recordState)
+
+    def stopRecording(self):
+        if not self.recorder.recording:
+            return
+
+        for drone in self.appController.swarmController.connectedDrones:
+            if self.recordState in drone.stateListeners:
+                drone.stateListeners.remove(self.recordState)
+
+        self.recorder.stop()
+        Logger.log("Recorded {} flight data records, {} dropped".format(self.recorder.written, self.recorder.dropped))
+
+    def startTracing(self):
+        if Constants.TRACE_SHOWS:
+            Tracer.CURRENT = Tracer()
+
+    def stopTracing(self):
+        showTracer = Tracer.CURRENT
+        if showTracer is None:
+            return
+
+        Tracer.CURRENT = None
+        for line in str(showTracer.summary()).splitlines():
+            Logger.log(line)
+
+        try:
+            Logger.log("Trace of the show written to " + showTracer.save(self.recorder.directory))
+        except OSError as e:
+            Logger.error("Could not write the trace of the show: " + str(e))
 
-            if self.appController.trajectoryEnabled:
-                trajectoryData = bytearray(track['CompressedTrajectory'])
-                drone.writeTrajectory(trajectoryData)
-                exceptionUtil.checkInterrupt()
+    def recordState(self, drone, state):
+        self.recorder.recordState(drone.telemetryIndex, state)
 
+    def logAssignment(self, sequence, drones):
+        assignedTracks = set(drone.trackIndex for drone in drones if drone.trackIndex is not None)
+        spareCount = len(drones) - len(assignedTracks)
+        unfilledTracks = [index + 1 for index in range(0, sequence.trackCount) if index not in assignedTracks]
+
+        if spareCount > 0:
+            Logger.warn(str(spareCount) + " spare drone(s) will stay on the ground during the sequence")
+
+        if len(unfilledTracks) > 0:
+            Logger.warn("Not enough drones, skipping track(s) " + ", ".join(str(index) for index in unfilledTracks))
+
+    def uploadFlightData(self, drones):
+        scheduler = UploadScheduler()
+        for drone in drones:
+            self.scheduleFlightData(scheduler, drone)
+
+        for report in scheduler.run():
+            Logger.log("Upload " + str(report))
+
+    def scheduleFlightData(self, scheduler, drone):
+        track = SequenceController.CURRENT.getTrack(drone.trackIndex)
+        if track is None:
+            # Spare drones stay on the ground, out of the show group the flight is broadcast to. The LED effect
+            # is broadcast to every drone, so spares play empty timings instead of a previous show
             if self.appController.colorSequenceEnabled:
-                lightData = bytearray(track['LedTimings'])
-                drone.writeLedTimings(lightData)
-                exceptionUtil.checkInterrupt()
+                scheduler.add(drone, UploadRegistry.LED_TIMINGS, lambda: self.upload(drone.writeLedTimings, Drone.EMPTY_LED_TIMINGS),
+                              len(Drone.EMPTY_LED_TIMINGS))
+            return
 
-        # drone.disableAutoPing()
+        Logger.log("Uploading trajectory & LED data", drone.swarmIndex)
+        trajectory, ledTimings = track.trajectory, track.ledTimings
+
+        if self.appController.trajectoryEnabled:
+            scheduler.add(drone, UploadRegistry.TRAJECTORY, lambda: self.upload(drone.writeTrajectory, trajectory), len(trajectory))
+
+        if self.appController.colorSequenceEnabled:
+            scheduler.add(drone, UploadRegistry.LED_TIMINGS, lambda: self.upload(drone.writeLedTimings, ledTimings), len(ledTimings))
+
+    def upload(self, write, data):
+        exceptionUtil.checkInterrupt()
+        write(data)
+        exceptionUtil.checkInterrupt()
 
     def synchronizedTakeoff(self):
         if not (self.appController.trajectoryEnabled or self.appController.positioningEnabled):
             return
 
         Logger.log("Taking off")
+        self.recorder.recordMarker(flightRecorder.MARKER_TAKEOFF)
         swarmController = self.appController.swarmController
-        swarmController.broadcast(lambda broadcaster: broadcaster.light_controller.set_color(0, 0, 0, 0.1, True))
-        swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.takeoff(Constants.MIN_HEIGHT, 1.5))
+        flying = [drone for drone in swarmController.connectedDrones if self.isFlying(drone)]
 
+        # Flight commands go to the show group only, so spares stay on the ground
         for drone in swarmController.connectedDrones:
+            drone.commander.set_group_mask(Drone.SHOW_GROUP if drone in flying else Drone.SPARE_GROUP)
+
+        swarmController.broadcast(lambda broadcaster: broadcaster.light_controller.set_color(0, 0, 0, 0.1, True))
+        swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.takeoff(
+            Constants.MIN_HEIGHT, 1.5, group_mask=Drone.SHOW_GROUP))
+
+        for drone in flying:
             drone.state = DroneState.IN_FLIGHT
 
         self.appController.sequenceUpdated.emit()
         threadUtil.interruptibleSleep(1.6)
 
+    def isFlying(self, drone):
+        # Without tracks to match, like when only positioning, every drone flies
+        sequence = SequenceController.CURRENT
+        return sequence is None or sequence.trackCount == 0 or drone.trackIndex is not None
+
+
+    def planTransition(self, drones):
+        """
+        Plan the moves from the takeoff to the starting positions. Drones trading goals in the plan
+        trade tracks, so this has to happen before the flight data is uploaded
+        """
+        flying = [drone for drone in drones if self.isFlying(drone)]
+
+        # Moves start from the takeoff positions, spares stay on the ground below the transition height
+        starts = [(x, y, Constants.MIN_HEIGHT) for x, y, _ in [drone.currentPosition for drone in flying]]
+        goals = [drone.targetPosition for drone in flying]
+        plan = planTransition(starts, goals, Drone.MAX_VELOCITY, Constants.TRANSITION_SEPARATION)
+
+        tracks = [(drone.trackIndex, drone.targetPosition) for drone in flying]
+        for drone, goalIndex, delay, travelTime in zip(flying, plan.goalIndexes, plan.delays, plan.travelTimes):
+            drone.trackIndex, drone.targetPosition = tracks[goalIndex]
+            drone.takeoffDelay = float(delay)
+            drone.travelTime = float(travelTime)
+
+        self.transitionDuration = plan.duration
+        Logger.log("Planned transition to starting positions, {:.2f}s".format(plan.duration))
+        if len(plan.conflicts) > 0:
+            Logger.warn(str(len(plan.conflicts)) + " pair(s) of drones may pass closer than {:.2f}m while getting into position".format(
+                Constants.TRANSITION_SEPARATION))
 
     def setInitialPositions(self):
         if not (self.appController.trajectoryEnabled or self.appController.positioningEnabled):
             return
 
         sequence = SequenceController.CURRENT
-        if sequence is None or sequence.tracks is None or len(sequence.tracks) == 0:
+        if sequence is None or sequence.trackCount == 0:
             return
 
         swarmController = self.appController.swarmController
         exceptionUtil.checkInterrupt()
-        drones = swarmController.connectedDrones
-
-        maxTime = 0.0
-        layers = {}
-
-        for drone in drones:
-            x, y, z = drone.targetPosition
-            travelDistance = vectorMath.distance(drone.currentPosition, drone.targetPosition)
-            drone.travelTime = travelDistance / Drone.MAX_VELOCITY
-            maxTime = max(drone.travelTime, maxTime)
-
-            layer = int(round(z * 10))
-            if layer not in layers:
-                layers[layer] = []
+        swarmController.runPhase(self.waitForTakeoff, Constants.TAKEOFF_DEADLINE, "takeoff")
 
-            layers[layer].append(drone)
+        # Delays are relative to a shared start, so the planned spacing holds across drones
+        self.transitionStart = time.time()
+        self.recorder.recordMarker(flightRecorder.MARKER_TRANSITION)
+        swarmController.runPhase(self.moveToStartingPosition, self.transitionDuration + Constants.TAKEOFF_DEADLINE, "starting positions")
 
-        layerIndexes = list(layers.keys())
-        layerIndexes.sort(reverse=True)
-
-        delayPerLayer = 0.25 * maxTime
-        delay = 0.0
-
-        for layer in layerIndexes:
-            layerDrones = layers[layer]
-            for drone in layerDrones:
-                drone.takeoffDelay = delay
-
-            delay += delayPerLayer
+    async def waitForTakeoff(self, drone):
+        sequence = SequenceController.CURRENT
+        if sequence.getTrack(drone.trackIndex) is None:
+            return
 
+        tx, ty, tz = drone.currentPosition
+        await drone.waitForTargetPositionAsync(tx, ty, Constants.MIN_HEIGHT, 1.0, 5.0)
         exceptionUtil.checkInterrupt()
-        swarmController.parallel(self.moveToStartingPosition)
 
-
-
-    def moveToStartingPosition(self, drone):
+    async def moveToStartingPosition(self, drone):
 
         sequence = SequenceController.CURRENT
         track = sequence.getTrack(drone.trackIndex)
@@ -228,16 +390,13 @@ class SequenceController:
             x, y, z = sequence.getStartingPosition(drone.trackIndex)
             Logger.log("Getting into position", drone.swarmIndex)
 
-            # Step 1 - Make sure the drone has reached its takeoff position
-            tx, ty, tz = drone.currentPosition
-            drone.waitForTargetPosition(tx, ty, Constants.MIN_HEIGHT, 1.0, 5.0)
+            # Wait for the planned delay, then move to starting position
+            await asyncio.sleep(max(0.0, self.transitionStart + drone.takeoffDelay - time.time()))
 
-            # Step 2 - Wait for takeoff delay, then move to starting position
-            threadUtil.interruptibleSleep(drone.takeoffDelay)
-
-            commander.go_to(x, y, z, 0.0, drone.travelTime)
-            threadUtil.interruptibleSleep(drone.travelTime)
-            drone.waitForTargetPosition(x, y, z, 1.0, drone.travelTime + 5.0)
+            with Tracer.span("go to", drone=drone, target=(x, y, z), travelTime=drone.travelTime):
+                commander.go_to(x, y, z, 0.0, drone.travelTime)
+                await asyncio.sleep(drone.travelTime)
+                await drone.waitForTargetPositionAsync(x, y, z, 1.0, drone.travelTime + 5.0)
 
             Logger.log("Ready!", drone.swarmIndex)
             self.appController.updateSequence()
@@ -250,8 +409,10 @@ class SequenceController:
         duration = SequenceController.CURRENT.duration
 
         # Start the automated trajectory
+        self.recorder.recordMarker(flightRecorder.MARKER_TRAJECTORY_START)
         if self.appController.trajectoryEnabled:
-            swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.start_trajectory(Drone.TRAJECTORY_ID))
+            swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.start_trajectory(
+                Drone.TRAJECTORY_ID, group_mask=Drone.SHOW_GROUP))
 
         # Start the automated LED sequence
         if self.appController.colorSequenceEnabled:
@@ -265,8 +426,10 @@ class SequenceController:
             return
 
         Logger.log("Landing drones...")
+        self.recorder.recordMarker(flightRecorder.MARKER_LANDING)
         swarmController = self.appController.swarmController
-        swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.land(Constants.LANDING_HEIGHT, 2.0))
+        swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.land(
+            Constants.LANDING_HEIGHT, 2.0, group_mask=Drone.SHOW_GROUP))
 
         for drone in swarmController.connectedDrones:
             if (drone.state == DroneState.IN_FLIGHT):
@@ -295,6 +458,8 @@ class SequenceController:
         self.appController.sequenceUpdated.emit()
 
     def abort(self):
-        self.landDrones(True)
-        self.completeSequence()
+        self.recorder.recordMarker(flightRecorder.MARKER_ABORT)
+        with Tracer.span("abort", tracer.PHASE):
+            self.landDrones(True)
+            self.completeSequence()
 
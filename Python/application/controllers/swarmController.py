@@ -1,16 +1,23 @@
 import time
 import sys
 
-from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
 
 from cflib.crazyflie.broadcaster import Broadcaster
 from cflib.crtp.cflinkcppdriver import CfLinkCppDriver
 
-from application.model import Drone, DroneState
+from application.model import Drone, DroneState, UploadRegistry
 from application.common import SettingsKey, AppSettings
 from application.common.exceptions import DroneException
 from application.constants import Constants
-from application.util import Logger
+from application.controllers.dronePool import DronePool
+from application.controllers.geometryDistributor import GeometryDistributor
+from application.controllers.orchestrator import Orchestrator
+from application.controllers.uploadScheduler import UploadScheduler
+from application.simulation import SimulatedSwarm, SimulatedLinkDriver, SimulatedBroadcaster
+from application.telemetry import TelemetryStore, Tracer
+from application.telemetry.telemetryStore import POSITION, Z
+from application.util import Logger, calibration, threadUtil
 
 
 class SwarmController():
@@ -22,6 +29,17 @@ class SwarmController():
         self.connectedDrones = []
         self.droneMapping = {}
         self.broadcasters = []
+        self.channelBroadcasters = {}
+        self.telemetryStore = None
+
+        # Worker for every drone, created on connect & kept until the swarm disconnects
+        self.pool = None
+
+        # Event loop for the phases that only wait on the drones, a coroutine per drone
+        self.orchestrator = Orchestrator()
+
+        # Payloads written to each drone, kept across runs so unchanged uploads can be skipped
+        self.uploadRegistry = UploadRegistry()
 
     def broadcast(self, operation):
         for broadcaster in self.broadcasters:
@@ -31,11 +49,12 @@ class SwarmController():
     def scan(self):
         self.removeDisconnected()
         uris = []
+        driver = SimulatedLinkDriver if SimulatedSwarm.CURRENT is not None else CfLinkCppDriver
 
         # Scan a few times to help pick up any and all drones
-        uris.extend(CfLinkCppDriver.scan_selected(self.uriPool))
-        uris.extend(CfLinkCppDriver.scan_selected(self.uriPool))
-        uris.extend(CfLinkCppDriver.scan_selected(self.uriPool))
+        uris.extend(driver.scan_selected(self.uriPool))
+        uris.extend(driver.scan_selected(self.uriPool))
+        uris.extend(driver.scan_selected(self.uriPool))
 
         for uri in uris:
             if uri in self.droneMapping:
@@ -44,6 +63,8 @@ class SwarmController():
             drone = Drone()
             drone.swarmIndex = len(self.availableDrones)
             drone.address = uri
+            drone.channel = UploadScheduler.getChannel(uri)
+            drone.uploadRegistry = self.uploadRegistry
             self.availableDrones.append(drone)
             self.droneMapping[uri] = drone
 
@@ -57,12 +78,22 @@ class SwarmController():
 
         Logger.log("Attempting to open " + str(len(toConnect)) + " drone connections")
         for channel in self.channels:
-            broadcaster = Broadcaster(channel)
+            broadcaster = SimulatedBroadcaster(channel) if SimulatedSwarm.CURRENT is not None else Broadcaster(channel)
             broadcaster.open_link()
             self.broadcasters.append(broadcaster)
+            self.channelBroadcasters[channel] = broadcaster
 
-        self.connectedDrones = self.parallel(self.connectToDrone, toConnect)
+        self.startPool(len(self.availableDrones))
+        # A drone that hangs while connecting fails the connection, not the flight
+        self.connectedDrones = self.parallel(self.connectToDrone, toConnect, Constants.CONNECT_TIMEOUT, "connect", ConnectionAbortedError)
         Logger.log("Successfully opened " + str(len(self.connectedDrones)) + " drone connections")
+        self.startTelemetry()
+
+    def startTelemetry(self):
+        self.telemetryStore = TelemetryStore(len(self.connectedDrones), Drone.ESTIMATOR_WINDOW)
+        for index, drone in enumerate(self.connectedDrones):
+            drone.telemetryIndex = index
+            drone.telemetry.addListener(lambda sample, index=index: self.telemetryStore.addSample(index, sample))
 
     def connectToDrone(self, drone):
         try:
@@ -78,6 +109,10 @@ class SwarmController():
 
     def onDisconnect(self, uri, errorMessage):
         Logger.error(errorMessage)
+
+        # The drone may have rebooted, so nothing it held can be trusted anymore
+        self.uploadRegistry.invalidate(uri.split('?')[0])
+
         if uri in self.droneMapping:
             drone = self.droneMapping[uri]
             drone.state = DroneState.DISCONNECTED
@@ -90,12 +125,37 @@ class SwarmController():
 
         self.broadcast(lambda broadcaster: broadcaster.close_link())
         self.broadcasters = []
+        self.channelBroadcasters = {}
 
         for drone in self.connectedDrones:
             drone.crazyflie.cf.high_level_commander.stop()
+            if drone.telemetry is not None:
+                # Already stopped if the swarm was disconnected before, e.g. by an abort
+                drone.telemetry.stop()
             drone.crazyflie.cf.close_link()
+            drone.telemetry = None
             drone.state = DroneState.DISCONNECTED
 
+        self.logTimings()
+        self.stopPool()
+        # Restarted by the next phase that needs it
+        self.orchestrator.stop()
+
+    def startPool(self, workers):
+        self.stopPool()
+        self.pool = DronePool(workers)
+
+    def stopPool(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def logTimings(self):
+        timings = self.orchestrator.timings + (self.pool.timings if self.pool is not None else [])
+        for timing in sorted(timings, key=lambda timing: timing.submitTime):
+            Logger.log(str(timing))
+        self.orchestrator.timings = []
+
     def removeDisconnected(self):
         filtered = []
         for drone in self.availableDrones:
@@ -107,25 +167,110 @@ class SwarmController():
         self.availableDrones = filtered
 
     def initializeSensors(self, uploadGeometry=True):
-        geometryOne = self.appController.baseStationController.geometryOne
-        geometryTwo = self.appController.baseStationController.geometryTwo
-        self.parallel(lambda drone: drone.updateSensors(uploadGeometry, geometryOne, geometryTwo))
+        baseStationController = self.appController.baseStationController
+        moved = baseStationController.checkForMovement() if uploadGeometry else False
+
+        geometryOne = baseStationController.geometryOne
+        geometryTwo = baseStationController.geometryTwo
+        self.parallel(lambda drone: drone.configureSensors(), phase="configure sensors")
+
+        if uploadGeometry:
+            if Constants.BROADCAST_BASE_STATIONS:
+                distributor = GeometryDistributor(self)
+                geometries = {0: geometryOne, 1: geometryTwo}
+                updated = distributor.distribute(self.connectedDrones, geometries, calibration.CALIBRATION_DATA, verifyFirst=not moved)
+            else:
+                updated = self.parallel(lambda drone: drone if drone.writeBaseStationData(geometryOne, geometryTwo) else None,
+                                        phase="base stations")
 
-    def parallel(self, function, droneCollection=None):
+            # Drones that kept their data have a settled estimator, they only need to report their position
+            self.parallel(lambda drone: drone.resetEstimator(), updated, phase="reset estimators")
+            self.waitForEstimators(updated)
+            self.waitForEstimators([drone for drone in self.connectedDrones if drone not in updated], reset=False)
+            baseStationController.sensorsUploaded()
+
+        self.parallel(lambda drone: drone.sensorsUpdated(), phase="sensors updated")
+
+    def waitForEstimators(self, drones, reset=True):
+        """
+        Wait for the kalman estimators of the given drones to settle, checking all of them at once
+        on the swarm telemetry
+
+        :param reset: Whether the estimators were just reset & need a fresh window of samples to settle,
+            otherwise a drone is done as soon as its current window is converged
+        """
+        if len(drones) == 0:
+            return
+
+        rows = np.array([drone.telemetryIndex for drone in drones])
+        startTime = time.time()
+        since = startTime if reset else -np.inf
+        settleTime = Drone.ESTIMATOR_SETTLE_TIME if reset else 0
+        traceStart = time.perf_counter()
+        convergedSince = np.full(len(rows), np.nan)
+        doneSince = np.full(len(rows), np.nan)
+
+        while True:
+            now = time.time()
+            converged = self.telemetryStore.converged(Drone.ESTIMATOR_THRESHOLD, Drone.ESTIMATOR_MAX_HEIGHT, since)[rows]
+            convergedSince = np.where(converged, np.fmin(convergedSince, now), np.nan)
+            done = converged & (now - convergedSince >= settleTime)
+            doneSince = np.where(done, np.fmin(doneSince, time.perf_counter()), np.nan)
+            if np.all(done):
+                break
+
+            if now - startTime > Drone.ESTIMATOR_TIMEOUT_SEC:
+                latest = self.telemetryStore.latest()
+                for drone in np.array(drones, dtype=object)[~done]:
+                    Logger.error("Invalid position data received. Height: " + str(latest[drone.telemetryIndex, Z]), drone.swarmIndex)
+                    drone.setError()
+                raise ConnectionAbortedError("Position estimate of " + str(np.sum(~done)) + " drone(s) did not settle")
+
+            threadUtil.interruptibleSleep(Constants.TELEMETRY_PERIOD_MS / 1000)
+
+        tracer = Tracer.CURRENT
+        if tracer is not None:
+            for drone, doneTime in zip(drones, doneSince):
+                tracer.record("estimator wait", traceStart, float(doneTime), drone=drone)
+
+        latest = self.telemetryStore.latest()
+        for drone in drones:
+            x, y, z = latest[drone.telemetryIndex, POSITION]
+            drone.currentPosition = (float(x), float(y), float(z))
+            Logger.log("Sensors updated & position found. Current position: " + ("({:.2f}, {:.2f}, {:.2f})".format(x, y, z)), drone.swarmIndex)
+
+    def parallel(self, function, droneCollection=None, timeout=None, phase=None, timeoutError=DroneException):
         """
         Call the given function in parallel for each drone in the swarm
         :param function: A function taking a single Drone instance
         :param droneCollection: The collection of drones to call on. Defaults to the connected drones from the swarm
-        :return:
+        :param timeout: Seconds the function may take for a single drone, unlimited by default
+        :param phase: Name of the phase, for the timings
+        :param timeoutError: Exception type raised when the function runs past the timeout
+        :return: The results that aren't None, in the order of the drones
         """
         drones = droneCollection if droneCollection is not None else self.connectedDrones
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(function, drone) for drone in drones]
-            wait(futures) # Await all
-            results = [future.result() for future in futures]
-            results = list(filter(None, results))
+        if self.pool is not None:
+            return self.pool.run(function, drones, timeout, phase, timeoutError)
 
-        return results
+        # Outside of a connected swarm, e.g. checking batteries, use a pool just for this call
+        pool = DronePool(len(drones))
+        try:
+            return pool.run(function, drones, timeout, phase, timeoutError)
+        finally:
+            pool.shutdown()
+
+    def runPhase(self, function, deadline=None, phase=None, droneCollection=None):
+        """
+        Run the given coroutine function for each drone in the swarm on the orchestrator event loop
+        :param function: A coroutine function taking a single Drone instance
+        :param deadline: Seconds the whole phase may take, unlimited by default
+        :param phase: Name of the phase, for the timings
+        :param droneCollection: The collection of drones to run for. Defaults to the connected drones from the swarm
+        :return: The results that aren't None, in the order of the drones
+        """
+        drones = droneCollection if droneCollection is not None else self.connectedDrones
+        return self.orchestrator.runPhase(function, drones, deadline, phase)
 
     def takeoffTest(self, sequential=False):
         mode = "(sequentially)" if sequential else "(in parallel)"
@@ -144,7 +289,7 @@ class SwarmController():
                 self.broadcast(lambda broadcaster: broadcaster.high_level_commander.takeoff(Constants.MIN_HEIGHT, 1.5))
 
                 time.sleep(1.25)
-                results = self.parallel(self.verifyTakeoff)
+                results = self.parallel(self.verifyTakeoff, phase="verify takeoff")
 
                 Logger.log("Landing drones...")
 
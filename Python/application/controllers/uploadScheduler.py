@@ -0,0 +1,132 @@
+import time
+from threading import Condition
+from concurrent.futures import ThreadPoolExecutor
+
+from application.constants import Constants
+
+
+class UploadJob():
+
+    def __init__(self, drone, kind, function, size):
+        self.drone = drone
+        self.kind = kind
+        self.function = function
+        self.size = size
+
+
+class ChannelReport():
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.jobs = 0
+        self.bytes = 0
+        self.busyTime = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return "Channel {}: {} upload(s), {} bytes in {:.2f}s ({:.0f} B/s)".format(
+            self.channel, self.jobs, self.bytes, self.elapsed, self.throughput)
+
+
+class UploadScheduler():
+    """
+    Runs memory uploads for the swarm grouped by radio channel. Every channel gets its own workers,
+    capped so drones sharing a Crazyradio don't all contend at once, while the other channels keep
+    working. A drone only ever runs one upload at a time, and every drone's first upload is
+    scheduled before anyone's second, which interleaves the different kinds of uploads.
+    """
+
+    def __init__(self, perChannel=Constants.UPLOADS_PER_CHANNEL):
+        self.perChannel = max(1, perChannel)
+        self.jobs = []
+
+    @staticmethod
+    def getChannel(uri):
+        # radio://<radio>/<channel>/<datarate>/<address> or sim://<channel>/<address>
+        try:
+            parts = str(uri).split("://")[1].split("/")
+            return int(parts[0] if len(parts) == 2 else parts[1])
+        except (IndexError, ValueError):
+            return None
+
+    def add(self, drone, kind, function, size=0):
+        self.jobs.append(UploadJob(drone, kind, function, size))
+
+    def run(self):
+        """
+        Run all added uploads & wait for them to finish. If an upload raises, no new uploads are
+        started & the first exception is raised once the running ones are done.
+        :return: A ChannelReport for every channel, in channel order
+        """
+        queues = {}
+        ranks = {}
+        for index, job in enumerate(self.jobs):
+            rank = ranks.get(id(job.drone), 0)
+            ranks[id(job.drone)] = rank + 1
+            queues.setdefault(self.getChannel(job.drone.address), []).append((rank, index, job))
+
+        for channel in queues:
+            queues[channel] = [job for _, _, job in sorted(queues[channel], key=lambda entry: entry[:2])]
+
+        self.jobs = []
+        self.queues = queues
+        self.busyDrones = set()
+        self.errors = []
+        self.condition = Condition()
+        self.reports = {channel: ChannelReport(channel) for channel in queues}
+        self.startTime = time.time()
+
+        workerCount = sum(min(self.perChannel, len(jobs)) for jobs in queues.values())
+        if workerCount > 0:
+            with ThreadPoolExecutor(max_workers=workerCount) as executor:
+                for channel, jobs in queues.items():
+                    for _ in range(0, min(self.perChannel, len(jobs))):
+                        executor.submit(self.work, channel)
+
+        if len(self.errors) > 0:
+            raise self.errors[0]
+
+        return [self.reports[channel] for channel in sorted(self.reports, key=lambda channel: (channel is None, channel or 0))]
+
+    def work(self, channel):
+        report = self.reports[channel]
+        while True:
+            job = self.nextJob(channel)
+            if job is None:
+                return
+
+            start = time.time()
+            try:
+                job.function()
+            except BaseException as e:
+                with self.condition:
+                    self.errors.append(e)
+                    for jobs in self.queues.values():
+                        jobs.clear()
+
+            end = time.time()
+            with self.condition:
+                self.busyDrones.discard(id(job.drone))
+                report.jobs += 1
+                report.bytes += job.size
+                report.busyTime += end - start
+                report.elapsed = end - self.startTime
+                self.condition.notify_all()
+
+    def nextJob(self, channel):
+        jobs = self.queues[channel]
+        with self.condition:
+            while len(jobs) > 0:
+                for index, job in enumerate(jobs):
+                    if id(job.drone) not in self.busyDrones:
+                        self.busyDrones.add(id(job.drone))
+                        return jobs.pop(index)
+
+                # Every remaining job belongs to a drone that is still uploading
+                self.condition.wait()
+
+            return None
@@ -2,4 +2,9 @@ from .drone import Drone
 from .droneState import DroneState
 from .droneActionType import DroneActionType
 from .sequence import Sequence
-from .sequenceTestMode import SequenceTestMode
\ No newline at end of file
+from .sequenceTestMode import SequenceTestMode
+from .track import Track
+from .sequenceCache import SequenceCache
+from .uploadRegistry import UploadRegistry
+from .geometryCache import GeometryCache
+from . import sequenceFile
\ No newline at end of file
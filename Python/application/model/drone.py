@@ -10,20 +10,40 @@ from cflib.crazyflie.mem import LighthouseMemHelper
 from cflib.localization import LighthouseConfigWriter
 
 from .droneState import DroneState
+from .uploadRegistry import UploadRegistry
 from application.common.exceptions import DroneException
+from application.constants import Constants
+from application.telemetry import TelemetryStream, Tracer
 from application.util import exceptionUtil, threadUtil, Logger, calibration, vectorMath
 
 
 class Drone():
 
     TRAJECTORY_ID = 1
+
+    # High level commander groups, flight commands are broadcast to the drones flying the show only
+    SHOW_GROUP = 1
+    SPARE_GROUP = 2
     ESTIMATOR_TIMEOUT_SEC = 15.0
+    ESTIMATOR_WINDOW = 10
+    ESTIMATOR_THRESHOLD = 0.001
+    ESTIMATOR_MAX_HEIGHT = 0.25
+    ESTIMATOR_SETTLE_TIME = 1.5
     MAX_VELOCITY = 0.5
 
+    # A lone end marker, the LED timing driver plays nothing
+    EMPTY_LED_TIMINGS = bytes(4)
+
+    # Bytes read back to confirm a skipped upload is still in memory, a single read packet
+    READ_BACK_LENGTH = 20
+    READ_BACK_TIMEOUT = 1.0
+    GEOMETRY_TOLERANCE = 1e-4
+
     def __init__(self):
         # SyncCrazyflie instance
         self.crazyflie = None
         self.address = None
+        self.channel = None
         self.swarmIndex = None
         self.trackIndex = None
 
@@ -33,24 +53,42 @@ class Drone():
         self.targetPosition = (0, 0, 0)
         self.currentPosition = (0, 0, 0)
 
+        self.stateListeners = []
         self.state = DroneState.DISCONNECTED
         self.batteryLevel = None
 
         self.writeEvent = Event()
         self.writeSuccess = False
+        self.uploadRegistry = None
+        self.telemetry = None
+        self.telemetryIndex = None
         self.commander = None
         self.light_controller = None
 
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        self._state = state
+        for listener in self.stateListeners:
+            listener(self, state)
+
     def initialize(self, address, disconnectCallback):
         Logger.log("Connecting to address " + address, self.swarmIndex)
         crazyflie = Crazyflie(ro_cache='./cache', rw_cache='./cache')
         syncCrazyflie = SyncCrazyflie(address, cf=crazyflie)
         crazyflie.connection_lost.add_callback(disconnectCallback)
-        syncCrazyflie.open_link()
+        with Tracer.span("connect", drone=self):
+            syncCrazyflie.open_link()
 
         self.crazyflie = syncCrazyflie
+        self.crazyflie.cf.mem.write_window = Constants.MEMORY_WRITE_WINDOW
         self.commander = syncCrazyflie.cf.high_level_commander
         self.light_controller = syncCrazyflie.cf.light_controller
+        self.telemetry = TelemetryStream(syncCrazyflie.cf, Constants.TELEMETRY_PERIOD_MS)
+        self.telemetry.start()
         self.light_controller.set_color(0, 0, 0, 0.0, True)
         threadUtil.interruptibleSleep(0.5)
 
@@ -61,6 +99,11 @@ class Drone():
         if not self.address:
             raise ValueError("Drone has no address!")
 
+        # Connected drones already stream their battery level
+        if self.telemetry is not None and self.telemetry.latest is not None:
+            self.batteryLevel = int(self.telemetry.latest.batteryLevel)
+            return
+
         with SyncCrazyflie(self.address, cf=Crazyflie(ro_cache='./cache', rw_cache='./cache')) as scf:
             log_config = LogConfig(name='Battery Level', period_in_ms=50)
             log_config.add_variable('pm.batteryLevel', 'uint8_t')
@@ -78,150 +121,95 @@ class Drone():
     def disableAutoPing(self):
         self.crazyflie.cf.auto_ping = False
 
-    def updateSensors(self, uploadGeometry, geometryOne, geometryTwo):
+    def configureSensors(self):
         Logger.log("Updating sensor & positioning data", self.swarmIndex)
-        self.crazyflie.cf.param.set_value('lighthouse.method', '0')
-        self.crazyflie.cf.param.set_value('lighthouse.systemType', '1')
+        self.setParam('lighthouse.method', '0')
+        self.setParam('lighthouse.systemType', '1')
 
         # PID controller
-        self.crazyflie.cf.param.set_value('stabilizer.controller', '0')
-        self.crazyflie.cf.param.set_value('commander.enHighLevel', '1')
+        self.setParam('stabilizer.controller', '0')
+        self.setParam('commander.enHighLevel', '1')
         exceptionUtil.checkInterrupt()
 
-        if uploadGeometry:
-            self.writeBaseStationData(geometryOne, geometryTwo)
-            self.resetEstimator()
+    def setParam(self, name, value):
+        with Tracer.span("param " + name, drone=self, value=value):
+            self.crazyflie.cf.param.set_value(name, value)
 
+    def sensorsUpdated(self):
         self.state = DroneState.CONNECTED
         self.light_controller.set_color(0, 255, 0, 0.0, True)
         exceptionUtil.checkInterrupt()
 
     def resetEstimator(self):
-        self.crazyflie.cf.param.set_value('kalman.resetEstimation', '1')
+        # The estimator settles afterwards, SwarmController.waitForEstimators waits for it on the swarm telemetry
+        self.setParam('kalman.resetEstimation', '1')
         time.sleep(0.25)
 
         exceptionUtil.checkInterrupt()
-        self.crazyflie.cf.param.set_value('kalman.resetEstimation', '0')
+        self.setParam('kalman.resetEstimation', '0')
         self.currentPosition = (0, 0, 0)
-        self.waitForEstimator()
-
-    def waitForEstimator(self):
-        startTime = time.time()
-        log_config = LogConfig(name='Kalman Variance & Position', period_in_ms=100)
-        log_config.add_variable('kalman.varPX', 'float')
-        log_config.add_variable('kalman.varPY', 'float')
-        log_config.add_variable('kalman.varPZ', 'float')
-        log_config.add_variable('kalman.stateX', 'float')
-        log_config.add_variable('kalman.stateY', 'float')
-        log_config.add_variable('kalman.stateZ', 'float')
-
-        var_y_history = [1000] * 10
-        var_x_history = [1000] * 10
-        var_z_history = [1000] * 10
-        threshold = 0.001
-
-        convergedDuration = 0
-        lastTime = None
-
-        with SyncLogger(self.crazyflie, log_config) as logger:
-            for log_entry in logger:
-
-                exceptionUtil.checkInterrupt()
-                data = log_entry[1]
-
-                var_x_history.append(data['kalman.varPX'])
-                var_x_history.pop(0)
-                var_y_history.append(data['kalman.varPY'])
-                var_y_history.pop(0)
-                var_z_history.append(data['kalman.varPZ'])
-                var_z_history.pop(0)
-
-                min_x = min(var_x_history)
-                max_x = max(var_x_history)
-                min_y = min(var_y_history)
-                max_y = max(var_y_history)
-                min_z = min(var_z_history)
-                max_z = max(var_z_history)
-
-                x = data['kalman.stateX']
-                y = data['kalman.stateY']
-                z = data['kalman.stateZ']
-                has_valid_data = z < 0.25
-
-                has_converged = (max_x - min_x) < threshold and (max_y - min_y) < threshold and (max_z - min_z) < threshold and has_valid_data
-                timed_out = (time.time() - startTime) > Drone.ESTIMATOR_TIMEOUT_SEC
-                currentTime = time.time()
-                elapsed = 0 if lastTime is None else currentTime - lastTime
-                lastTime = currentTime
-
-                if has_converged:
-                    convergedDuration += elapsed
-                    if convergedDuration >= 1.5:
-                        message = "Sensors updated & position found. Current position: " + ("({:.2f}, {:.2f}, {:.2f})".format(x, y, z))
-                        Logger.log(message, self.swarmIndex)
-                        self.currentPosition = (float(x), float(y), float(z))
-                        break
-                else:
-                    convergedDuration = 0
-                    if timed_out:
-                        message = "Invalid position data received. Height: " + str(z)
-                        Logger.error(message, self.swarmIndex)
-                        self.setError()
-                        raise ConnectionAbortedError(message)
 
     def waitForTargetPosition(self, targetX, targetY, targetZ, minTime=None, timeoutSeconds=None):
-        startTime = time.time()
-        log_config = LogConfig(name='Kalman Position', period_in_ms=100)
-        log_config.add_variable('kalman.stateX', 'float')
-        log_config.add_variable('kalman.stateY', 'float')
-        log_config.add_variable('kalman.stateZ', 'float')
-        threshold = 0.1
-
-        timeAtTarget = 0
-        lastTime = None
-        commandIssued = False
-
         if not (self.crazyflie and self.crazyflie.cf and self.crazyflie.cf.link):
             return
 
-        with SyncLogger(self.crazyflie, log_config) as logger:
-            for log_entry in logger:
+        with Tracer.span("verify position", drone=self, target=(targetX, targetY, targetZ)):
+            reached = self.telemetry.waitUntil(self.atTarget(targetX, targetY, targetZ, minTime), timeoutSeconds)
 
-                exceptionUtil.checkInterrupt()
-                data = log_entry[1]
+        if not reached:
+            self.targetMissed()
+        self.targetReached(targetX, targetY, targetZ)
 
-                x = float(data['kalman.stateX'])
-                y = float(data['kalman.stateY'])
-                z = float(data['kalman.stateZ'])
-
-                has_converged = (abs(targetX - x) < threshold) and (abs(targetY - y) < threshold) and (abs(targetZ - z) < threshold)
-                timed_out = (time.time() - startTime) > timeoutSeconds if timeoutSeconds else False
-                currentTime = time.time()
-                elapsed = 0 if lastTime is None else currentTime - lastTime
-                lastTime = currentTime
+    async def waitForTargetPositionAsync(self, targetX, targetY, targetZ, minTime=None, timeoutSeconds=None):
+        if not (self.crazyflie and self.crazyflie.cf and self.crazyflie.cf.link):
+            return
 
-                if has_converged:
-                    timeAtTarget += elapsed
-                    commandIssued = False
-                    if minTime is None or timeAtTarget >= minTime:
-                        message = "Within threshold of target position " + ("({:.2f}, {:.2f}, {:.2f})".format(targetX, targetY, targetZ)) + \
-                            ". Current position: " + ("({:.2f}, {:.2f}, {:.2f})".format(x, y, z))
-                        Logger.log(message, self.swarmIndex)
-                        break
+        with Tracer.span("verify position", drone=self, target=(targetX, targetY, targetZ)):
+            reached = await self.telemetry.waitUntilAsync(self.atTarget(targetX, targetY, targetZ, minTime), timeoutSeconds)
 
-                else:
-                    timeAtTarget = 0
-                    if not commandIssued:
-                        distance = vectorMath.distance((x, y, z), (targetX, targetY, targetZ))
-                        travelTime = distance / Drone.MAX_VELOCITY
-                        self.commander.go_to(targetX, targetY, targetZ, 0, travelTime)
-                        commandIssued = True
+        if not reached:
+            self.targetMissed()
+        self.targetReached(targetX, targetY, targetZ)
 
-                    if timed_out:
-                        Logger.error("Drone failed to reach target position!", self.swarmIndex)
-                        self.setError()
-                        raise DroneException("Drone did not achieve the target position")
+    def atTarget(self, targetX, targetY, targetZ, minTime=None):
+        """
+        :return: A predicate on telemetry samples that holds once the drone stayed within the threshold
+        of the target for minTime, sending the drone to the target again whenever it leaves it
+        """
+        threshold = 0.1
+        state = {'timeAtTarget': 0, 'lastTime': None, 'commandIssued': False}
+
+        def atTarget(sample):
+            x, y, z = sample.position
+            elapsed = 0 if state['lastTime'] is None else sample.timestamp - state['lastTime']
+            state['lastTime'] = sample.timestamp
+
+            has_converged = (abs(targetX - x) < threshold) and (abs(targetY - y) < threshold) and (abs(targetZ - z) < threshold)
+            if has_converged:
+                state['timeAtTarget'] += elapsed
+                state['commandIssued'] = False
+                return minTime is None or state['timeAtTarget'] >= minTime
+
+            state['timeAtTarget'] = 0
+            if not state['commandIssued']:
+                distance = vectorMath.distance((x, y, z), (targetX, targetY, targetZ))
+                travelTime = distance / Drone.MAX_VELOCITY
+                self.commander.go_to(targetX, targetY, targetZ, 0, travelTime)
+                state['commandIssued'] = True
+            return False
+
+        return atTarget
+
+    def targetMissed(self):
+        Logger.error("Drone failed to reach target position!", self.swarmIndex)
+        self.setError()
+        raise DroneException("Drone did not achieve the target position")
 
+    def targetReached(self, targetX, targetY, targetZ):
+        x, y, z = self.telemetry.latest.position
+        message = "Within threshold of target position " + ("({:.2f}, {:.2f}, {:.2f})".format(targetX, targetY, targetZ)) + \
+            ". Current position: " + ("({:.2f}, {:.2f}, {:.2f})".format(x, y, z))
+        Logger.log(message, self.swarmIndex)
 
     def writeTrajectory(self, data):
         if self.crazyflie is None or len(data) == 0:
@@ -229,7 +217,14 @@ class Drone():
             raise ValueError("Cannot write trajectory data")
 
         trajectoryMemory = self.crazyflie.cf.mem.get_mems(MemoryElement.TYPE_TRAJ)[0]
-        self.write(lambda: trajectoryMemory.write_raw(data, self.writeComplete, self.writeFailed))
+        digest = UploadRegistry.digest(data)
+
+        if self.isUploaded(UploadRegistry.TRAJECTORY, digest, lambda: self.verifyMemory(trajectoryMemory, data)):
+            Logger.log("Trajectory unchanged, skipping upload", self.swarmIndex)
+        else:
+            self.invalidateUpload(UploadRegistry.TRAJECTORY)
+            self.write(lambda: trajectoryMemory.write_raw(data, self.writeComplete, self.writeFailed), "write trajectory", len(data))
+            self.recordUpload(UploadRegistry.TRAJECTORY, digest)
 
         exceptionUtil.checkInterrupt()
         self.crazyflie.cf.high_level_commander.define_trajectory_compressed(Drone.TRAJECTORY_ID, 0)
@@ -237,10 +232,20 @@ class Drone():
     def writeBaseStationData(self, geometryOne, geometryTwo):
         geo_dict = {0: geometryOne, 1: geometryTwo}
         helper = LighthouseMemHelper(self.crazyflie.cf)
+        digest = UploadRegistry.digestObjects(geo_dict, calibration.CALIBRATION_DATA)
+
+        verify = lambda: self.verifyBaseStationData(geo_dict, calibration.CALIBRATION_DATA)
+        if self.isUploaded(UploadRegistry.BASE_STATIONS, digest, verify):
+            Logger.log("Base station data unchanged, skipping upload", self.swarmIndex)
+            return False
+
         writer = LighthouseConfigWriter(self.crazyflie.cf, nr_of_base_stations=2)
-        self.write(lambda: helper.write_geos(geo_dict, self.writeComplete))
-        self.write(lambda: writer.write_and_store_config(self.writeComplete, geos=geo_dict, calibs=calibration.CALIBRATION_DATA))
+        self.invalidateUpload(UploadRegistry.BASE_STATIONS)
+        self.write(lambda: helper.write_geos(geo_dict, self.writeComplete), "write geometry")
+        self.write(lambda: writer.write_and_store_config(self.writeComplete, geos=geo_dict, calibs=calibration.CALIBRATION_DATA), "write lighthouse config")
+        self.recordUpload(UploadRegistry.BASE_STATIONS, digest)
         exceptionUtil.checkInterrupt()
+        return True
 
     def writeLedTimings(self, color_data):
         mems = self.crazyflie.cf.mem.get_mems(MemoryElement.TYPE_DRIVER_LEDTIMING)
@@ -248,17 +253,132 @@ class Drone():
             Logger.error("Could not upload LED data", self.swarmIndex)
             raise ValueError("Cannot write led timing data")
 
-        self.write(lambda: mems[0].write_raw(color_data, self.writeComplete))
+        digest = UploadRegistry.digest(color_data)
+        if self.isUploaded(UploadRegistry.LED_TIMINGS, digest, lambda: self.verifyMemory(mems[0], color_data)):
+            Logger.log("LED timings unchanged, skipping upload", self.swarmIndex)
+            return
+
+        self.invalidateUpload(UploadRegistry.LED_TIMINGS)
+        self.write(lambda: mems[0].write_raw(color_data, self.writeComplete), "write led timings", len(color_data))
+        self.recordUpload(UploadRegistry.LED_TIMINGS, digest)
         exceptionUtil.checkInterrupt()
 
+    # -- UPLOAD TRACKING -- #
+
+    def isUploaded(self, memoryType, digest, verify):
+        """
+        Check if the payload was the last one written to this memory, confirming with
+        the drone that its memory wasn't reset since (e.g. by a reboot)
+        """
+        if self.uploadRegistry is None or not self.uploadRegistry.isCurrent(self.address, memoryType, digest):
+            return False
+
+        if not verify():
+            self.invalidateUpload(memoryType)
+            return False
+
+        self.uploadRegistry.recordSkipped()
+        return True
+
+    def recordUpload(self, memoryType, digest):
+        if self.uploadRegistry is not None:
+            self.uploadRegistry.record(self.address, memoryType, digest)
+
+    def invalidateUpload(self, memoryType=None):
+        if self.uploadRegistry is not None:
+            self.uploadRegistry.invalidate(self.address, memoryType)
+
+    def verifyMemory(self, memory, data):
+        expected = bytes(data[:Drone.READ_BACK_LENGTH])
+        with Tracer.span("verify memory", drone=self, size=len(expected)):
+            return self.readMemory(memory, 0, len(expected)) == expected
+
+    def verifyBaseStationData(self, geometries, calibrations):
+        """
+        Read the lighthouse memory back & compare it to the given geometry & calibration data
+        """
+        helper = LighthouseMemHelper(self.crazyflie.cf)
+        with Tracer.span("verify base stations", drone=self):
+            storedGeometries = self.readAll(helper.read_all_geos)
+            if storedGeometries is None or not Drone.matchesStored(geometries, storedGeometries, Drone.geometryValues):
+                return False
+
+            storedCalibrations = self.readAll(helper.read_all_calibs)
+        return storedCalibrations is not None and Drone.matchesStored(calibrations, storedCalibrations, Drone.calibrationValues)
+
+    def readAll(self, readFunction):
+        result = {}
+        readEvent = Event()
+
+        def onRead(stored):
+            result.update(stored)
+            readEvent.set()
+
+        readFunction(onRead)
+        if not readEvent.wait(Drone.READ_BACK_TIMEOUT):
+            return None
+        return result
+
+    @staticmethod
+    def matchesStored(expected, stored, values):
+        for channel, item in expected.items():
+            storedItem = stored.get(channel)
+            if storedItem is None or storedItem.valid != item.valid:
+                return False
+
+            if any(abs(a - b) > Drone.GEOMETRY_TOLERANCE for a, b in zip(values(item), values(storedItem))):
+                return False
+
+        return True
+
+    @staticmethod
+    def geometryValues(geometry):
+        return list(geometry.origin) + [value for row in geometry.rotation_matrix for value in row]
+
+    @staticmethod
+    def calibrationValues(calibration):
+        values = [calibration.uid]
+        for sweep in calibration.sweeps:
+            values += [sweep.phase, sweep.tilt, sweep.curve, sweep.gibmag, sweep.gibphase, sweep.ogeemag, sweep.ogeephase]
+        return values
+
+    def readMemory(self, memory, address, length):
+        memoryHandler = self.crazyflie.cf.mem
+        result = {}
+        readEvent = Event()
+
+        def onRead(readMemory, readAddress, data):
+            if readMemory.id == memory.id and readAddress == address:
+                result['data'] = bytes(data)
+                readEvent.set()
+
+        memoryHandler.mem_read_cb.add_callback(onRead)
+        try:
+            if not memoryHandler.read(memory, address, length):
+                return None
+
+            if not readEvent.wait(Drone.READ_BACK_TIMEOUT):
+                # Drop the unanswered request, so later reads of this memory aren't refused
+                if hasattr(memoryHandler, 'cancel_read'):
+                    memoryHandler.cancel_read(memory)
+                else:
+                    memoryHandler._read_requests.pop(memory.id, None)
+                return None
+        finally:
+            memoryHandler.mem_read_cb.remove_callback(onRead)
+
+        return result.get('data')
+
     # -- DATA UTILS -- #
 
-    def write(self, writeOperation):
+    def write(self, writeOperation, name="memory write", size=None):
         self.writeSuccess = False
         self.writeEvent.clear()
-        writeOperation()
 
-        self.writeEvent.wait()
+        with Tracer.span(name, drone=self, size=size):
+            writeOperation()
+            self.writeEvent.wait()
+
         if not self.writeSuccess:
             raise Exception("Write failed!")
 
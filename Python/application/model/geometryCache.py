@@ -0,0 +1,78 @@
+import json
+import os
+
+import numpy as np
+
+
+class GeometryCache():
+    """
+    On-disk record of the last pose of every base station, keyed by serial number. Base stations
+    rarely move between shows, so poses that only differ by tracking noise are replaced with the
+    recorded ones. That keeps the geometry identical from run to run, so drones that already hold
+    it don't need a new upload or an estimator reset.
+    """
+
+    FILE = './cache/baseStations.json'
+
+    def __init__(self, file=FILE, positionTolerance=0.01, rotationTolerance=0.01):
+        self.file = file
+        self.positionTolerance = positionTolerance
+        self.rotationTolerance = rotationTolerance
+        self.poses = self.load()
+
+    def load(self):
+        try:
+            with open(self.file, 'r') as cacheFile:
+                return json.load(cacheFile)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.file), exist_ok=True)
+            with open(self.file, 'w') as cacheFile:
+                json.dump(self.poses, cacheFile, indent=2)
+        except OSError:
+            # Cache is best effort, the next run just uploads again
+            pass
+
+    def hasMoved(self, serial, geometry):
+        pose = self.poses.get(serial)
+        if pose is None:
+            return True
+
+        positionChange = np.max(np.abs(np.subtract(geometry.origin, pose['origin'])))
+        rotationChange = np.max(np.abs(np.subtract(geometry.rotation_matrix, pose['rotation'])))
+        return positionChange > self.positionTolerance or rotationChange > self.rotationTolerance
+
+    def apply(self, serial, geometry):
+        """
+        Replace the pose of the geometry with the recorded one
+        """
+        pose = self.poses[serial]
+        geometry.origin = list(pose['origin'])
+        geometry.rotation_matrix = [list(row) for row in pose['rotation']]
+
+    def record(self, serial, geometry):
+        self.poses[serial] = {
+            'origin': [float(value) for value in geometry.origin],
+            'rotation': [[float(value) for value in row] for row in geometry.rotation_matrix]
+        }
+
+    def update(self, stations):
+        """
+        Compare fresh base station poses to the recorded ones
+        :param stations: (serial, LighthouseBsGeometry) for every base station
+        :return: Serial numbers of the base stations that moved
+        """
+        moved = [serial for serial, geometry in stations if self.hasMoved(serial, geometry)]
+
+        for serial, geometry in stations:
+            if serial in moved:
+                self.record(serial, geometry)
+            else:
+                self.apply(serial, geometry)
+
+        if len(moved) > 0:
+            self.save()
+        return moved
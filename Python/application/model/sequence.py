@@ -2,67 +2,89 @@ import os
 
 
 class Sequence():
-    def __init__(self, name, location, data):
+    def __init__(self, name, location, droneCount, length, startPositions, startColors, source=None, extension=".json", priorities=None):
         self.name = name
         self.location = location
-        self.sequenceData = data
+        self.extension = extension
+        self.droneCount = droneCount
+        self.length = length
 
-        if not "Tracks" in data or not "DroneCount" in data or not "Length" in data:
-            raise ValueError("Could not parse sequence data")
+        # Lightweight header index, always resident
+        self.startPositions = startPositions
+        self.startColors = startColors
+        self.priorities = priorities
+
+        # Track payloads are only materialized on first access, and can be evicted again
+        self.source = source
+        self.loadedTracks = {}
 
     @property
     def drones(self):
-        return self.sequenceData["DroneCount"]
+        return self.droneCount
 
     @property
     def displayedDroneCount(self):
-        return max(self.sequenceData["DroneCount"], 0)
+        return max(self.droneCount, 0)
 
     @property
     def duration(self):
-        return float(self.sequenceData["Length"])
+        return float(self.length)
 
     @property
-    def tracks(self):
-        return self.sequenceData['Tracks']
+    def trackCount(self):
+        return len(self.startPositions)
 
     @property
     def fullPath(self):
-        return os.path.join(self.location, self.name + ".json")
+        return os.path.join(self.location, self.name + self.extension)
 
     @property
     def allStartingPositions(self):
-        return [self.getStartingPosition(i) for i in range(0, len(self.tracks))]
+        return list(self.startPositions)
+
+    @property
+    def allPriorities(self):
+        return list(self.priorities) if self.priorities is not None else [0.0] * self.trackCount
+
+    @property
+    def hasPriorities(self):
+        return self.priorities is not None and any(priority != 0.0 for priority in self.priorities)
+
+    @property
+    def tracksLoaded(self):
+        return len(self.loadedTracks) > 0
 
     def getTrack(self, swarmIndex):
-        allTracks = self.sequenceData["Tracks"]
-        trackCount = len(allTracks)
-        if swarmIndex >= 0 and swarmIndex < trackCount:
-            return allTracks[swarmIndex]
+        if not self.isValidIndex(swarmIndex):
+            return None
+
+        track = self.loadedTracks.get(swarmIndex)
+        if track is None and self.source is not None:
+            track = self.source.loadTrack(swarmIndex)
+            self.loadedTracks[swarmIndex] = track
 
-        return None
+        return track
+
+    def evictTracks(self):
+        self.loadedTracks = {}
+        if self.source is not None:
+            self.source.release()
 
     def getStartingColor(self, swarmIndex):
-        track = self.getTrack(swarmIndex)
-        if track is None:
+        if not self.isValidIndex(swarmIndex):
             return None
 
-        if 'StartColor' in track:
-            color = track['StartColor']
-            r, g, b = [color[key] for key in ('r', 'g', 'b')]
-            return int(r), int(g), int(b)
-        else:
-            return 0, 0, 0
+        return self.startColors[swarmIndex]
 
     def getStartingPosition(self, swarmIndex):
-        track = self.getTrack(swarmIndex)
-        if track is None:
+        if not self.isValidIndex(swarmIndex):
             return None
 
-        startPosition = track['StartPosition']
-        x, y, z = [startPosition[key] for key in ('x', 'y', 'z')]
-        return float(x), float(y), float(z)
+        return self.startPositions[swarmIndex]
+
+    def isValidIndex(self, swarmIndex):
+        return swarmIndex is not None and swarmIndex >= 0 and swarmIndex < self.trackCount
 
 
 # -- Special Static Instance -- #
-Sequence.EMPTY = Sequence("Takeoff & Landing Test", "", {"DroneCount" : -1, "Length" : 0, "Tracks": []})
+Sequence.EMPTY = Sequence("Takeoff & Landing Test", "", -1, 0, [], [])
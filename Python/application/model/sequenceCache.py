@@ -0,0 +1,70 @@
+import hashlib
+import os
+
+from . import sequenceFile
+
+
+class SequenceCache():
+    """
+    On-disk cache of validated sequences in the packed format. Entries are keyed by the source
+    path, modification time & size, so editing or replacing a sequence file invalidates its entry,
+    & by the packed format version, so entries written by an older version are rebuilt.
+    """
+
+    DIRECTORY = './cache/sequences'
+
+    def __init__(self, directory=DIRECTORY):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, file):
+        # Packed files are already as cheap to open as a cache entry
+        if sequenceFile.isPacked(file):
+            return sequenceFile.loadPacked(file)
+
+        stat = os.stat(file)
+        prefix = self.getPrefix(file)
+        key = "-".join((prefix, "v" + str(sequenceFile.VERSION), str(stat.st_mtime_ns), str(stat.st_size)))
+        cachedFile = os.path.join(self.directory, key + sequenceFile.EXTENSION)
+
+        if os.path.exists(cachedFile):
+            try:
+                sequence = sequenceFile.loadPacked(cachedFile, file)
+                self.hits += 1
+                return sequence
+            except (OSError, ValueError):
+                self.removeEntry(cachedFile)
+
+        self.misses += 1
+        sequenceData = sequenceFile.readJson(file)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.removeStale(prefix)
+            sequenceFile.convertData(sequenceData, cachedFile)
+        except OSError:
+            # Cache is best effort, fall back to reading the original file
+            return sequenceFile.loadJson(file)
+
+        return sequenceFile.loadPacked(cachedFile, file)
+
+    def getPrefix(self, file):
+        normalizedPath = os.path.normcase(os.path.abspath(file))
+        return hashlib.sha1(normalizedPath.encode('utf-8')).hexdigest()
+
+    def removeStale(self, prefix):
+        for entry in os.listdir(self.directory):
+            if entry.startswith(prefix):
+                self.removeEntry(os.path.join(self.directory, entry))
+
+    def removeEntry(self, entry):
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
+
+    @property
+    def hitRate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
@@ -0,0 +1,241 @@
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+from threading import Lock
+
+from .sequence import Sequence
+from .track import Track
+
+# Packed sequence format (all values little endian):
+#
+#   Header       magic (4s), version (H), drone count (h), length (f), track count (I)
+#   Track index  one fixed size entry per track, see TRACK_ENTRY below
+#   Blob area    track names, compressed trajectories & LED timings, referenced by absolute offsets
+#
+# Loading only reads the header & index. The file is mapped into memory on the first track access,
+# so every track payload is a zero-copy memoryview slice that can be handed straight to the memory writers.
+
+EXTENSION = ".dseq"
+MAGIC = b'DMSQ'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHhfI')
+
+# name offset, name length, track length, start position (x, y, z), start color (r, g, b),
+# trajectory offset, trajectory length, LED timing offset, LED timing length, priority
+TRACK_ENTRY = struct.Struct('<IHxxf3f3BxIIIIf')
+
+# Version 1 entries have no priority, it's read back as 0
+TRACK_ENTRIES = {
+    1: struct.Struct('<IHxxf3f3BxIIII'),
+    2: TRACK_ENTRY,
+}
+
+
+def isPacked(file):
+    return str(file).lower().endswith(EXTENSION)
+
+
+def splitPath(file):
+    path = pathlib.Path(file)
+    name, extension = os.path.splitext(path.name)
+    return name, str(path.parent), extension
+
+
+def loadSequence(file):
+    if isPacked(file):
+        return loadPacked(file)
+    return loadJson(file)
+
+
+def loadJson(file):
+    sequenceData = readJson(file)
+    droneCount, length = validateJson(sequenceData)
+
+    try:
+        headers = [Track.parseHeader(trackData) for trackData in sequenceData["Tracks"]]
+    except (KeyError, TypeError):
+        raise ValueError("Could not parse track data")
+
+    # Only the header index is kept, the payloads are re-read from the file when first needed
+    name, location, extension = splitPath(file)
+    startPositions = [position for position, _, _ in headers]
+    startColors = [color for _, color, _ in headers]
+    priorities = [priority for _, _, priority in headers]
+    return Sequence(name, location, droneCount, length, startPositions, startColors, JsonSource(file), extension, priorities)
+
+
+def loadPacked(file, displayedFile=None):
+    source = PackedSource(file)
+    name, location, extension = splitPath(displayedFile if displayedFile is not None else file)
+    startPositions = [entry[3:6] for entry in source.entries]
+    startColors = [entry[6:9] for entry in source.entries]
+    priorities = [entry[13] for entry in source.entries]
+    return Sequence(name, location, source.droneCount, source.length, startPositions, startColors, source, extension, priorities)
+
+
+def validateJson(sequenceData):
+    if not "Tracks" in sequenceData or not "DroneCount" in sequenceData or not "Length" in sequenceData:
+        raise ValueError("Could not parse sequence data")
+
+    return int(sequenceData["DroneCount"]), float(sequenceData["Length"])
+
+
+def readJson(file):
+    with open(file, 'r') as jsonFile:
+        try:
+            return json.load(jsonFile)
+        except json.JSONDecodeError:
+            raise ValueError("Could not parse sequence file: " + str(file))
+
+
+class JsonSource():
+
+    def __init__(self, file):
+        self.file = file
+        self.tracks = None
+        # Tracks are loaded by background checks while the GUI thread may release them
+        self.lock = Lock()
+
+    def loadTrack(self, index):
+        with self.lock:
+            # JSON can't be read partially, so the first access parses every track at once
+            if self.tracks is None:
+                try:
+                    self.tracks = [Track.fromJson(trackData) for trackData in readJson(self.file)["Tracks"]]
+                except (KeyError, TypeError):
+                    raise ValueError("Could not parse track data")
+
+            if index >= len(self.tracks):
+                raise ValueError("Sequence file changed since it was loaded: " + str(self.file))
+
+            return self.tracks[index]
+
+    def release(self):
+        with self.lock:
+            self.tracks = None
+
+
+class PackedSource():
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = None
+        self.lock = Lock()
+
+        with open(file, 'rb') as packedFile:
+            header = packedFile.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError("Sequence file is truncated: " + str(file))
+
+            magic, version, self.droneCount, self.length, trackCount = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError("Not a packed sequence file: " + str(file))
+
+            if version not in TRACK_ENTRIES:
+                raise ValueError("Unsupported packed sequence version: " + str(version))
+
+            trackEntry = TRACK_ENTRIES[version]
+            index = packedFile.read(trackCount * trackEntry.size)
+            if len(index) < trackCount * trackEntry.size:
+                raise ValueError("Packed sequence index is truncated: " + str(file))
+
+        # Fill in the priority for version 1 entries
+        padding = (0.0,) if version == 1 else ()
+        self.entries = [entry + padding for entry in trackEntry.iter_unpack(index)]
+
+    def loadTrack(self, index):
+        with self.lock:
+            if self.buffer is None:
+                with open(self.file, 'rb') as packedFile:
+                    # The mapping stays valid after the file handle is closed
+                    self.buffer = memoryview(mmap.mmap(packedFile.fileno(), 0, access=mmap.ACCESS_READ))
+            buffer = self.buffer
+
+        nameOffset, nameLength, trackLength, x, y, z, r, g, b, \
+            trajectoryOffset, trajectoryLength, ledOffset, ledLength, priority = self.entries[index]
+
+        if max(nameOffset + nameLength, trajectoryOffset + trajectoryLength, ledOffset + ledLength) > len(buffer):
+            raise ValueError("Packed sequence data is truncated: " + str(self.file))
+
+        trackName = bytes(buffer[nameOffset:nameOffset + nameLength]).decode('utf-8')
+        trajectory = buffer[trajectoryOffset:trajectoryOffset + trajectoryLength]
+        ledTimings = buffer[ledOffset:ledOffset + ledLength]
+        return Track(trackName, trackLength, (x, y, z), (r, g, b), trajectory, ledTimings, priority)
+
+    def release(self):
+        # Slices may still be referenced by an upload in progress, so the mapping is
+        # unmapped by the garbage collector once the last slice is gone
+        with self.lock:
+            self.buffer = None
+
+
+def pack(sequence):
+    tracks = [sequence.getTrack(index) for index in range(0, sequence.trackCount)]
+    return packTracks(sequence.drones, sequence.duration, tracks)
+
+
+def packTracks(droneCount, length, tracks):
+    blobOffset = HEADER.size + len(tracks) * TRACK_ENTRY.size
+    header = HEADER.pack(MAGIC, VERSION, droneCount, length, len(tracks))
+
+    entries = bytearray()
+    blobs = bytearray()
+
+    def appendBlob(data):
+        offset = blobOffset + len(blobs)
+        blobs.extend(data)
+        return offset, len(data)
+
+    for track in tracks:
+        nameOffset, nameLength = appendBlob(track.name.encode('utf-8'))
+        trajectoryOffset, trajectoryLength = appendBlob(track.trajectory)
+        ledOffset, ledLength = appendBlob(track.ledTimings)
+
+        x, y, z = track.startPosition
+        r, g, b = track.startColor
+        entries.extend(TRACK_ENTRY.pack(
+            nameOffset, nameLength, track.length, x, y, z, r, g, b,
+            trajectoryOffset, trajectoryLength, ledOffset, ledLength, track.priority
+        ))
+
+    return header + bytes(entries) + bytes(blobs)
+
+
+def writePacked(sequence, file):
+    writeFile(pack(sequence), file)
+
+
+def writeFile(data, file):
+    # Write to a temporary file first, so a partially written file is never picked up
+    temporaryFile = str(file) + ".tmp"
+    with open(temporaryFile, 'wb') as packedFile:
+        packedFile.write(data)
+
+    os.replace(temporaryFile, file)
+
+
+def convert(jsonFile, packedFile=None):
+    if packedFile is None:
+        packedFile = os.path.splitext(jsonFile)[0] + EXTENSION
+
+    convertData(readJson(jsonFile), packedFile)
+    return packedFile
+
+
+def convertData(sequenceData, packedFile):
+    droneCount, length = validateJson(sequenceData)
+    try:
+        tracks = [Track.fromJson(trackData) for trackData in sequenceData["Tracks"]]
+    except (KeyError, TypeError):
+        raise ValueError("Could not parse track data")
+
+    writeFile(packTracks(droneCount, length, tracks), packedFile)
+
+
+if __name__ == '__main__':
+    for sequenceFile in sys.argv[1:]:
+        print("Converted", sequenceFile, "->", convert(sequenceFile))
@@ -0,0 +1,40 @@
+
+class Track():
+    def __init__(self, name, length, startPosition, startColor, trajectory, ledTimings, priority=0.0):
+        self.name = name
+        self.length = length
+        self.startPosition = startPosition
+        self.startColor = startColor
+
+        # Tracks with a higher priority are filled first when there are fewer drones than tracks
+        self.priority = priority
+
+        # Raw firmware payloads, either bytes or zero-copy memoryview slices of a packed sequence file
+        self.trajectory = trajectory
+        self.ledTimings = ledTimings
+
+    @staticmethod
+    def parseHeader(trackData):
+        startPosition = trackData['StartPosition']
+        x, y, z = [float(startPosition[key]) for key in ('x', 'y', 'z')]
+
+        startColor = (0, 0, 0)
+        if 'StartColor' in trackData:
+            color = trackData['StartColor']
+            startColor = tuple(int(color[key]) for key in ('r', 'g', 'b'))
+
+        priority = float(trackData.get('Priority', 0.0))
+        return (x, y, z), startColor, priority
+
+    @staticmethod
+    def fromJson(trackData):
+        startPosition, startColor, priority = Track.parseHeader(trackData)
+        return Track(
+            trackData.get('Name', ""),
+            float(trackData.get('Length', 0.0)),
+            startPosition,
+            startColor,
+            bytes(trackData.get('CompressedTrajectory', [])),
+            bytes(trackData.get('LedTimings', [])),
+            priority
+        )
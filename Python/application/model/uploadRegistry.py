@@ -0,0 +1,50 @@
+import hashlib
+import json
+from threading import Lock
+
+
+class UploadRegistry():
+    """
+    Remembers a digest of the payload last written to each memory of each drone. Drones keep their
+    memory contents across reconnects, so re-running a sequence with the same drones can skip
+    every upload that didn't change.
+    """
+
+    TRAJECTORY = "trajectory"
+    LED_TIMINGS = "ledTimings"
+    BASE_STATIONS = "baseStations"
+
+    def __init__(self):
+        self.digests = {}
+        self.lock = Lock()
+        self.written = 0
+        self.skipped = 0
+
+    def isCurrent(self, uri, memoryType, digest):
+        with self.lock:
+            return self.digests.get((uri, memoryType)) == digest
+
+    def record(self, uri, memoryType, digest):
+        with self.lock:
+            self.digests[(uri, memoryType)] = digest
+            self.written += 1
+
+    def recordSkipped(self):
+        with self.lock:
+            self.skipped += 1
+
+    def invalidate(self, uri, memoryType=None):
+        with self.lock:
+            for key in list(self.digests.keys()):
+                if key[0] == uri and (memoryType is None or key[1] == memoryType):
+                    del self.digests[key]
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha1(bytes(data)).hexdigest()
+
+    @staticmethod
+    def digestObjects(*objects):
+        # Geometry & calibration objects are plain attribute containers, which may hold numpy arrays
+        serialized = json.dumps(objects, default=lambda value: value.tolist() if hasattr(value, 'tolist') else vars(value), sort_keys=True)
+        return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
@@ -1 +1,2 @@
-from .matcher import DroneMatcher
\ No newline at end of file
+from .matcher import DroneMatcher
+from .transition import TransitionPlan, planTransition
\ No newline at end of file
@@ -0,0 +1,117 @@
+import numpy as np
+
+# SciPy ships a compiled solver for the same problem, use it when it's installed
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def distanceMatrix(origins, targets):
+    """
+    Euclidean distance between every origin & every target, shape (origins, targets)
+    """
+    origins = np.asarray(origins, dtype=float).reshape(-1, 3)
+    targets = np.asarray(targets, dtype=float).reshape(-1, 3)
+    return np.linalg.norm(origins[:, np.newaxis, :] - targets[np.newaxis, :, :], axis=2)
+
+
+def linearAssignment(costs, useScipy=True):
+    """
+    Minimum cost assignment of rows to columns. When the matrix isn't square, every row of the
+    smaller dimension gets assigned. Returns the row & column indexes of the assignment, sorted by row.
+
+    :param costs: Cost matrix, shape (rows, columns)
+    :param useScipy: Use SciPy's solver when it's installed
+    :return: rows, columns
+    """
+    costs = np.asarray(costs, dtype=float)
+    if costs.ndim != 2:
+        raise ValueError("Cost matrix must be 2 dimensional")
+
+    if costs.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    if not np.all(np.isfinite(costs)):
+        raise ValueError("Cost matrix contains invalid entries")
+
+    if useScipy and linear_sum_assignment is not None:
+        rows, columns = linear_sum_assignment(costs)
+        return rows.astype(int), columns.astype(int)
+
+    # The solver assigns every row, so it needs at least as many columns
+    if costs.shape[0] > costs.shape[1]:
+        columns, rows = shortestAugmentingPath(costs.T)
+        order = np.argsort(rows)
+        return rows[order], columns[order]
+
+    return shortestAugmentingPath(costs)
+
+
+def shortestAugmentingPath(costs):
+    """
+    Jonker-Volgenant style solver: rows are added one at a time, each along the shortest
+    augmenting path found with Dijkstra over the reduced costs. O(n³) overall, with the
+    inner scan over the columns done by NumPy.
+    """
+    rowCount, columnCount = costs.shape
+
+    # Subtracting the row minimums keeps the reduced costs small, without changing the assignment
+    costs = costs - costs.min(axis=1, keepdims=True)
+
+    rowDuals = np.zeros(rowCount)
+    columnDuals = np.zeros(columnCount)
+    columnForRow = np.full(rowCount, -1, dtype=int)
+    rowForColumn = np.full(columnCount, -1, dtype=int)
+
+    for currentRow in range(0, rowCount):
+        pathCosts = np.full(columnCount, np.inf)
+        previousRow = np.full(columnCount, -1, dtype=int)
+        visitedRows = [currentRow]
+        visitedColumns = np.zeros(columnCount, dtype=bool)
+
+        minimum = 0.0
+        row = currentRow
+        sink = -1
+
+        while sink == -1:
+            reduced = minimum + costs[row] - rowDuals[row] - columnDuals
+            improved = (reduced < pathCosts) & ~visitedColumns
+            pathCosts[improved] = reduced[improved]
+            previousRow[improved] = row
+
+            # Closest unvisited column, preferring a free one on ties so the path ends early
+            candidates = np.where(visitedColumns, np.inf, pathCosts)
+            lowest = candidates.min()
+            if lowest == np.inf:
+                raise ValueError("Cost matrix is infeasible")
+
+            closest = np.flatnonzero(candidates == lowest)
+            free = closest[rowForColumn[closest] == -1]
+            column = free[0] if len(free) > 0 else closest[0]
+
+            minimum = lowest
+            visitedColumns[column] = True
+            if rowForColumn[column] == -1:
+                sink = column
+            else:
+                row = rowForColumn[column]
+                visitedRows.append(row)
+
+        # Update the duals for everything the search touched
+        rowDuals[currentRow] += minimum
+        otherRows = np.array(visitedRows[1:], dtype=int)
+        if len(otherRows) > 0:
+            rowDuals[otherRows] += minimum - pathCosts[columnForRow[otherRows]]
+        columnDuals[visitedColumns] -= minimum - pathCosts[visitedColumns]
+
+        # Flip the assignments along the path back to the current row
+        column = sink
+        while True:
+            row = previousRow[column]
+            rowForColumn[column] = row
+            columnForRow[row], column = column, columnForRow[row]
+            if row == currentRow:
+                break
+
+    return np.arange(0, rowCount), columnForRow
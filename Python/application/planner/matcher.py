@@ -1,25 +1,51 @@
-from munkres import Munkres
-from application.util.vectorMath import distance
+import numpy as np
+
+from application.planner.assignment import distanceMatrix, linearAssignment
 from application.constants import Constants
 
 class DroneMatcher:
 
     @staticmethod
-    def assign(drones, positions):
-        solver = Munkres()
-        costMatrix = [DroneMatcher.getCostArray(drone, positions) for drone in drones]
+    def assign(drones, positions, priorities=None):
+        """
+        Match drones to tracks, minimizing the total distance from the takeoff positions to the
+        track start positions. With fewer drones than tracks the best subset of tracks is filled,
+        preferring tracks with a higher priority. Spare drones are left without a track & target
+        the position they rest at, as they stay on the ground.
+
+        :param drones: Drones to assign
+        :param positions: Start position of every track
+        :param priorities: Optional priority of every track
+        """
+        costMatrix = DroneMatcher.getCostMatrix(drones, positions)
+        if priorities is not None and len(drones) < len(positions):
+            costMatrix = DroneMatcher.weightPriorities(costMatrix, priorities)
 
-        if (len(costMatrix) != len((costMatrix[0]))):
-            raise ValueError("Number of tracks and drones must be equal to do matching!")
+        for drone in drones:
+            drone.trackIndex = None
+            drone.targetPosition = tuple(drone.currentPosition)
 
-        result = solver.compute(costMatrix)
-        for assignment in result:
-            droneIndex, positionIndex = assignment
-            drones[droneIndex].trackIndex = positionIndex
+        rows, columns = linearAssignment(costMatrix)
+        for droneIndex, positionIndex in zip(rows, columns):
+            drones[droneIndex].trackIndex = int(positionIndex)
             drones[droneIndex].targetPosition = positions[positionIndex]
 
     @staticmethod
-    def getCostArray(drone, positions):
-        x, y, z = drone.currentPosition
-        takeoffPosition = (x, y, Constants.MIN_HEIGHT)
-        return [distance(takeoffPosition, position) for position in positions]
\ No newline at end of file
+    def getCostMatrix(drones, positions):
+        # Drones are matched from the point they reach after the synchronized takeoff
+        takeoffPositions = np.array([drone.currentPosition for drone in drones], dtype=float).reshape(-1, 3)
+        takeoffPositions[:, 2] = Constants.MIN_HEIGHT
+        return distanceMatrix(takeoffPositions, positions)
+
+    @staticmethod
+    def weightPriorities(costMatrix, priorities):
+        priorities = np.asarray(priorities, dtype=float)
+        levels = np.unique(priorities)
+        if len(levels) < 2:
+            return costMatrix
+
+        # Each step in priority outweighs any difference in total distance, so the highest priority
+        # tracks are always filled & distance only decides between tracks of equal priority
+        smallestStep = np.min(np.diff(levels))
+        weight = (np.max(costMatrix) * min(costMatrix.shape) + 1.0) / smallestStep
+        return costMatrix - priorities[np.newaxis, :] * weight
\ No newline at end of file
@@ -0,0 +1,182 @@
+import time
+
+import numpy as np
+
+# Candidate delays checked together for each drone
+DELAY_BATCH = 32
+
+# Fraction of their closest spacing that pairs starting or ending near each other have to keep
+INHERENT_CLEARANCE = 0.75
+
+# Times the plan is redone to resolve a conflict before the remaining ones are given up on
+MAX_REPAIRS = 50
+
+
+def goToProgress(phase):
+    """
+    Fraction of the distance covered by a high level commander go_to at the given phase (0 - 1)
+    of its duration. The firmware plans a 7th degree polynomial with zero velocity, acceleration
+    & jerk at both ends.
+    """
+    phase = np.clip(phase, 0.0, 1.0)
+    return phase ** 4 * (35.0 + phase * (-84.0 + phase * (70.0 - 20.0 * phase)))
+
+
+class TransitionPlan():
+
+    def __init__(self, delays, travelTimes, goalIndexes, conflicts, elapsed):
+        # Seconds each drone waits before starting its go_to, and the duration of the go_to
+        self.delays = delays
+        self.travelTimes = travelTimes
+
+        # Goal each drone flies to, drones trade goals when that's the only way to keep them apart
+        self.goalIndexes = goalIndexes
+
+        # Pairs of drones that could not be separated by delaying or trading goals
+        self.conflicts = conflicts
+        self.elapsed = elapsed
+
+    @property
+    def duration(self):
+        if len(self.delays) == 0:
+            return 0.0
+        return float(np.max(self.delays + self.travelTimes))
+
+
+def planTransition(starts, goals, maxVelocity, safetyDistance, timeStep=0.05, order=None):
+    """
+    Plan straight line go_to moves from the start to the goal of every drone, delaying drones so
+    no two come closer than the safety distance. Drones are planned one at a time, in the given
+    order or longest move first, each taking the earliest delay that keeps it clear of every drone
+    planned before it. Moves are checked on a time grid, following the go_to velocity profile.
+
+    A drone that can't be kept clear of a drone planned before it is planned first instead. When
+    that doesn't help, like for a drone that has to pass one holding its position, the pair trade
+    goals, so the goals the drones end up with have to be taken from goalIndexes.
+
+    :param starts: Start position of every drone, shape (drones, 3)
+    :param goals: Goal position of every drone, shape (drones, 3)
+    :param maxVelocity: Average velocity of a move, in m/s
+    :param safetyDistance: Required distance between any two drones, in meters
+    :param timeStep: Resolution of the time grid, in seconds
+    :param order: Optional planning order, as a list of drone indexes
+    :return: TransitionPlan
+    """
+    startTime = time.perf_counter()
+    starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+    goals = np.asarray(goals, dtype=float).reshape(-1, 3)
+    droneCount = len(starts)
+
+    goalIndexes = np.arange(0, droneCount)
+    if order is None:
+        order = np.argsort(-np.linalg.norm(goals - starts, axis=1), kind='stable')
+    order = [int(drone) for drone in order]
+
+    delaySteps, stepCounts, conflicts = planOrder(starts, goals, maxVelocity, safetyDistance, timeStep, order)
+    unresolved = set()
+
+    for _ in range(0, MAX_REPAIRS):
+        pending = [pair for pair in conflicts if pair not in unresolved]
+        if len(pending) == 0:
+            break
+
+        # Plan the drone that got stuck first, then try trading goals, planning either drone first
+        drone, other = pending[0]
+        traded = goalIndexes.copy()
+        traded[[drone, other]] = traded[[other, drone]]
+        droneFirst = [drone] + [index for index in order if index != drone]
+        otherFirst = [other] + [index for index in order if index != other]
+        candidates = [(goalIndexes, droneFirst), (traded, order), (traded, droneFirst), (traded, otherFirst)]
+
+        for candidateGoals, candidateOrder in candidates:
+            candidate = planOrder(starts, goals[candidateGoals], maxVelocity, safetyDistance, timeStep, candidateOrder)
+            if len(candidate[2]) < len(conflicts):
+                goalIndexes, order = candidateGoals, candidateOrder
+                delaySteps, stepCounts, conflicts = candidate
+                break
+        else:
+            unresolved.add((drone, other))
+
+    return TransitionPlan(delaySteps * timeStep, stepCounts * timeStep, goalIndexes, conflicts, time.perf_counter() - startTime)
+
+
+def planOrder(starts, goals, maxVelocity, safetyDistance, timeStep, order):
+    """
+    Plan the drones one at a time in the given order
+    :return: Delay & travel time of every drone in time steps, & the conflicting pairs of drones
+    """
+    droneCount = len(starts)
+    distances = np.linalg.norm(goals - starts, axis=1)
+    stepCounts = np.ceil(distances / maxVelocity / timeStep).astype(int)
+
+    # Sampled path of every move, padded at the goal to the longest move
+    longest = int(np.max(stepCounts, initial=0))
+    phases = np.arange(0, longest + 1)[np.newaxis, :] / np.maximum(stepCounts, 1)[:, np.newaxis]
+    paths = starts[:, np.newaxis, :] + (goals - starts)[:, np.newaxis, :] * goToProgress(phases)[..., np.newaxis]
+
+    # Swept volume of each move, for ruling out pairs that can never meet
+    lower = np.minimum(starts, goals)
+    upper = np.maximum(starts, goals)
+
+    delaySteps = np.zeros(droneCount, dtype=int)
+    planned = []
+    conflicts = []
+
+    for drone in order:
+        neighbours = [other for other in planned if
+                      np.all(lower[drone] - safetyDistance < upper[other]) and np.all(lower[other] - safetyDistance < upper[drone])]
+
+        if len(neighbours) > 0:
+            neighbours = np.array(neighbours)
+
+            # Pairs already closer than the safety distance at their starts or goals can't be helped
+            # by any delay. They only need to keep most of that distance, since approaching the final
+            # spacing from the side briefly dips below it
+            inherent = np.minimum(
+                np.linalg.norm(starts[neighbours] - starts[drone], axis=1),
+                np.linalg.norm(goals[neighbours] - goals[drone], axis=1)
+            )
+            thresholds = np.where(inherent < safetyDistance, INHERENT_CLEARANCE * inherent, safetyDistance)
+
+            delay, clear = findDelay(drone, neighbours, thresholds, paths, stepCounts, delaySteps)
+            delaySteps[drone] = delay
+            conflicts += [(int(drone), int(other)) for other in neighbours[~clear]]
+
+        planned.append(drone)
+
+    return delaySteps, stepCounts, conflicts
+
+
+def findDelay(drone, neighbours, thresholds, paths, stepCounts, delaySteps):
+    """
+    Earliest delay (in time steps) for the drone that keeps it clear of all its neighbours.
+    Falls back to the delay that conflicts with the fewest neighbours when there is none
+    """
+    # Once every neighbour has arrived, waiting any longer can't help
+    latest = int(np.max(delaySteps[neighbours] + stepCounts[neighbours]))
+    bestDelay, bestClear = 0, None
+
+    for firstDelay in range(0, latest + 1, DELAY_BATCH):
+        candidates = np.arange(firstDelay, min(firstDelay + DELAY_BATCH, latest + 1))
+        horizon = max(latest, int(candidates[-1]) + int(stepCounts[drone])) + 1
+        steps = np.arange(0, horizon)
+
+        # Positions on the time grid, for every candidate delay & every neighbour
+        ownSteps = np.clip(steps[np.newaxis, :] - candidates[:, np.newaxis], 0, stepCounts[drone])
+        own = paths[drone][ownSteps]
+        otherSteps = np.clip(steps[np.newaxis, :] - delaySteps[neighbours][:, np.newaxis], 0, stepCounts[neighbours][:, np.newaxis])
+        others = paths[neighbours[:, np.newaxis], otherSteps]
+
+        separation = np.linalg.norm(own[:, np.newaxis, :, :] - others[np.newaxis, :, :, :], axis=3).min(axis=2)
+        clear = separation >= thresholds[np.newaxis, :]
+
+        feasible = np.flatnonzero(np.all(clear, axis=1))
+        if len(feasible) > 0:
+            return int(candidates[feasible[0]]), clear[feasible[0]]
+
+        clearCounts = np.sum(clear, axis=1)
+        best = int(np.argmax(clearCounts))
+        if bestClear is None or clearCounts[best] > np.sum(bestClear):
+            bestDelay, bestClear = int(candidates[best]), clear[best]
+
+    return bestDelay, bestClear
@@ -0,0 +1,5 @@
+from .linkModel import LinkModel, RadioChannel
+from .simulatedFirmware import SimulatedFirmware
+from .swarmKinematics import SwarmKinematics
+from .simulatedSwarm import SimulatedSwarm
+from .simulatedLink import SimulatedLinkDriver, SimulatedBroadcaster
\ No newline at end of file
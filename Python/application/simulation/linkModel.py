@@ -0,0 +1,84 @@
+import random
+from threading import Lock
+
+
+class LinkModel():
+    """
+    Timing of a simulated radio link. Every packet occupies its channel for its airtime, so drones
+    sharing a channel slow each other down. Lost packets are sent again by the radio, like the
+    real link does, until it gives up after a number of retries & the packet is dropped.
+    """
+
+    # Bytes the radio adds to every packet: preamble, address, packet control & CRC
+    PACKET_OVERHEAD = 9
+
+    def __init__(self, latency=0.002, loss=0.0, bandwidth=50000, retries=10):
+        """
+        :param latency: Seconds from the end of the transmission to the packet arriving
+        :param loss: Chance of a single transmission getting lost, between 0 & 1
+        :param bandwidth: Bytes per second a channel can carry, shared by all drones on it
+        :param retries: Transmissions of a packet before the radio gives up on it
+        """
+        self.latency = latency
+        self.loss = loss
+        self.bandwidth = bandwidth
+        self.retries = retries
+
+
+class RadioChannel():
+    """
+    A single radio channel of the simulated swarm, with counters for everything sent over it
+    """
+
+    def __init__(self, number, linkModel):
+        self.number = number
+        self.linkModel = linkModel
+        self.busyUntil = 0.0
+        self.lock = Lock()
+
+        self.packetsSent = 0
+        self.packetsReceived = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def transmit(self, now, size, uplink=True):
+        """
+        Reserve the channel for a packet
+        :param now: Time the packet is handed to the radio
+        :param size: Bytes of CRTP header & data
+        :param uplink: True for packets sent to the drones, False for replies
+        :return: Time the packet arrives, or None if it was dropped
+        """
+        model = self.linkModel
+        attempts = 1
+        while attempts <= model.retries and model.loss > 0 and random.random() < model.loss:
+            attempts += 1
+
+        with self.lock:
+            start = max(now, self.busyUntil)
+            self.busyUntil = start + attempts * (size + LinkModel.PACKET_OVERHEAD) / model.bandwidth
+
+            self.retries += attempts - 1
+            if uplink:
+                self.packetsSent += 1
+                self.bytesSent += size
+            else:
+                self.packetsReceived += 1
+                self.bytesReceived += size
+
+            if attempts > model.retries:
+                self.dropped += 1
+                return None
+            return self.busyUntil + model.latency
+
+    def counters(self):
+        return {
+            'packetsSent': self.packetsSent,
+            'packetsReceived': self.packetsReceived,
+            'bytesSent': self.bytesSent,
+            'bytesReceived': self.bytesReceived,
+            'retries': self.retries,
+            'dropped': self.dropped
+        }
\ No newline at end of file
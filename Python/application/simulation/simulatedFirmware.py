@@ -0,0 +1,369 @@
+import struct
+import time
+import zlib
+
+from cflib.crtp.crtpstack import CRTPPacket, CRTPPort
+
+from application.trajectory import decodeTrajectory, trajectoryLength
+
+# Log & param variable types, as the firmware reports them in its TOC
+LOG_TYPES = {0x01: '<B', 0x02: '<H', 0x03: '<L', 0x04: '<b', 0x05: '<h', 0x06: '<i', 0x07: '<f', 0x08: '<e'}
+LOG_UINT8 = 0x01
+LOG_FLOAT = 0x07
+PARAM_TYPES = {0x08: '<B', 0x09: '<H', 0x0A: '<L', 0x00: '<b', 0x01: '<h', 0x02: '<i', 0x06: '<f'}
+PARAM_UINT8 = 0x08
+PARAM_FLOAT = 0x06
+
+# TOC commands, the same on the log & param ports
+TOC_CHANNEL = 0
+TOC_ITEM = 2
+TOC_INFO = 3
+
+LOG_SETTINGS_CHANNEL = 1
+LOG_DATA_CHANNEL = 2
+LOG_CREATE = 6
+LOG_APPEND = 7
+LOG_DELETE = 2
+LOG_START = 3
+LOG_STOP = 4
+LOG_RESET = 5
+
+PARAM_READ_CHANNEL = 1
+PARAM_WRITE_CHANNEL = 2
+
+MEMORY_INFO_CHANNEL = 0
+MEMORY_READ_CHANNEL = 1
+MEMORY_WRITE_CHANNEL = 2
+MEMORY_COUNT = 1
+MEMORY_DETAILS = 2
+
+MEMORY_TRAJECTORY = 0x12
+MEMORY_LIGHTHOUSE = 0x14
+MEMORY_LED_TIMINGS = 0x17
+
+LOCALIZATION_GENERIC_CHANNEL = 1
+LIGHTHOUSE_PERSIST = 11
+
+HIGH_LEVEL_SET_GROUP_MASK = 0
+HIGH_LEVEL_STOP = 3
+HIGH_LEVEL_GO_TO = 4
+HIGH_LEVEL_START_TRAJECTORY = 5
+HIGH_LEVEL_DEFINE_TRAJECTORY = 6
+HIGH_LEVEL_TAKEOFF = 7
+HIGH_LEVEL_LAND = 8
+TRAJECTORY_COMPRESSED = 1
+
+# Status codes of memory replies
+OK = 0
+EIO = 5
+
+PLATFORM_VERSION_CHANNEL = 1
+LINK_SOURCE_CHANNEL = 1
+PROTOCOL_VERSION = 4
+
+
+class SimulatedFirmware():
+    """
+    The radio facing side of a virtual drone: log & param TOCs, log blocks, param reads & writes,
+    memories that acknowledge every write, the lighthouse persist command & the high level
+    commander, which flies the drone in the SwarmKinematics of the swarm. Packets are handled on
+    the scheduler thread of the swarm, & replies go back over the same radio channel they came in on.
+    """
+
+    LOG_VARIABLES = [
+        ('kalman', 'stateX', LOG_FLOAT),
+        ('kalman', 'stateY', LOG_FLOAT),
+        ('kalman', 'stateZ', LOG_FLOAT),
+        ('kalman', 'varPX', LOG_FLOAT),
+        ('kalman', 'varPY', LOG_FLOAT),
+        ('kalman', 'varPZ', LOG_FLOAT),
+        ('pm', 'batteryLevel', LOG_UINT8),
+        ('pm', 'vbat', LOG_FLOAT)
+    ]
+
+    PARAMETERS = [
+        ('commander', 'enHighLevel', PARAM_UINT8, 0),
+        ('kalman', 'resetEstimation', PARAM_UINT8, 0),
+        ('lighthouse', 'method', PARAM_UINT8, 1),
+        ('lighthouse', 'systemType', PARAM_UINT8, 2),
+        ('stabilizer', 'controller', PARAM_UINT8, 0),
+        ('stabilizer', 'estimator', PARAM_UINT8, 2)
+    ]
+
+    # Id, type & size of every memory
+    MEMORIES = [
+        (0, MEMORY_TRAJECTORY, 0x8000),
+        (1, MEMORY_LIGHTHOUSE, 0x2000),
+        (2, MEMORY_LED_TIMINGS, 0x1000)
+    ]
+
+    # Kalman variance while the estimator settles after a reset, & once it has
+    RESET_VARIANCE = 0.01
+    SETTLED_VARIANCE = 1e-5
+    ESTIMATOR_SETTLE_TIME = 0.5
+
+    def __init__(self, swarm, channel, address, position):
+        self.swarm = swarm
+        self.channel = channel
+        self.address = address
+        self.link = None
+        self.bootTime = time.perf_counter()
+
+        self.params = [value for _, _, _, value in SimulatedFirmware.PARAMETERS]
+        self.memories = {ident: bytearray(size) for ident, _, size in SimulatedFirmware.MEMORIES}
+        self.logBlocks = {}
+        self.trajectories = {}
+        self.groupMask = 0
+
+        self.batteryLevel = 100
+        self.resetTime = -SimulatedFirmware.ESTIMATOR_SETTLE_TIME
+        self.kinematics = swarm.kinematics
+        self.index = self.kinematics.addDrone(position)
+
+    # -- STATE -- #
+
+    @property
+    def position(self):
+        return tuple(float(value) for value in self.kinematics.positions[self.index])
+
+    @property
+    def variance(self):
+        settling = time.perf_counter() - self.resetTime < SimulatedFirmware.ESTIMATOR_SETTLE_TIME
+        if settling:
+            # Alternate between samples, so the variance doesn't look stable yet
+            return SimulatedFirmware.RESET_VARIANCE * (1 + (int(time.perf_counter() * 100) % 2))
+        return SimulatedFirmware.SETTLED_VARIANCE
+
+    def logValue(self, group, name):
+        if group == 'kalman' and name.startswith('state'):
+            return self.position['XYZ'.index(name[-1])]
+        if group == 'kalman' and name.startswith('var'):
+            return self.variance
+        if name == 'batteryLevel':
+            return self.batteryLevel
+        if name == 'vbat':
+            return 3.0 + 1.2 * self.batteryLevel / 100
+        return 0
+
+    # -- LINK -- #
+
+    def attach(self, link):
+        self.link = link
+
+    def detach(self, link):
+        if self.link is link:
+            self.link = None
+            self.logBlocks = {}
+
+    def reply(self, port, channel, data):
+        link = self.link
+        if link is None:
+            return
+
+        packet = CRTPPacket()
+        packet.set_header(port, channel)
+        packet.data = data
+        self.swarm.send(self.channel, len(packet.data) + 1, lambda: link.deliver(packet), uplink=False)
+
+    def receive(self, packet, broadcast=False):
+        """
+        Handle a packet from the radio. Broadcasts aren't acknowledged, so nothing is sent back
+        """
+        handlers = {
+            CRTPPort.LINKCTRL: self.handleLink,
+            CRTPPort.PLATFORM: self.handlePlatform,
+            CRTPPort.LOGGING: self.handleLog,
+            CRTPPort.PARAM: self.handleParam,
+            CRTPPort.MEM: self.handleMemory,
+            CRTPPort.LOCALIZATION: self.handleLocalization,
+            CRTPPort.SETPOINT_HL: self.handleHighLevel
+        }
+
+        handler = handlers.get(packet.port)
+        if handler is None or len(packet.data) == 0:
+            return
+
+        reply = None if broadcast else self.reply
+        handler(packet.channel, bytes(packet.data), reply or (lambda port, channel, data: None))
+
+    # -- PORTS -- #
+
+    def handleLink(self, channel, data, reply):
+        if channel == LINK_SOURCE_CHANNEL:
+            reply(CRTPPort.LINKCTRL, LINK_SOURCE_CHANNEL, b'Bitcraze Crazyflie')
+
+    def handlePlatform(self, channel, data, reply):
+        if channel == PLATFORM_VERSION_CHANNEL and data[0] == 0:
+            reply(CRTPPort.PLATFORM, PLATFORM_VERSION_CHANNEL, bytes((0, PROTOCOL_VERSION)))
+
+    def handleToc(self, port, data, entries, reply):
+        if data[0] == TOC_INFO:
+            reply(port, TOC_CHANNEL, struct.pack('<BHI', TOC_INFO, len(entries), self.tocCrc(entries)))
+        elif data[0] == TOC_ITEM:
+            ident = struct.unpack('<H', data[1:3])[0]
+            if ident < len(entries):
+                group, name, variableType = entries[ident][:3]
+                description = bytes((variableType,)) + group.encode() + b'\0' + name.encode() + b'\0'
+                reply(port, TOC_CHANNEL, struct.pack('<BH', TOC_ITEM, ident) + description)
+
+    @staticmethod
+    def tocCrc(entries):
+        return zlib.crc32(repr([entry[:3] for entry in entries]).encode())
+
+    def handleLog(self, channel, data, reply):
+        if channel == TOC_CHANNEL:
+            self.handleToc(CRTPPort.LOGGING, data, SimulatedFirmware.LOG_VARIABLES, reply)
+            return
+        if channel != LOG_SETTINGS_CHANNEL:
+            return
+
+        command = data[0]
+        blockId = data[1] if len(data) > 1 else 0
+
+        if command == LOG_RESET:
+            self.logBlocks = {}
+            reply(CRTPPort.LOGGING, LOG_SETTINGS_CHANNEL, bytes((LOG_RESET, 0, 0)))
+        elif command in (LOG_CREATE, LOG_APPEND):
+            block = self.logBlocks.setdefault(blockId, {'variables': [], 'period': 0, 'generation': 0})
+            if command == LOG_CREATE:
+                block['variables'] = []
+            for offset in range(2, len(data) - 2, 3):
+                fetchType = data[offset] & 0x0F
+                ident = struct.unpack('<H', data[offset + 1:offset + 3])[0]
+                block['variables'].append((ident, fetchType))
+            reply(CRTPPort.LOGGING, LOG_SETTINGS_CHANNEL, bytes((command, blockId, 0)))
+        elif command == LOG_START:
+            block = self.logBlocks.get(blockId)
+            if block is not None:
+                block['period'] = data[2] * 0.01
+                block['generation'] += 1
+                self.scheduleLog(blockId, block['generation'])
+            reply(CRTPPort.LOGGING, LOG_SETTINGS_CHANNEL, bytes((LOG_START, blockId, OK if block is not None else 2)))
+        elif command in (LOG_STOP, LOG_DELETE):
+            block = self.logBlocks.get(blockId)
+            if block is not None:
+                block['generation'] += 1
+                if command == LOG_DELETE:
+                    del self.logBlocks[blockId]
+            reply(CRTPPort.LOGGING, LOG_SETTINGS_CHANNEL, bytes((command, blockId, 0)))
+
+    def scheduleLog(self, blockId, generation):
+        block = self.logBlocks.get(blockId)
+        if block is not None and block['generation'] == generation and block['period'] > 0:
+            self.swarm.schedule(block['period'], lambda: self.sendLog(blockId, generation))
+
+    def sendLog(self, blockId, generation):
+        block = self.logBlocks.get(blockId)
+        if block is None or block['generation'] != generation or self.link is None:
+            return
+
+        timestamp = int((time.perf_counter() - self.bootTime) * 1000) & 0xFFFFFF
+        values = b''
+        for ident, fetchType in block['variables']:
+            group, name, _ = SimulatedFirmware.LOG_VARIABLES[ident]
+            value = self.logValue(group, name)
+            values += struct.pack(LOG_TYPES[fetchType], int(value) if fetchType < LOG_FLOAT else value)
+
+        self.reply(CRTPPort.LOGGING, LOG_DATA_CHANNEL, bytes((blockId,)) + struct.pack('<I', timestamp)[:3] + values)
+        self.scheduleLog(blockId, generation)
+
+    def handleParam(self, channel, data, reply):
+        if channel == TOC_CHANNEL:
+            self.handleToc(CRTPPort.PARAM, data, SimulatedFirmware.PARAMETERS, reply)
+            return
+        if len(data) < 2:
+            return
+
+        ident = struct.unpack('<H', data[:2])[0]
+        if ident >= len(self.params):
+            return
+        valueFormat = PARAM_TYPES[SimulatedFirmware.PARAMETERS[ident][2]]
+
+        if channel == PARAM_READ_CHANNEL:
+            reply(CRTPPort.PARAM, PARAM_READ_CHANNEL, data[:2] + bytes((OK,)) + struct.pack(valueFormat, self.params[ident]))
+        elif channel == PARAM_WRITE_CHANNEL:
+            self.params[ident] = struct.unpack(valueFormat, data[2:2 + struct.calcsize(valueFormat)])[0]
+            self.paramChanged(SimulatedFirmware.PARAMETERS[ident][1], self.params[ident])
+            reply(CRTPPort.PARAM, PARAM_WRITE_CHANNEL, data[:2] + struct.pack(valueFormat, self.params[ident]))
+
+    def paramChanged(self, name, value):
+        if name == 'resetEstimation' and value == 1:
+            self.resetTime = time.perf_counter()
+
+    def handleMemory(self, channel, data, reply):
+        if channel == MEMORY_INFO_CHANNEL:
+            if data[0] == MEMORY_COUNT:
+                reply(CRTPPort.MEM, MEMORY_INFO_CHANNEL, bytes((MEMORY_COUNT, len(SimulatedFirmware.MEMORIES))))
+            elif data[0] == MEMORY_DETAILS and len(data) > 1 and data[1] < len(SimulatedFirmware.MEMORIES):
+                ident, memoryType, size = SimulatedFirmware.MEMORIES[data[1]]
+                reply(CRTPPort.MEM, MEMORY_INFO_CHANNEL, struct.pack('<BBBI', MEMORY_DETAILS, ident, memoryType, size) + bytes(8))
+            return
+
+        ident, address = struct.unpack('<BI', data[:5])
+        memory = self.memories.get(ident)
+
+        if channel == MEMORY_READ_CHANNEL:
+            length = data[5]
+            valid = memory is not None and address + length <= len(memory)
+            content = bytes(memory[address:address + length]) if valid else b''
+            reply(CRTPPort.MEM, MEMORY_READ_CHANNEL, struct.pack('<BIB', ident, address, OK if valid else EIO) + content)
+        elif channel == MEMORY_WRITE_CHANNEL:
+            content = data[5:]
+            valid = memory is not None and address + len(content) <= len(memory)
+            if valid:
+                memory[address:address + len(content)] = content
+            reply(CRTPPort.MEM, MEMORY_WRITE_CHANNEL, struct.pack('<BIB', ident, address, OK if valid else EIO))
+
+    def handleLocalization(self, channel, data, reply):
+        if channel == LOCALIZATION_GENERIC_CHANNEL and data[0] == LIGHTHOUSE_PERSIST:
+            reply(CRTPPort.LOCALIZATION, LOCALIZATION_GENERIC_CHANNEL, bytes((LIGHTHOUSE_PERSIST, 1)))
+
+    def handleHighLevel(self, channel, data, reply):
+        command = data[0]
+        x, y, z = self.position
+
+        # Like the firmware, commands for other groups are ignored, mask 0 addresses all drones
+        if command not in (HIGH_LEVEL_SET_GROUP_MASK, HIGH_LEVEL_DEFINE_TRAJECTORY) and data[1] != 0 and not data[1] & self.groupMask:
+            return
+
+        if command == HIGH_LEVEL_SET_GROUP_MASK:
+            self.groupMask = data[1]
+        elif command == HIGH_LEVEL_TAKEOFF:
+            _, _, height, _, _, duration = struct.unpack('<BBff?f', data[:16])
+            self.kinematics.takeoff(self.index, height, duration)
+        elif command == HIGH_LEVEL_LAND:
+            _, _, height, _, _, duration = struct.unpack('<BBff?f', data[:16])
+            self.kinematics.land(self.index, height, duration)
+        elif command == HIGH_LEVEL_GO_TO:
+            _, _, relative, tx, ty, tz, _, duration = struct.unpack('<BBBfffff', data[:23])
+            target = (x + tx, y + ty, z + tz) if relative else (tx, ty, tz)
+            self.kinematics.goTo(self.index, target, duration)
+        elif command == HIGH_LEVEL_STOP:
+            # Motors off, the drone drops to the ground
+            self.kinematics.stop(self.index)
+        elif command == HIGH_LEVEL_DEFINE_TRAJECTORY:
+            trajectoryId, location, trajectoryType, offset, pieces = struct.unpack('<BBBIB', data[1:9])
+            self.trajectories[trajectoryId] = (trajectoryType, offset)
+        elif command == HIGH_LEVEL_START_TRAJECTORY:
+            _, _, relative, reverse, trajectoryId, timeScale = struct.unpack('<BBBBBf', data[:10])
+            trajectory = self.loadTrajectory(trajectoryId)
+            if trajectory is not None:
+                self.kinematics.startTrajectory(self.index, trajectory, time.perf_counter(), timeScale, relative)
+
+    def loadTrajectory(self, trajectoryId):
+        """
+        Decode a trajectory defined in the trajectory memory, only the compressed format is supported
+        """
+        if trajectoryId not in self.trajectories:
+            return None
+
+        trajectoryType, offset = self.trajectories[trajectoryId]
+        memory = self.memories[SimulatedFirmware.MEMORIES[0][0]]
+        length = trajectoryLength(memory, offset)
+        if trajectoryType != TRAJECTORY_COMPRESSED or length == 0:
+            return None
+
+        try:
+            return decodeTrajectory(memory[offset:offset + length])
+        except ValueError:
+            return None
\ No newline at end of file
@@ -0,0 +1,119 @@
+import queue
+
+import cflib.crtp
+from cflib.crtp.crtpdriver import CRTPDriver
+from cflib.crtp.crtpstack import CRTPPacket
+from cflib.crtp.exceptions import WrongUriType
+from cflib.crazyflie.high_level_commander import HighLevelCommander
+from cflib.crazyflie.light_controller import LightController
+
+from application.simulation.simulatedSwarm import SimulatedSwarm
+
+
+def copyPacket(packet):
+    return CRTPPacket(packet.header, bytes(packet.data))
+
+
+class SimulatedLinkDriver(CRTPDriver):
+    """
+    CRTP link driver for the sim:// URIs of the virtual drones of SimulatedSwarm.CURRENT
+    """
+
+    def __init__(self):
+        CRTPDriver.__init__(self)
+        self.uri = None
+        self.firmware = None
+        self.incoming = queue.Queue()
+
+    @staticmethod
+    def register():
+        """
+        Put the driver ahead of the radio drivers cflib tries when opening a link
+        """
+        if SimulatedLinkDriver not in cflib.crtp.CLASSES:
+            cflib.crtp.CLASSES.insert(0, SimulatedLinkDriver)
+
+    @staticmethod
+    def scan_selected(uris):
+        """
+        Same as CfLinkCppDriver.scan_selected, the virtual drones among the given radio URIs
+        """
+        swarm = SimulatedSwarm.CURRENT
+        return swarm.populate(uris) if swarm is not None else []
+
+    def connect(self, uri, radio_link_statistics_callback, link_error_callback):
+        if not uri.startswith(SimulatedSwarm.SCHEME):
+            raise WrongUriType("Not a simulated drone URI")
+
+        swarm = SimulatedSwarm.CURRENT
+        firmware = swarm.firmware(uri.split('?')[0]) if swarm is not None else None
+        if firmware is None:
+            raise Exception("No simulated drone at " + uri)
+
+        self.uri = uri
+        self.firmware = firmware
+        firmware.attach(self)
+
+    def send_packet(self, pk):
+        firmware = self.firmware
+        if firmware is None:
+            return
+
+        packet = copyPacket(pk)
+        firmware.swarm.send(firmware.channel, len(packet.data) + 1, lambda: firmware.receive(packet))
+
+    def deliver(self, packet):
+        self.incoming.put(packet)
+
+    def receive_packet(self, wait=0):
+        try:
+            if wait == 0:
+                return self.incoming.get(False)
+            return self.incoming.get(True, None if wait < 0 else wait)
+        except queue.Empty:
+            return None
+
+    def get_status(self):
+        return 'Simulated'
+
+    def get_name(self):
+        return 'sim'
+
+    def scan_interface(self, address=None):
+        swarm = SimulatedSwarm.CURRENT
+        if swarm is None:
+            return []
+        return [[SimulatedSwarm.simulatedUri(channel, address), ''] for channel, address in swarm.firmwares]
+
+    def close(self):
+        if self.firmware is not None:
+            self.firmware.detach(self)
+            self.firmware = None
+
+
+class SimulatedBroadcaster():
+    """
+    Stands in for the cflib Broadcaster of a channel, packets reach every virtual drone on it
+    without being acknowledged
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.high_level_commander = HighLevelCommander(self)
+        self.light_controller = LightController(self)
+
+    def open_link(self):
+        pass
+
+    def close_link(self):
+        pass
+
+    def send_packet(self, pk):
+        swarm = SimulatedSwarm.CURRENT
+        if swarm is None:
+            return
+
+        packet = copyPacket(pk)
+        firmwares = swarm.firmwaresOn(self.channel)
+        swarm.send(swarm.channel(self.channel), len(packet.data) + 1,
+                   lambda: [firmware.receive(packet, broadcast=True) for firmware in firmwares])
\ No newline at end of file
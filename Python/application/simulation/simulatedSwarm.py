@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import os
+import re
+import time
+from threading import Thread, Condition
+
+from application.simulation.linkModel import LinkModel, RadioChannel
+from application.simulation.simulatedFirmware import SimulatedFirmware
+from application.simulation.swarmKinematics import SwarmKinematics
+
+
+class SimulatedSwarm():
+    """
+    Virtual drones answering on sim:// links instead of the radios. Everything that happens on
+    the simulated links, packets arriving, log blocks firing & the flight model stepping the whole
+    swarm, is an event on a single scheduler thread, so a large swarm doesn't need a thread per drone.
+
+    Enabled with the DRONE_SIMULATION environment variable, set to the number of virtual drones.
+    The link can be tuned with DRONE_SIMULATION_LATENCY (ms), DRONE_SIMULATION_LOSS (0 to 1) &
+    DRONE_SIMULATION_BANDWIDTH (bytes per second per channel).
+    """
+
+    CURRENT = None
+
+    SCHEME = 'sim://'
+    SPACING = 0.5
+
+    def __init__(self, droneCount, linkModel=None):
+        self.droneCount = droneCount
+        self.linkModel = linkModel if linkModel is not None else LinkModel()
+        self.firmwares = {}
+        self.channels = {}
+        self.kinematics = SwarmKinematics()
+        self.lateTicks = 0
+
+        self.events = []
+        self.sequence = itertools.count()
+        self.condition = Condition()
+        self.running = True
+        self.thread = Thread(target=self.run, name='simulation', daemon=True)
+        self.thread.start()
+
+        self.nextTick = time.perf_counter()
+        self.scheduleAt(self.nextTick, self.tick)
+
+    @staticmethod
+    def fromEnvironment():
+        """
+        :return: The swarm described by the environment variables, None if simulation isn't enabled
+        """
+        count = os.getenv('DRONE_SIMULATION')
+        if not count:
+            return None
+
+        linkModel = LinkModel()
+        if os.getenv('DRONE_SIMULATION_LATENCY'):
+            linkModel.latency = float(os.getenv('DRONE_SIMULATION_LATENCY')) / 1000
+        if os.getenv('DRONE_SIMULATION_LOSS'):
+            linkModel.loss = float(os.getenv('DRONE_SIMULATION_LOSS'))
+        if os.getenv('DRONE_SIMULATION_BANDWIDTH'):
+            linkModel.bandwidth = float(os.getenv('DRONE_SIMULATION_BANDWIDTH'))
+        return SimulatedSwarm(int(count), linkModel)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+    # -- DRONES -- #
+
+    @staticmethod
+    def parseUri(uri):
+        """
+        :return: Channel & address of a radio:// or sim:// URI
+        """
+        match = re.match(r'(?:radio://[^/]+|sim:/)/(\d+)(?:/\w+)?/([0-9A-Fa-f]+)', uri)
+        if match is None:
+            raise ValueError("Not a drone URI: " + uri)
+        return int(match.group(1)), match.group(2).upper()
+
+    @staticmethod
+    def simulatedUri(channel, address):
+        return SimulatedSwarm.SCHEME + str(channel) + '/' + address
+
+    def populate(self, uris):
+        """
+        Place the virtual drones at the first addresses of the given URIs, on the first call
+        :return: sim:// URIs of every virtual drone
+        """
+        for uri in uris:
+            if len(self.firmwares) >= self.droneCount:
+                break
+            channel, address = SimulatedSwarm.parseUri(uri)
+            if (channel, address) not in self.firmwares:
+                self.addDrone(channel, address)
+
+        return [SimulatedSwarm.simulatedUri(channel, address) for channel, address in self.firmwares]
+
+    def addDrone(self, channel, address, position=None):
+        if position is None:
+            # Drones start out on a grid on the ground, in a row per channel
+            index = len(self.firmwares)
+            rowLength = max(1, int(self.droneCount ** 0.5))
+            position = ((index % rowLength) * SimulatedSwarm.SPACING, (index // rowLength) * SimulatedSwarm.SPACING, 0.0)
+
+        firmware = SimulatedFirmware(self, self.channel(channel), address, position)
+        self.firmwares[(channel, address)] = firmware
+        return firmware
+
+    def firmware(self, uri):
+        return self.firmwares.get(SimulatedSwarm.parseUri(uri))
+
+    def firmwaresOn(self, channel):
+        return [firmware for (number, _), firmware in self.firmwares.items() if number == channel]
+
+    def channel(self, number):
+        if number not in self.channels:
+            self.channels[number] = RadioChannel(number, self.linkModel)
+        return self.channels[number]
+
+    def counters(self):
+        """
+        :return: Packet counters of every channel, by channel
+        """
+        return {number: channel.counters() for number, channel in self.channels.items()}
+
+    # -- EVENTS -- #
+
+    def schedule(self, delay, function):
+        self.scheduleAt(time.perf_counter() + delay, function)
+
+    def scheduleAt(self, timestamp, function):
+        with self.condition:
+            heapq.heappush(self.events, (timestamp, next(self.sequence), function))
+            self.condition.notify()
+
+    def send(self, channel, size, function, uplink=True):
+        """
+        Send a packet over a radio channel
+        :param function: Called on the scheduler thread when the packet arrives
+        """
+        arrival = channel.transmit(time.perf_counter(), size, uplink)
+        if arrival is not None:
+            self.scheduleAt(arrival, function)
+
+    def tick(self):
+        now = time.perf_counter()
+        self.kinematics.tick(now)
+
+        period = 1.0 / SwarmKinematics.RATE
+        self.nextTick += period
+        if self.nextTick < now:
+            # Fell behind, skip ahead rather than trying to catch up
+            self.lateTicks += 1
+            self.nextTick = now + period
+        self.scheduleAt(self.nextTick, self.tick)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and (len(self.events) == 0 or self.events[0][0] > time.perf_counter()):
+                    timeout = None if len(self.events) == 0 else self.events[0][0] - time.perf_counter()
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
+                _, _, function = heapq.heappop(self.events)
+
+            function()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import numpy as np
+
+from application.trajectory import TrajectoryBatch
+
+# What every drone is doing
+IDLE = 0
+MOVING = 1
+TRAJECTORY = 2
+
+
+class SwarmKinematics():
+    """
+    Flight model of every virtual drone, stepped for the whole swarm at once. Takeoff, land &
+    go to commands are first order moves towards a target, settling within the commanded duration.
+    Trajectories are played back from a TrajectoryBatch of the trajectories the drones started,
+    each drone on its own clock.
+    """
+
+    RATE = 100
+
+    # Time constants per commanded duration, so a move is ~98% done when its duration is up
+    TIME_CONSTANTS = 4.0
+
+    # Time constant of a drone falling to the ground after its motors stop
+    FALL_TIME = 0.1
+
+    def __init__(self):
+        self.positions = np.zeros((0, 3))
+        self.targets = np.zeros((0, 3))
+        self.timeConstants = np.ones(0)
+        self.modes = np.zeros(0, dtype=int)
+
+        self.trajectories = {}
+        self.trajectoryStarts = np.zeros(0)
+        self.trajectoryScales = np.ones(0)
+        self.trajectoryOffsets = np.zeros((0, 3))
+        self.batch = None
+        self.batchRows = np.zeros(0, dtype=int)
+
+        self.lastTick = None
+        self.ticks = 0
+
+    @property
+    def droneCount(self):
+        return len(self.positions)
+
+    def addDrone(self, position):
+        """
+        :return: Index of the new drone
+        """
+        self.positions = np.vstack((self.positions, [position]))
+        self.targets = np.vstack((self.targets, [position]))
+        self.timeConstants = np.append(self.timeConstants, 1.0)
+        self.modes = np.append(self.modes, IDLE)
+        self.trajectoryStarts = np.append(self.trajectoryStarts, 0.0)
+        self.trajectoryScales = np.append(self.trajectoryScales, 1.0)
+        self.trajectoryOffsets = np.vstack((self.trajectoryOffsets, np.zeros((1, 3))))
+        self.batchRows = np.append(self.batchRows, -1)
+        return self.droneCount - 1
+
+    # -- COMMANDS -- #
+
+    def goTo(self, index, target, duration):
+        self.targets[index] = target
+        self.timeConstants[index] = max(duration, 1.0 / SwarmKinematics.RATE) / SwarmKinematics.TIME_CONSTANTS
+        self.modes[index] = MOVING
+
+    def takeoff(self, index, height, duration):
+        x, y, _ = self.positions[index]
+        self.goTo(index, (x, y, height), duration)
+
+    def land(self, index, height, duration):
+        self.takeoff(index, height, duration)
+
+    def stop(self, index):
+        x, y, _ = self.positions[index]
+        self.targets[index] = (x, y, 0.0)
+        self.timeConstants[index] = SwarmKinematics.FALL_TIME
+        self.modes[index] = IDLE
+
+    def startTrajectory(self, index, trajectory, now, timeScale=1.0, relative=False):
+        """
+        :param trajectory: A decoded Trajectory
+        :param now: Time the trajectory starts, on the clock passed to tick
+        """
+        if self.trajectories.get(index) is not trajectory:
+            self.trajectories[index] = trajectory
+            self.batch = None
+
+        self.trajectoryStarts[index] = now
+        self.trajectoryScales[index] = timeScale if timeScale > 0 else 1.0
+        self.trajectoryOffsets[index] = (self.positions[index] - trajectory.start[:3]) if relative else 0.0
+        self.modes[index] = TRAJECTORY
+
+    # -- SIMULATION -- #
+
+    def buildBatch(self):
+        indexes = sorted(self.trajectories)
+        self.batch = TrajectoryBatch([self.trajectories[index] for index in indexes])
+        self.batchRows[:] = -1
+        self.batchRows[indexes] = np.arange(0, len(indexes))
+
+    def tick(self, now):
+        """
+        Step every drone to the given time, in seconds
+        """
+        dt = 1.0 / SwarmKinematics.RATE if self.lastTick is None else max(0.0, now - self.lastTick)
+        self.lastTick = now
+        self.ticks += 1
+
+        # First order moves, including falling after a stop
+        moving = self.modes != TRAJECTORY
+        if np.any(moving):
+            gain = 1.0 - np.exp(-dt / self.timeConstants[moving])
+            self.positions[moving] += (self.targets[moving] - self.positions[moving]) * gain[:, np.newaxis]
+
+        playing = np.flatnonzero(self.modes == TRAJECTORY)
+        if len(playing) > 0:
+            if self.batch is None:
+                self.buildBatch()
+
+            # Every drone is evaluated on its own clock, drones without a trajectory at time 0
+            times = np.zeros((self.batch.droneCount, 1))
+            rows = self.batchRows[playing]
+            times[rows, 0] = (now - self.trajectoryStarts[playing]) / self.trajectoryScales[playing]
+            positions = self.batch.positions(times)
+            self.positions[playing] = positions[rows, 0] + self.trajectoryOffsets[playing]
+            self.targets[playing] = self.positions[playing]
\ No newline at end of file
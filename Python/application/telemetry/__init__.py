@@ -0,0 +1,5 @@
+from .telemetryStream import TelemetrySample, TelemetryStream
+from .telemetryStore import TelemetryStore
+from .flightRecorder import FlightRecorder, FlightRecording, loadRecording
+from .tracking import TrackingError, TrackingReport, computeTrackingError
+from .tracer import Span, Tracer, TraceSummary
\ No newline at end of file
@@ -0,0 +1,39 @@
+import argparse
+import sys
+
+from application.model import sequenceFile
+from application.telemetry import loadRecording, computeTrackingError
+from application.trajectory import TrajectoryBatch
+
+"""
+Tracking error report for a recorded show:
+
+    python -m application.telemetry recordings/<show>.flight [--sequence <file>] [--curves <directory>]
+"""
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(prog="python -m application.telemetry", description="Compare a recorded show to its planned trajectories")
+    parser.add_argument("recording", help="Flight recording (.flight)")
+    parser.add_argument("--sequence", help="Sequence file, defaults to the one stored in the recording")
+    parser.add_argument("--curves", help="Directory to write the error curve of every drone to")
+    parser.add_argument("--max-lag", type=float, default=0.5, help="Largest lag searched, in seconds")
+    options = parser.parse_args(arguments)
+
+    recording = loadRecording(options.recording)
+    sequencePath = options.sequence or recording.metadata.get('sequence')
+    if sequencePath is None:
+        parser.error("The recording doesn't name its sequence, pass it with --sequence")
+
+    batch = TrajectoryBatch.fromSequence(sequenceFile.loadSequence(sequencePath))
+    report = computeTrackingError(recording, batch, maxLag=options.max_lag)
+
+    print(report)
+    print("\n{} drone(s), {} samples each, analysed in {:.2f}s".format(len(report.entries), len(report.times), report.elapsed))
+
+    if options.curves:
+        files = report.saveCurves(options.curves)
+        print("Wrote {} error curve(s) to {}".format(len(files), options.curves))
+
+
+main(sys.argv[1:])
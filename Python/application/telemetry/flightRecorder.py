@@ -0,0 +1,221 @@
+import json
+import os
+import queue
+import struct
+import time
+from threading import Thread
+
+import numpy as np
+
+from application.telemetry.telemetryStore import CHANNEL_COUNT
+
+MAGIC = b'DSFR'
+VERSION = 1
+EXTENSION = '.flight'
+
+# Header: magic, version & length of the JSON metadata that follows
+HEADER = struct.Struct('<4sHI')
+
+RECORD = np.dtype([
+    ('time', '<f8'),
+    ('kind', 'u1'),
+    ('drone', '<i2'),
+    ('values', '<f4', (CHANNEL_COUNT,))
+])
+
+# Kinds of records. Samples hold the telemetry channels, state records the DroneState value,
+# markers the marker id & assignments the track index of the drone
+SAMPLE = 0
+STATE = 1
+MARKER = 2
+ASSIGNMENT = 3
+
+# Markers for the phases of a show
+MARKER_TAKEOFF = 0
+MARKER_TRANSITION = 1
+MARKER_TRAJECTORY_START = 2
+MARKER_LANDING = 3
+MARKER_ABORT = 4
+
+# Records written to disk at once
+CHUNK_SIZE = 1024
+
+
+class FlightRecorder():
+    """
+    Streams the telemetry & events of a show to an append-only binary file. Records are handed to
+    a background thread through a bounded queue, so the radio threads never wait on the disk; if
+    the disk can't keep up, records are dropped & counted instead of piling up in memory. The file
+    is a small header with JSON metadata followed by fixed size records, so a recording cut short
+    by a crash still loads up to its last complete record.
+    """
+
+    DIRECTORY = './recordings'
+
+    def __init__(self, directory=DIRECTORY, queueSize=65536):
+        self.directory = directory
+        self.queue = queue.Queue(maxsize=queueSize)
+        self.file = None
+        self.path = None
+        self.thread = None
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def recording(self):
+        return self.thread is not None
+
+    def start(self, metadata, name=None):
+        """
+        Open a new recording
+        :param metadata: JSON serializable description of the show, stored in the file header
+        :param name: File name without extension, defaults to the current time
+        :return: Path of the recording
+        """
+        if self.recording:
+            self.stop()
+
+        name = name if name is not None else time.strftime('%Y-%m-%d_%H-%M-%S')
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, name + EXTENSION)
+
+        header = json.dumps(metadata).encode('utf-8')
+        self.file = open(self.path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(header)))
+        self.file.write(header)
+
+        self.written = 0
+        self.dropped = 0
+        self.thread = Thread(target=self.writeRecords, daemon=True)
+        self.thread.start()
+        return self.path
+
+    def stop(self):
+        if not self.recording:
+            return
+
+        # The end marker has to get through even if the queue is full
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        self.file.close()
+        self.file = None
+
+    # -- RECORDING -- #
+
+    def record(self, kind, drone, values):
+        if not self.recording:
+            return
+
+        try:
+            self.queue.put_nowait((time.time(), kind, drone, values))
+        except queue.Full:
+            self.dropped += 1
+
+    def recordSample(self, drone, sample):
+        if not self.recording:
+            return
+
+        try:
+            self.queue.put_nowait((sample.timestamp, SAMPLE, drone, sample.position + sample.variance + (sample.batteryLevel,)))
+        except queue.Full:
+            self.dropped += 1
+
+    def recordState(self, drone, state):
+        self.record(STATE, drone, (state.value,))
+
+    def recordMarker(self, marker):
+        self.record(MARKER, -1, (marker,))
+
+    def recordAssignment(self, drone, trackIndex):
+        self.record(ASSIGNMENT, drone, (-1 if trackIndex is None else trackIndex,))
+
+    def writeRecords(self):
+        records = np.zeros(CHUNK_SIZE, dtype=RECORD)
+        done = False
+
+        while not done:
+            count = 0
+            entry = self.queue.get()
+
+            while entry is not None:
+                timestamp, kind, drone, values = entry
+                record = records[count]
+                record['time'] = timestamp
+                record['kind'] = kind
+                record['drone'] = drone
+                record['values'] = 0.0
+                record['values'][:len(values)] = values
+                count += 1
+
+                if count == CHUNK_SIZE:
+                    break
+                try:
+                    entry = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            done = entry is None
+            self.file.write(records[:count].tobytes())
+            self.file.flush()
+            self.written += count
+
+
+class FlightRecording():
+    """
+    A recording loaded back into numpy arrays
+    """
+
+    def __init__(self, metadata, records):
+        self.metadata = metadata
+        self.records = records
+
+    def ofKind(self, kind, drone=None):
+        selected = self.records['kind'] == kind
+        if drone is not None:
+            selected &= self.records['drone'] == drone
+        return self.records[selected]
+
+    def samples(self, drone):
+        """
+        :return: Sample times & telemetry channels of the drone, shaped (samples,) & (samples, channels)
+        """
+        samples = self.ofKind(SAMPLE, drone)
+        order = np.argsort(samples['time'], kind='stable')
+        return samples['time'][order], samples['values'][order].astype(float)
+
+    def states(self, drone):
+        states = self.ofKind(STATE, drone)
+        return states['time'], states['values'][:, 0].astype(int)
+
+    def markerTime(self, marker):
+        markers = self.ofKind(MARKER)
+        times = markers['time'][markers['values'][:, 0] == marker]
+        return float(times[0]) if len(times) > 0 else None
+
+    @property
+    def assignments(self):
+        """
+        Track index of every assigned drone, by drone
+        """
+        assignments = self.ofKind(ASSIGNMENT)
+        return {int(record['drone']): int(record['values'][0]) for record in assignments if record['values'][0] >= 0}
+
+    @property
+    def drones(self):
+        return sorted(set(int(drone) for drone in self.ofKind(SAMPLE)['drone']))
+
+
+def loadRecording(file):
+    with open(file, 'rb') as recordingFile:
+        magic, version, headerLength = HEADER.unpack(recordingFile.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a flight recording: " + str(file))
+
+        metadata = json.loads(recordingFile.read(headerLength).decode('utf-8'))
+        data = recordingFile.read()
+
+    # Drop a partially written last record
+    count = len(data) // RECORD.itemsize
+    records = np.frombuffer(data, dtype=RECORD, count=count)
+    return FlightRecording(metadata, records)
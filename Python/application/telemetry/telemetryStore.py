@@ -0,0 +1,108 @@
+from threading import Lock
+
+import numpy as np
+
+# Channels of every sample, in the order they're stored
+X, Y, Z, VAR_X, VAR_Y, VAR_Z, BATTERY = range(0, 7)
+CHANNEL_COUNT = 7
+POSITION = [X, Y, Z]
+VARIANCE = [VAR_X, VAR_Y, VAR_Z]
+
+
+class TelemetryStore():
+    """
+    Recent telemetry of the whole swarm in one preallocated ring buffer, shaped
+    (drones, channels, window). Adding a sample is O(1), running sums over the window are kept
+    up to date as samples come & go, and checks over the whole swarm are single numpy calls.
+    """
+
+    def __init__(self, droneCount, window=10):
+        self.droneCount = droneCount
+        self.window = window
+        self.samples = np.full((droneCount, CHANNEL_COUNT, window), np.nan)
+        self.timestamps = np.full((droneCount, window), -np.inf)
+        self.heads = np.zeros(droneCount, dtype=int)
+        self.counts = np.zeros(droneCount, dtype=int)
+        self.sums = np.zeros((droneCount, CHANNEL_COUNT))
+        self.squareSums = np.zeros((droneCount, CHANNEL_COUNT))
+        self.lock = Lock()
+
+    def add(self, drone, timestamp, values):
+        values = np.asarray(values, dtype=float)
+        with self.lock:
+            head = self.heads[drone]
+            if self.counts[drone] == self.window:
+                old = self.samples[drone, :, head]
+                self.sums[drone] -= old
+                self.squareSums[drone] -= old * old
+            else:
+                self.counts[drone] += 1
+
+            self.samples[drone, :, head] = values
+            self.timestamps[drone, head] = timestamp
+            self.sums[drone] += values
+            self.squareSums[drone] += values * values
+
+            self.heads[drone] = (head + 1) % self.window
+            if self.heads[drone] == 0:
+                # Once per lap, start the running sums over to keep rounding errors from adding up
+                self.sums[drone] = np.sum(self.samples[drone], axis=1)
+                self.squareSums[drone] = np.sum(self.samples[drone] ** 2, axis=1)
+
+    def addSample(self, drone, sample):
+        self.add(drone, sample.timestamp, sample.position + sample.variance + (sample.batteryLevel,))
+
+    def clear(self, drone=None):
+        rows = slice(None) if drone is None else drone
+        with self.lock:
+            self.samples[rows] = np.nan
+            self.timestamps[rows] = -np.inf
+            self.heads[rows] = 0
+            self.counts[rows] = 0
+            self.sums[rows] = 0.0
+            self.squareSums[rows] = 0.0
+
+    # -- WINDOW STATISTICS -- #
+
+    def mean(self):
+        with self.lock:
+            return self.sums / np.maximum(self.counts, 1)[:, np.newaxis]
+
+    def std(self):
+        with self.lock:
+            counts = np.maximum(self.counts, 1)[:, np.newaxis]
+            mean = self.sums / counts
+            return np.sqrt(np.maximum(self.squareSums / counts - mean * mean, 0.0))
+
+    def spread(self, channels):
+        """
+        Difference between the largest & smallest value in the window, per drone & channel
+        """
+        with self.lock:
+            return np.ptp(self.samples[:, channels, :], axis=2)
+
+    def latest(self):
+        with self.lock:
+            return self.samples[np.arange(self.droneCount), :, (self.heads - 1) % self.window]
+
+    def converged(self, threshold, maxHeight, since=-np.inf):
+        """
+        Which drones have a kalman variance that stayed within the threshold over a full window of
+        samples taken after the given time, while reporting a position on the ground
+        """
+        with self.lock:
+            full = (self.counts == self.window) & (np.min(self.timestamps, axis=1) >= since)
+            stable = np.all(np.ptp(self.samples[:, VARIANCE, :], axis=2) < threshold, axis=1)
+            latest = self.samples[np.arange(self.droneCount), Z, (self.heads - 1) % self.window]
+            return full & stable & (latest < maxHeight)
+
+    # -- VIEWS -- #
+
+    def view(self):
+        """
+        Read only view of the ring buffer, for displaying. Samples of a drone are in ring order,
+        starting at its head
+        """
+        samples = self.samples.view()
+        samples.flags.writeable = False
+        return samples
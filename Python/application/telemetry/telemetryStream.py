@@ -0,0 +1,152 @@
+import asyncio
+import time
+from collections import deque
+from threading import Condition
+
+from cflib.crazyflie.log import LogConfig
+
+from application.util import exceptionUtil
+
+
+class TelemetrySample():
+
+    def __init__(self, timestamp, position, variance, batteryLevel):
+        # Local time the sample arrived, in seconds
+        self.timestamp = timestamp
+        self.position = position
+        self.variance = variance
+        self.batteryLevel = batteryLevel
+
+
+class TelemetryStream():
+    """
+    A single log block per drone, started when the drone connects & kept running until it
+    disconnects. Position, kalman variance & battery all fit in one log packet, so everything
+    waiting on a drone reads the same stream instead of setting up its own log block.
+
+    The newest sample is kept as a plain reference, which is safe to read from any thread without
+    locking, next to a short history of recent samples.
+    """
+
+    VARIABLES = [
+        ('kalman.stateX', 'float'),
+        ('kalman.stateY', 'float'),
+        ('kalman.stateZ', 'float'),
+        ('kalman.varPX', 'float'),
+        ('kalman.varPY', 'float'),
+        ('kalman.varPZ', 'float'),
+        ('pm.batteryLevel', 'uint8_t')
+    ]
+
+    def __init__(self, crazyflie, periodMs=100, historyLength=50):
+        self.crazyflie = crazyflie
+        self.periodMs = periodMs
+        self.latest = None
+        self.history = deque(maxlen=historyLength)
+        self.sampleCount = 0
+        self.condition = Condition()
+        self.listeners = []
+        self.logConfig = None
+
+    def start(self):
+        self.logConfig = LogConfig(name='Telemetry', period_in_ms=self.periodMs)
+        for name, variableType in TelemetryStream.VARIABLES:
+            self.logConfig.add_variable(name, variableType)
+
+        self.crazyflie.log.add_config(self.logConfig)
+        self.logConfig.data_received_cb.add_callback(self.onData)
+        self.logConfig.start()
+        exceptionUtil.addInterruptListener(self.wakeWaiters)
+
+    def stop(self):
+        exceptionUtil.removeInterruptListener(self.wakeWaiters)
+        if self.logConfig is not None:
+            self.logConfig.data_received_cb.remove_callback(self.onData)
+            self.logConfig.delete()
+            self.logConfig = None
+
+    def addListener(self, listener):
+        self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def onData(self, timestamp, data, logConfig):
+        sample = TelemetrySample(
+            time.time(),
+            (data['kalman.stateX'], data['kalman.stateY'], data['kalman.stateZ']),
+            (data['kalman.varPX'], data['kalman.varPY'], data['kalman.varPZ']),
+            data['pm.batteryLevel']
+        )
+
+        self.history.append(sample)
+        self.latest = sample
+        with self.condition:
+            self.sampleCount += 1
+            self.condition.notify_all()
+
+        for listener in list(self.listeners):
+            listener(sample)
+
+    def wakeWaiters(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def nextSample(self, lastCount, timeout):
+        """
+        Wait for a sample newer than the given sample count
+        :return: The newest sample & sample count, or None & the given count on timeout or interrupt
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sampleCount > lastCount or exceptionUtil.INTERRUPT_FLAG.is_set(), timeout)
+            if self.sampleCount <= lastCount:
+                # Timed out, or woken up by an interrupt
+                return None, lastCount
+            return self.latest, self.sampleCount
+
+    def waitUntil(self, predicate, timeoutSeconds=None):
+        """
+        Evaluate the predicate on every new sample until it holds
+        :param predicate: A function taking a TelemetrySample & returning True once done
+        :param timeoutSeconds: Time to give up after, waits forever if None
+        :return: True if the predicate held, False on timeout
+        """
+        startTime = time.time()
+        count = self.sampleCount
+
+        while True:
+            exceptionUtil.checkInterrupt()
+            sample, count = self.nextSample(count, 2 * self.periodMs / 1000)
+            exceptionUtil.checkInterrupt()
+            if sample is not None and predicate(sample):
+                return True
+
+            if timeoutSeconds is not None and time.time() - startTime > timeoutSeconds:
+                return False
+
+    async def waitUntilAsync(self, predicate, timeoutSeconds=None):
+        """
+        Coroutine version of waitUntil, for waiting on the event loop of the Orchestrator. Samples
+        arrive on the radio thread & are handed over to the loop, so nothing blocks while waiting
+        :return: True if the predicate held, False on timeout
+        """
+        loop = asyncio.get_running_loop()
+        samples = asyncio.Queue()
+
+        def onSample(sample):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(samples.put_nowait, sample)
+
+        async def watch():
+            while not predicate(await samples.get()):
+                pass
+
+        self.addListener(onSample)
+        try:
+            await asyncio.wait_for(watch(), timeoutSeconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.removeListener(onSample)
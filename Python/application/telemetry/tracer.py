@@ -0,0 +1,259 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+
+# Categories of spans: the phases of a show, the steps of a single drone & what a whole channel does
+PHASE = 'phase'
+DRONE = 'drone'
+CHANNEL = 'channel'
+
+EXTENSION = '.trace.json'
+
+
+class Span():
+
+    def __init__(self, name, category, start, droneIndex=None, channel=None, size=None, args=None):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = None
+        self.droneIndex = droneIndex
+        self.channel = channel
+
+        # Bytes the step moved over the radio, if it's a transfer
+        self.size = size
+        self.args = args or {}
+        self.error = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class PhaseSummary():
+
+    def __init__(self, name, duration, drones, criticalDrone, criticalChannel, criticalFinish, medianFinish, size):
+        self.name = name
+        self.duration = duration
+        self.drones = drones
+
+        # The drone that finished its steps of the phase last, its channel & when it finished,
+        # in seconds from the start of the phase, next to when the median drone did
+        self.criticalDrone = criticalDrone
+        self.criticalChannel = criticalChannel
+        self.criticalFinish = criticalFinish
+        self.medianFinish = medianFinish
+        self.size = size
+
+
+class ChannelSummary():
+
+    def __init__(self, channel, drones, size, busyTime, slowestDrone, slowestTime):
+        self.channel = channel
+        self.drones = drones
+        self.size = size
+
+        # Time spent in the transfers on the channel, & the drone that spent the most
+        self.busyTime = busyTime
+        self.slowestDrone = slowestDrone
+        self.slowestTime = slowestTime
+
+
+class TraceSummary():
+
+    def __init__(self, phases, channels):
+        self.phases = phases
+        self.channels = channels
+
+    @staticmethod
+    def optional(value, form="{}"):
+        return "-" if value is None else form.format(value)
+
+    def __str__(self):
+        lines = ["{:<22} {:>8} {:>7} {:>9} {:>8} {:>11} {:>11} {:>9}".format(
+            "phase", "time (s)", "drones", "critical", "channel", "finish (s)", "median (s)", "bytes")]
+        for phase in self.phases:
+            lines.append("{:<22} {:>8.2f} {:>7} {:>9} {:>8} {:>11} {:>11} {:>9}".format(
+                phase.name, phase.duration, phase.drones, self.optional(phase.criticalDrone), self.optional(phase.criticalChannel),
+                self.optional(phase.criticalFinish, "{:.2f}"), self.optional(phase.medianFinish, "{:.2f}"), phase.size))
+
+        lines.append("")
+        lines.append("{:<22} {:>8} {:>7} {:>9} {:>8} {:>11}".format("channel", "busy (s)", "drones", "bytes", "slowest", "slowest (s)"))
+        for channel in self.channels:
+            lines.append("{:<22} {:>8.2f} {:>7} {:>9} {:>8} {:>11.2f}".format(
+                str(channel.channel), channel.busyTime, channel.drones, channel.size, self.optional(channel.slowestDrone), channel.slowestTime))
+        return "\n".join(lines)
+
+
+class Tracer():
+    """
+    Spans for the phases of a show & the steps every drone takes in them, like connecting, setting
+    a param, writing a memory or waiting for a position. Spans only keep a couple of timestamps &
+    are collected in a list, so tracing is cheap enough to stay on for every show. At the end the
+    spans are written as a Chrome trace, viewable in chrome://tracing or Perfetto, with a process
+    per radio channel & a thread per drone, & summarized into the drone & channel that held up
+    every phase.
+
+    The tracer of the running show is kept in CURRENT, code tracing a step goes through
+    Tracer.span, which does nothing while no show is traced.
+    """
+
+    CURRENT = None
+
+    def __init__(self, name=None):
+        self.name = name if name is not None else time.strftime('%Y-%m-%d_%H-%M-%S')
+        self.startTime = time.perf_counter()
+        self.spans = []
+        self.lock = Lock()
+
+    @staticmethod
+    def span(name, category=DRONE, drone=None, channel=None, size=None, **args):
+        """
+        Trace a step of the current show, to be used as a context manager
+        :param drone: The Drone taking the step, its index & channel are recorded
+        :param channel: Radio channel of the step, defaults to the one of the drone
+        :param size: Bytes the step moves over the radio
+        :return: A context manager giving the Span, None while nothing is traced
+        """
+        tracer = Tracer.CURRENT
+        if tracer is None:
+            return nullcontext()
+        return tracer.trace(name, category, drone, channel, size, **args)
+
+    @contextmanager
+    def trace(self, name, category=DRONE, drone=None, channel=None, size=None, **args):
+        span = self.begin(name, category, drone, channel, size, args)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+
+    def record(self, name, start, end, category=DRONE, drone=None, channel=None, size=None, **args):
+        """
+        Add a span that was timed elsewhere, with perf_counter timestamps
+        """
+        span = self.begin(name, category, drone, channel, size, args)
+        span.start = start
+        span.end = end
+        return span
+
+    def begin(self, name, category, drone, channel, size, args):
+        droneIndex = drone.swarmIndex if drone is not None else None
+        if channel is None and drone is not None:
+            channel = drone.channel
+
+        span = Span(name, category, time.perf_counter(), droneIndex, channel, size, args)
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    def finished(self, category=None):
+        with self.lock:
+            spans = list(self.spans)
+        return [span for span in spans if span.end is not None and (category is None or span.category == category)]
+
+    # -- EXPORT -- #
+
+    def chromeTrace(self):
+        """
+        :return: The spans as a Chrome trace, phases in the first process, then a process per radio
+        channel with a thread per drone
+        """
+        events = []
+        names = {}
+
+        for span in self.finished():
+            process = 0 if span.channel is None else span.channel + 1
+            thread = 0 if span.droneIndex is None else span.droneIndex + 1
+            names[(process, None)] = "Sequence" if span.channel is None else "Channel " + str(span.channel)
+            names[(process, thread)] = "Drone " + str(span.droneIndex) if span.droneIndex is not None else \
+                ("Phases" if span.channel is None else "Broadcast")
+
+            args = dict(span.args)
+            if span.size is not None:
+                args['bytes'] = span.size
+            if span.error is not None:
+                args['error'] = span.error
+
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': (span.start - self.startTime) * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': process,
+                'tid': thread,
+                'args': args
+            })
+
+        for (process, thread), name in names.items():
+            if thread is None:
+                events.append({'name': 'process_name', 'ph': 'M', 'pid': process, 'args': {'name': name}})
+            else:
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': process, 'tid': thread, 'args': {'name': name}})
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'show': self.name}}
+
+    def save(self, directory):
+        """
+        :return: Path of the written Chrome trace
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.name + EXTENSION)
+        with open(path, 'w') as traceFile:
+            json.dump(self.chromeTrace(), traceFile)
+        return path
+
+    # -- SUMMARY -- #
+
+    def summary(self):
+        """
+        :return: A TraceSummary with the critical drone of every phase, & the transfers of every channel
+        """
+        spans = self.finished()
+        droneSpans = [span for span in spans if span.category != PHASE]
+        phases = []
+
+        for phase in sorted(self.finished(PHASE), key=lambda span: span.start):
+            inside = [span for span in droneSpans if span.start >= phase.start and span.end <= phase.end]
+            finishes = {}
+            for span in inside:
+                if span.droneIndex is not None:
+                    finishes[span.droneIndex] = max(finishes.get(span.droneIndex, span.end), span.end)
+
+            size = sum(span.size for span in inside if span.size is not None)
+            if len(finishes) == 0:
+                phases.append(PhaseSummary(phase.name, phase.duration, 0, None, None, None, None, size))
+                continue
+
+            critical = max(finishes, key=finishes.get)
+            channel = next(span.channel for span in inside if span.droneIndex == critical)
+            ordered = sorted(finishes.values())
+            phases.append(PhaseSummary(phase.name, phase.duration, len(finishes), critical, channel,
+                                       finishes[critical] - phase.start, ordered[len(ordered) // 2] - phase.start, size))
+
+        return TraceSummary(phases, self.channelSummaries(droneSpans))
+
+    def channelSummaries(self, spans):
+        channels = {}
+        for span in spans:
+            if span.channel is not None:
+                channels.setdefault(span.channel, []).append(span)
+
+        summaries = []
+        for channel in sorted(channels):
+            transfers = [span for span in channels[channel] if span.size is not None]
+            busy = {}
+            for span in transfers:
+                busy[span.droneIndex] = busy.get(span.droneIndex, 0.0) + span.duration
+
+            drones = set(span.droneIndex for span in channels[channel] if span.droneIndex is not None)
+            slowest = max((drone for drone in busy if drone is not None), key=busy.get, default=None)
+            summaries.append(ChannelSummary(channel, len(drones), sum(span.size for span in transfers), sum(busy.values()),
+                                            slowest, busy.get(slowest, 0.0)))
+        return summaries
\ No newline at end of file
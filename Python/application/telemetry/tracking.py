@@ -0,0 +1,144 @@
+import os
+import time
+
+import numpy as np
+
+from application.telemetry import flightRecorder
+from application.trajectory import TrajectoryBatch
+
+
+class TrackingError():
+
+    def __init__(self, drone, address, track, rms, maximum, maximumTime, lag, sampleCount):
+        self.drone = drone
+        self.address = address
+        self.track = track
+        self.rms = rms
+        self.maximum = maximum
+        self.maximumTime = maximumTime
+
+        # Delay of the flown path behind the planned one, in seconds
+        self.lag = lag
+        self.sampleCount = sampleCount
+
+    def __str__(self):
+        return "Drone {} (track {}): RMS {:.3f}m, max {:.3f}m at {:.2f}s, lag {:.2f}s".format(
+            self.drone, self.track + 1, self.rms, self.maximum, self.maximumTime, self.lag)
+
+
+class TrackingReport():
+
+    def __init__(self, times, errors, planned, actual, entries, elapsed):
+        # Time grid relative to the trajectory start, the error of every assigned drone over it
+        # (NaN where nothing was recorded) & the planned & flown positions behind it
+        self.times = times
+        self.errors = errors
+        self.planned = planned
+        self.actual = actual
+        self.entries = entries
+        self.elapsed = elapsed
+
+    @property
+    def ranked(self):
+        """
+        Drones ordered from the worst to the best tracking
+        """
+        return sorted(self.entries, key=lambda entry: -entry.rms if np.isfinite(entry.rms) else np.inf)
+
+    def __str__(self):
+        lines = ["{:>6} {:>6} {:>28} {:>9} {:>9} {:>8} {:>7}".format("drone", "track", "address", "rms (m)", "max (m)", "at (s)", "lag (s)")]
+        for entry in self.ranked:
+            lines.append("{:>6} {:>6} {:>28} {:>9.3f} {:>9.3f} {:>8.2f} {:>7.2f}".format(
+                entry.drone, entry.track + 1, str(entry.address), entry.rms, entry.maximum, entry.maximumTime, entry.lag))
+        return "\n".join(lines)
+
+    def saveCurves(self, directory):
+        """
+        Write the error curve of every drone to its own npz file
+        :return: The written files
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for row, entry in enumerate(self.entries):
+            file = os.path.join(directory, "drone_{:03d}.npz".format(entry.drone))
+            np.savez_compressed(file, times=self.times, error=self.errors[row], planned=self.planned[row],
+                                actual=self.actual[row], track=entry.track, address=str(entry.address))
+            files.append(file)
+        return files
+
+
+def computeTrackingError(recording, batch, rate=None, maxLag=0.5, lagStep=0.02):
+    """
+    Compare the flown positions of a recorded show to the planned trajectories. Recorded samples
+    are aligned on the trajectory start marker & resampled onto a shared time grid, so the whole
+    swarm is compared in a few array operations.
+
+    :param recording: FlightRecording of the show
+    :param batch: TrajectoryBatch of the sequence, with every track of the sequence
+    :param rate: Rate of the shared time grid in Hz, defaults to the telemetry rate of the recording
+    :param maxLag: Largest lag searched in either direction, in seconds
+    :param lagStep: Resolution of the lag search, in seconds
+    :return: TrackingReport
+    """
+    startTime = time.perf_counter()
+    start = recording.markerTime(flightRecorder.MARKER_TRAJECTORY_START)
+    if start is None:
+        raise ValueError("Recording has no trajectory start marker")
+
+    if rate is None:
+        rate = 1000.0 / recording.metadata.get('telemetryPeriodMs', 100)
+
+    addresses = {entry['index']: entry.get('address') for entry in recording.metadata.get('drones', [])}
+    assignments = sorted((drone, track) for drone, track in recording.assignments.items() if track < batch.droneCount)
+    drones = [drone for drone, _ in assignments]
+    tracks = [track for _, track in assignments]
+    if len(drones) == 0:
+        raise ValueError("Recording has no drones assigned to tracks of the sequence")
+
+    tracked = TrajectoryBatch([batch.trajectories[track] for track in tracks])
+    times = tracked.timeGrid(rate)
+
+    # Flown positions on the time grid, NaN outside of the recorded span of each drone
+    actual = np.full((len(drones), len(times), 3), np.nan)
+    for row, drone in enumerate(drones):
+        sampleTimes, values = recording.samples(drone)
+        sampleTimes = sampleTimes - start
+        if len(sampleTimes) < 2:
+            continue
+
+        covered = (times >= sampleTimes[0]) & (times <= sampleTimes[-1])
+        for axis in range(0, 3):
+            actual[row, covered, axis] = np.interp(times[covered], sampleTimes, values[:, axis])
+
+    planned = tracked.positions(times)
+    errors = np.linalg.norm(actual - planned, axis=2)
+
+    # Lag is the shift of the planned path that best explains the flown one, every candidate shift
+    # is checked for the whole swarm at once, keeping only the best shift of each drone so far
+    lags = np.arange(-maxLag, maxLag + lagStep / 2, lagStep)
+    valid = np.isfinite(errors)
+    flown = np.nan_to_num(actual)
+    validCounts = np.maximum(np.sum(valid, axis=1), 1)
+    bestLags = np.zeros(len(drones))
+    bestErrors = np.full(len(drones), np.inf)
+    for lag in lags:
+        squared = np.where(valid, np.sum((flown - tracked.positions(times - lag)) ** 2, axis=2), 0.0)
+        lagErrors = np.sum(squared, axis=1) / validCounts
+        better = lagErrors < bestErrors
+        bestLags[better] = lag
+        bestErrors[better] = lagErrors[better]
+
+    entries = []
+    for row, drone in enumerate(drones):
+        if not np.any(valid[row]):
+            entries.append(TrackingError(drone, addresses.get(drone), tracks[row], np.nan, np.nan, np.nan, np.nan, 0))
+            continue
+
+        worst = int(np.nanargmax(errors[row]))
+        entries.append(TrackingError(
+            drone, addresses.get(drone), tracks[row],
+            float(np.sqrt(np.mean(errors[row, valid[row]] ** 2))), float(errors[row, worst]), float(times[worst]),
+            float(bestLags[row]), int(np.sum(valid[row]))
+        ))
+
+    return TrackingReport(times, errors, planned, actual, entries, time.perf_counter() - startTime)
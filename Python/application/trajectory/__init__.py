@@ -0,0 +1,4 @@
+from .compressedTrajectory import Trajectory, decodeTrajectory, encodeHold, trajectoryLength
+from .trajectoryBatch import TrajectoryBatch
+from .separation import SeparationReport, SeparationViolation, checkSeparation
+from .limits import LimitsReport, LimitViolation, checkLimits
\ No newline at end of file
@@ -0,0 +1,162 @@
+import struct
+from math import comb, radians
+
+import numpy as np
+
+# Compressed piecewise Bezier format, as written by the Unity TrajectoryExporter & read by the firmware:
+#
+#   Start       x, y, z, yaw (int16 each). Positions in millimeters, yaw in tenths of a degree
+#   Segments    type (uint8), duration in milliseconds (uint16), then the control points for
+#               x, y, z & yaw in that order (int16 each)
+#
+# The segment type packs two bits per axis (x in bits 0-1 ... yaw in bits 6-7), which select between
+# a constant (no control points), linear (1), cubic (3) or 7th degree (7) Bezier curve. The first
+# control point of every curve is implicit, it's the end point of the previous segment on that axis.
+
+DEGREE = 7
+AXES = 4
+CONTROL_POINTS = {0: 0, 1: 1, 2: 3, 3: 7}
+
+POSITION_SCALE = 0.001
+YAW_SCALE = radians(0.1)
+
+START = struct.Struct('<4h')
+SEGMENT = struct.Struct('<BH')
+
+
+def bezierToPower(degree):
+    """
+    Matrix mapping the control points of a Bezier curve to the coefficients
+    of the same curve in the power basis, lowest order first
+    """
+    matrix = np.zeros((degree + 1, degree + 1))
+    for j in range(0, degree + 1):
+        for k in range(0, j + 1):
+            matrix[j, k] = comb(degree, j) * comb(j, k) * (-1) ** (j - k)
+    return matrix
+
+
+CONVERSIONS = {count: bezierToPower(count) for count in CONTROL_POINTS.values() if count > 0}
+
+
+class Trajectory():
+
+    def __init__(self, start, durations, coefficients):
+        # Start state (x, y, z in meters, yaw in radians)
+        self.start = start
+
+        # Segment durations in seconds, shape (segments,)
+        self.durations = durations
+
+        # Power basis coefficients over normalized segment time, shape (segments, axes, DEGREE + 1)
+        self.coefficients = coefficients
+
+    @property
+    def segmentCount(self):
+        return len(self.durations)
+
+    @property
+    def duration(self):
+        return float(np.sum(self.durations))
+
+    @property
+    def end(self):
+        if self.segmentCount == 0:
+            return self.start
+        return np.sum(self.coefficients[-1], axis=1)
+
+
+def encodeHold(position, duration, yaw=0.0):
+    """
+    Trajectory that holds a single position for the given duration, in seconds
+    """
+    scales = (POSITION_SCALE, POSITION_SCALE, POSITION_SCALE, YAW_SCALE)
+    start = [int(round(value / scale)) for value, scale in zip(tuple(position) + (yaw,), scales)]
+    data = bytearray(START.pack(*start))
+
+    # Segment durations are limited to a uint16 of milliseconds
+    remaining = int(round(duration * 1000))
+    while remaining > 0:
+        segmentDuration = min(remaining, 0xFFFF)
+        data.extend(SEGMENT.pack(0, segmentDuration))
+        remaining -= segmentDuration
+
+    return bytes(data)
+
+
+def trajectoryLength(data, offset=0):
+    """
+    Length in bytes of the trajectory starting at the offset. Like the firmware, a segment with
+    a zero duration or the end of the data ends the trajectory
+    """
+    buffer = bytes(data)
+    end = offset + START.size
+    if end > len(buffer):
+        return 0
+
+    while end + SEGMENT.size <= len(buffer):
+        segmentType, duration = SEGMENT.unpack_from(buffer, end)
+        if duration == 0:
+            break
+
+        size = SEGMENT.size + 2 * sum(CONTROL_POINTS[(segmentType >> (2 * axis)) & 0x03] for axis in range(0, AXES))
+        if end + size > len(buffer):
+            break
+        end += size
+
+    return end - offset
+
+
+def decodeTrajectory(data):
+    buffer = bytes(data)
+    if len(buffer) == 0:
+        raise ValueError("Trajectory data is empty")
+
+    if len(buffer) < START.size:
+        raise ValueError("Trajectory data is truncated")
+
+    scales = np.array([POSITION_SCALE, POSITION_SCALE, POSITION_SCALE, YAW_SCALE])
+    current = np.array(START.unpack_from(buffer, 0), dtype=float) * scales
+    start = current.copy()
+
+    durations = []
+    coefficients = []
+    offset = START.size
+    terminated = False
+
+    while offset + SEGMENT.size <= len(buffer):
+        segmentType, duration = SEGMENT.unpack_from(buffer, offset)
+        if duration == 0:
+            # Like the firmware, stop at a zero duration segment, anything after it is never flown
+            terminated = True
+            break
+        offset += SEGMENT.size
+
+        segment = np.zeros((AXES, DEGREE + 1))
+        for axis in range(0, AXES):
+            count = CONTROL_POINTS[(segmentType >> (2 * axis)) & 0x03]
+            if count == 0:
+                segment[axis, 0] = current[axis]
+                continue
+
+            if offset + 2 * count > len(buffer):
+                raise ValueError("Trajectory segment is truncated")
+
+            points = np.frombuffer(buffer, dtype='<i2', count=count, offset=offset) * scales[axis]
+            offset += 2 * count
+
+            controlPoints = np.concatenate(([current[axis]], points))
+            segment[axis, :count + 1] = CONVERSIONS[count] @ controlPoints
+            current[axis] = controlPoints[-1]
+
+        durations.append(duration / 1000.0)
+        coefficients.append(segment)
+
+    if not terminated and offset != len(buffer):
+        raise ValueError("Unexpected trailing trajectory data")
+
+    return Trajectory(
+        start,
+        np.array(durations, dtype=float),
+        np.array(coefficients, dtype=float).reshape(-1, AXES, DEGREE + 1)
+    )
@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+
+SPEED = "speed"
+ACCELERATION = "acceleration"
+BOUNDS = "bounds"
+
+UNITS = {SPEED: "m/s", ACCELERATION: "m/s²", BOUNDS: "m"}
+
+
+class LimitViolation():
+
+    def __init__(self, track, kind, startTime, endTime, peak, limit):
+        self.track = track
+        self.kind = kind
+        self.startTime = startTime
+        self.endTime = endTime
+
+        # Highest value reached during the interval. For bounds, the furthest distance outside the arena
+        self.peak = peak
+        self.limit = limit
+
+    def __str__(self):
+        if self.kind == BOUNDS:
+            return "Track {} leaves the arena by {:.2f}m ({:.2f}s - {:.2f}s)".format(
+                self.track + 1, self.peak, self.startTime, self.endTime)
+
+        return "Track {} {} {:.2f}{} above {:.2f}{} ({:.2f}s - {:.2f}s)".format(
+            self.track + 1, self.kind, self.peak, UNITS[self.kind], self.limit, UNITS[self.kind], self.startTime, self.endTime)
+
+
+class LimitsReport():
+
+    def __init__(self, times, speeds, accelerations, violations, elapsed):
+        self.times = times
+
+        # Peak values per track, with the time they were reached
+        self.peakSpeeds = np.max(speeds, axis=1, initial=0.0)
+        self.peakSpeedTimes = times[np.argmax(speeds, axis=1)] if len(times) > 0 else np.zeros(len(speeds))
+        self.peakAccelerations = np.max(accelerations, axis=1, initial=0.0)
+        self.peakAccelerationTimes = times[np.argmax(accelerations, axis=1)] if len(times) > 0 else np.zeros(len(accelerations))
+
+        self.violations = violations
+        self.elapsed = elapsed
+
+    @property
+    def passed(self):
+        return len(self.violations) == 0
+
+    @property
+    def peakSpeed(self):
+        return float(np.max(self.peakSpeeds, initial=0.0))
+
+    @property
+    def peakAcceleration(self):
+        return float(np.max(self.peakAccelerations, initial=0.0))
+
+    def getViolations(self, track):
+        return [violation for violation in self.violations if violation.track == track]
+
+
+def checkLimits(batch, maxSpeed, maxAcceleration, lowerBounds, upperBounds, rate=100):
+    """
+    Sample every trajectory of the batch on a shared time grid & find the intervals where a track
+    goes faster, accelerates harder or flies further out than the drones & positioning system allow.
+
+    :param batch: TrajectoryBatch for the sequence
+    :param maxSpeed: Highest allowed speed, in m/s
+    :param maxAcceleration: Highest allowed acceleration, in m/s²
+    :param lowerBounds: Lowest allowed x, y & z coordinates of the arena, in meters
+    :param upperBounds: Highest allowed x, y & z coordinates of the arena, in meters
+    :param rate: Sample rate of the time grid, in Hz
+    :return: LimitsReport
+    """
+    startTime = time.perf_counter()
+    times = batch.timeGrid(rate)
+
+    if batch.droneCount == 0 or len(times) == 0:
+        empty = np.zeros((batch.droneCount, len(times)))
+        return LimitsReport(times, empty, empty, [], time.perf_counter() - startTime)
+
+    positions, velocities, accelerations = batch.evaluate(times)
+    speeds = np.linalg.norm(velocities, axis=2)
+    accelerations = np.linalg.norm(accelerations, axis=2)
+
+    # Distance outside the arena along the worst axis, zero while inside
+    below = np.asarray(lowerBounds, dtype=float) - positions
+    above = positions - np.asarray(upperBounds, dtype=float)
+    outside = np.max(np.maximum(below, above), axis=2).clip(min=0.0)
+
+    violations = []
+    violations += findIntervals(speeds, speeds > maxSpeed, times, SPEED, maxSpeed)
+    violations += findIntervals(accelerations, accelerations > maxAcceleration, times, ACCELERATION, maxAcceleration)
+    violations += findIntervals(outside, outside > 0.0, times, BOUNDS, 0.0)
+    violations.sort(key=lambda violation: (violation.track, violation.startTime))
+
+    return LimitsReport(times, speeds, accelerations, violations, time.perf_counter() - startTime)
+
+
+def findIntervals(values, mask, times, kind, limit):
+    if not np.any(mask):
+        return []
+
+    # Rising & falling edges of the mask, padded so intervals touching either end are closed
+    padded = np.pad(mask.astype(np.int8), ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    tracks, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    # Peak of every interval in one pass: reduce over the flattened (track, sample) ranges
+    flatValues = np.where(mask, values, 0.0).ravel()
+    sampleCount = values.shape[1]
+    peaks = np.maximum.reduceat(flatValues, tracks * sampleCount + starts)
+
+    violations = []
+    for track, start, end, peak in zip(tracks, starts, ends, peaks):
+        violations.append(LimitViolation(int(track), kind, float(times[start]), float(times[end - 1]), float(peak), limit))
+    return violations
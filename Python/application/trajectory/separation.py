@@ -0,0 +1,158 @@
+import time
+
+import numpy as np
+
+# Neighbouring cells that need to be searched for each point. Only half of the 26 neighbours are
+# needed (plus the cell itself), since every pair is found from the point with the lower key
+NEIGHBOUR_OFFSETS = [
+    (dx, dy, dz)
+    for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+]
+
+
+class SeparationViolation():
+
+    def __init__(self, trackOne, trackTwo, startTime, endTime, closestDistance, closestTime):
+        self.trackOne = trackOne
+        self.trackTwo = trackTwo
+        self.startTime = startTime
+        self.endTime = endTime
+        self.closestDistance = closestDistance
+        self.closestTime = closestTime
+
+    def __str__(self):
+        return "Tracks {} & {} within {:.2f}m at {:.2f}s ({:.2f}s - {:.2f}s)".format(
+            self.trackOne + 1, self.trackTwo + 1, self.closestDistance, self.closestTime, self.startTime, self.endTime)
+
+
+class SeparationReport():
+
+    def __init__(self, times, minimumSeparation, violations, elapsed):
+        self.times = times
+
+        # Closest pair distance at each time step, infinite when no pair was within the search radius
+        self.minimumSeparation = minimumSeparation
+        self.violations = violations
+        self.elapsed = elapsed
+
+    @property
+    def passed(self):
+        return len(self.violations) == 0
+
+    @property
+    def closestDistance(self):
+        return float(np.min(self.minimumSeparation)) if len(self.minimumSeparation) > 0 else np.inf
+
+    @property
+    def closestTime(self):
+        return float(self.times[np.argmin(self.minimumSeparation)]) if len(self.times) > 0 else 0.0
+
+
+def checkSeparation(batch, minimumDistance, rate=100, searchRadius=None, verticalScale=1.0):
+    """
+    Sample every trajectory of the batch on a shared time grid & find all pairs of drones closer
+    than the minimum distance. Candidate pairs come from a uniform grid hashed over (time, cell),
+    so the cost grows with the number of nearby drones rather than with every pair in the swarm.
+
+    :param batch: TrajectoryBatch for the sequence
+    :param minimumDistance: Required separation between any two drones, in meters
+    :param rate: Sample rate of the time grid, in Hz
+    :param searchRadius: Distance up to which the per time step minimum is reported. Defaults to twice the minimum
+    :param verticalScale: Vertical distances are divided by this, values above 1 account for downwash
+    :return: SeparationReport
+    """
+    startTime = time.perf_counter()
+    searchRadius = searchRadius if searchRadius is not None else 2.0 * minimumDistance
+    times = batch.timeGrid(rate)
+    sampleCount = len(times)
+    minimumSeparation = np.full(sampleCount, np.inf)
+
+    if batch.droneCount < 2 or sampleCount == 0:
+        return SeparationReport(times, minimumSeparation, [], time.perf_counter() - startTime)
+
+    scaled = batch.positions(times) * np.array([1.0, 1.0, 1.0 / verticalScale])
+    droneCount = scaled.shape[0]
+    points = scaled.reshape(-1, 3)
+    droneIndexes = np.repeat(np.arange(droneCount), sampleCount)
+    timeIndexes = np.tile(np.arange(sampleCount), droneCount)
+
+    # Cells are padded by one on each side, so neighbour lookups never wrap into another row
+    cells = np.floor((points - points.min(axis=0)) / searchRadius).astype(np.int64) + 1
+    dimensions = cells.max(axis=0) + 2
+    keys = ((timeIndexes * dimensions[0] + cells[:, 0]) * dimensions[1] + cells[:, 1]) * dimensions[2] + cells[:, 2]
+
+    # Lookups are done in sorted order, which keeps the searches cache friendly
+    order = np.argsort(keys, kind='stable')
+    sortedKeys = keys[order]
+    ranks = np.arange(len(order))
+
+    firstPoints = []
+    secondPoints = []
+
+    # Pairs within the same cell, each found once from the point that sorts first
+    cellEnd = np.searchsorted(sortedKeys, sortedKeys, side='right')
+    collectPairs(firstPoints, secondPoints, order, ranks + 1, cellEnd)
+
+    for dx, dy, dz in NEIGHBOUR_OFFSETS:
+        neighbourKeys = sortedKeys + (dx * dimensions[1] + dy) * dimensions[2] + dz
+        lower = np.searchsorted(sortedKeys, neighbourKeys, side='left')
+        upper = np.searchsorted(sortedKeys, neighbourKeys, side='right')
+        collectPairs(firstPoints, secondPoints, order, lower, upper)
+
+    if len(firstPoints) == 0:
+        # No two drones ever share or neighbour a cell
+        return SeparationReport(times, minimumSeparation, [], time.perf_counter() - startTime)
+
+    first = np.concatenate(firstPoints)
+    second = np.concatenate(secondPoints)
+    distances = np.linalg.norm(points[first] - points[second], axis=1)
+
+    nearby = distances < searchRadius
+    first, second, distances = first[nearby], second[nearby], distances[nearby]
+    np.minimum.at(minimumSeparation, timeIndexes[first], distances)
+
+    tooClose = distances < minimumDistance
+    violations = groupViolations(
+        droneIndexes[first[tooClose]], droneIndexes[second[tooClose]], timeIndexes[first[tooClose]], distances[tooClose], times)
+
+    return SeparationReport(times, minimumSeparation, violations, time.perf_counter() - startTime)
+
+
+def collectPairs(firstPoints, secondPoints, order, lower, upper):
+    counts = np.maximum(upper - lower, 0)
+    total = int(np.sum(counts))
+    if total == 0:
+        return
+
+    owners = np.repeat(order, counts)
+    withinRange = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    firstPoints.append(owners)
+    secondPoints.append(order[np.repeat(lower, counts) + withinRange])
+
+
+def groupViolations(dronesOne, dronesTwo, timeIndexes, distances, times):
+    if len(distances) == 0:
+        return []
+
+    trackOne = np.minimum(dronesOne, dronesTwo)
+    trackTwo = np.maximum(dronesOne, dronesTwo)
+    order = np.lexsort((timeIndexes, trackTwo, trackOne))
+    trackOne, trackTwo, timeIndexes, distances = trackOne[order], trackTwo[order], timeIndexes[order], distances[order]
+
+    # A new interval starts whenever the pair changes, or the pair was apart for at least one sample
+    breaks = (np.diff(trackOne) != 0) | (np.diff(trackTwo) != 0) | (np.diff(timeIndexes) > 1)
+    starts = np.concatenate(([0], np.nonzero(breaks)[0] + 1))
+    ends = np.concatenate((starts[1:], [len(distances)]))
+
+    violations = []
+    for start, end in zip(starts, ends):
+        closest = start + int(np.argmin(distances[start:end]))
+        violations.append(SeparationViolation(
+            int(trackOne[start]), int(trackTwo[start]),
+            float(times[timeIndexes[start]]), float(times[timeIndexes[end - 1]]),
+            float(distances[closest]), float(times[timeIndexes[closest]])
+        ))
+
+    violations.sort(key=lambda violation: violation.closestDistance)
+    return violations
@@ -0,0 +1,117 @@
+import numpy as np
+
+from .compressedTrajectory import DEGREE, decodeTrajectory
+
+
+class TrajectoryBatch():
+    """
+    Decoded trajectories for a whole swarm, padded into dense arrays so positions, velocities
+    & accelerations for every drone can be evaluated over a time grid in a single call
+    """
+
+    def __init__(self, trajectories):
+        self.trajectories = trajectories
+        droneCount = len(trajectories)
+        segmentCount = max([trajectory.segmentCount for trajectory in trajectories] + [1])
+
+        self.starts = np.zeros((droneCount, 3))
+        self.durations = np.array([trajectory.duration for trajectory in trajectories]).reshape(droneCount)
+        self.segmentCounts = np.array([trajectory.segmentCount for trajectory in trajectories], dtype=int).reshape(droneCount)
+
+        # Padding segments are zero length, and hold the final position of the trajectory
+        self.segmentStarts = np.zeros((droneCount, segmentCount))
+        self.segmentDurations = np.zeros((droneCount, segmentCount))
+        self.coefficients = np.zeros((droneCount, segmentCount, 3, DEGREE + 1))
+
+        for index, trajectory in enumerate(trajectories):
+            count = trajectory.segmentCount
+            self.starts[index] = trajectory.start[:3]
+            self.segmentDurations[index, :count] = trajectory.durations
+            # Durations are whole milliseconds, rounding keeps boundaries exact so samples landing on
+            # a boundary resolve to the same segment no matter where the drone sits in the batch
+            self.segmentStarts[index, :count] = np.round(np.cumsum(trajectory.durations) - trajectory.durations, 3)
+            self.segmentStarts[index, count:] = trajectory.duration
+            self.coefficients[index, :count] = trajectory.coefficients[:, :3]
+            self.coefficients[index, count:, :, 0] = trajectory.end[:3]
+
+        # Derivative coefficients, still over normalized segment time
+        powers = np.arange(1, DEGREE + 1)
+        self.velocityCoefficients = self.coefficients[..., 1:] * powers
+        self.accelerationCoefficients = self.velocityCoefficients[..., 1:] * powers[:-1]
+
+    @staticmethod
+    def fromSequence(sequence):
+        trajectories = []
+        for index in range(0, sequence.trackCount):
+            trajectories.append(decodeTrajectory(sequence.getTrack(index).trajectory))
+        return TrajectoryBatch(trajectories)
+
+    @property
+    def droneCount(self):
+        return len(self.trajectories)
+
+    @property
+    def duration(self):
+        return float(np.max(self.durations)) if self.droneCount > 0 else 0.0
+
+    def timeGrid(self, rate):
+        sampleCount = int(np.floor(self.duration * rate)) + 1
+        return np.arange(0, sampleCount) / float(rate)
+
+    def locate(self, times):
+        """
+        Find the active segment & the normalized time within it, for every drone and sample.
+        Times are shared by every drone, or shaped (drones, samples) to give each drone its own.
+        Times before the start or after the end of a trajectory are clamped
+        """
+        times = np.asarray(times, dtype=float)
+        grid = times if times.ndim == 2 else times[np.newaxis, :]
+        droneCount, segmentCount = self.segmentStarts.shape
+        clamped = np.clip(grid, 0.0, self.durations[:, np.newaxis])
+
+        # Offset every drone into its own time range, so one searchsorted call covers the whole swarm
+        span = self.duration + 1.0
+        offsets = np.arange(0, droneCount)[:, np.newaxis] * span
+        boundaries = (self.segmentStarts + offsets).ravel()
+        flatIndexes = np.searchsorted(boundaries, (clamped + offsets).ravel(), side='right') - 1
+
+        segments = flatIndexes.reshape(droneCount, -1) - np.arange(0, droneCount)[:, np.newaxis] * segmentCount
+        segments = np.clip(segments, 0, np.maximum(self.segmentCounts - 1, 0)[:, np.newaxis])
+
+        rows = np.arange(0, droneCount)[:, np.newaxis]
+        durations = self.segmentDurations[rows, segments]
+        safeDurations = np.where(durations > 0, durations, 1.0)
+        normalized = np.where(durations > 0, (clamped - self.segmentStarts[rows, segments]) / safeDurations, 1.0)
+        active = (grid >= 0.0) & (grid <= self.durations[:, np.newaxis])
+        return segments, np.clip(normalized, 0.0, 1.0), safeDurations, active
+
+    def evaluate(self, times, derivatives=2):
+        """
+        Evaluate every trajectory at the given times (seconds since the trajectory start), shared
+        by every drone or shaped (drones, samples). Returns arrays of shape (drones, samples, 3): the positions, followed by the velocities
+        and accelerations depending on the number of derivatives requested
+        """
+        segments, normalized, durations, active = self.locate(times)
+        results = [self.horner(self.coefficients, segments, normalized)]
+
+        if derivatives >= 1:
+            velocity = self.horner(self.velocityCoefficients, segments, normalized) / durations[..., np.newaxis]
+            results.append(np.where(active[..., np.newaxis], velocity, 0.0))
+
+        if derivatives >= 2:
+            acceleration = self.horner(self.accelerationCoefficients, segments, normalized) / (durations ** 2)[..., np.newaxis]
+            results.append(np.where(active[..., np.newaxis], acceleration, 0.0))
+
+        return results[0] if len(results) == 1 else tuple(results)
+
+    def positions(self, times):
+        return self.evaluate(times, 0)
+
+    def horner(self, coefficients, segments, normalized):
+        # Gather one power at a time, rather than materializing every coefficient for every sample
+        rows = np.arange(0, segments.shape[0])[:, np.newaxis]
+        highest = coefficients.shape[-1] - 1
+        values = coefficients[rows, segments, :, highest]
+        for power in range(highest - 1, -1, -1):
+            values = values * normalized[..., np.newaxis] + coefficients[rows, segments, :, power]
+        return values
@@ -1,8 +1,12 @@
-from threading import Event
+from threading import Event, Lock
 from application.common.exceptions import UnknownException, SequenceInterrupt
 
 INTERRUPT_FLAG = Event()
 
+# Called when an interrupt is raised, to wake anything blocked on something other than the flag
+INTERRUPT_LISTENERS = []
+LISTENER_LOCK = Lock()
+
 def raiseError(message, exceptionType = UnknownException):
     print(message)
     raise exceptionType(message)
@@ -12,9 +16,29 @@ def checkInterrupt(ignore=False):
     if INTERRUPT_FLAG.is_set() and not ignore:
         raise SequenceInterrupt()
 
+def waitForInterrupt(timeout=None):
+    """
+    Block until an interrupt is raised or the timeout passes
+    :return: True if interrupted
+    """
+    return INTERRUPT_FLAG.wait(timeout)
+
 def setInterrupt(value):
     global INTERRUPT_FLAG
     if value:
         INTERRUPT_FLAG.set()
+        with LISTENER_LOCK:
+            listeners = list(INTERRUPT_LISTENERS)
+        for listener in listeners:
+            listener()
     else:
-        INTERRUPT_FLAG.clear()
\ No newline at end of file
+        INTERRUPT_FLAG.clear()
+
+def addInterruptListener(listener):
+    with LISTENER_LOCK:
+        INTERRUPT_LISTENERS.append(listener)
+
+def removeInterruptListener(listener):
+    with LISTENER_LOCK:
+        if listener in INTERRUPT_LISTENERS:
+            INTERRUPT_LISTENERS.remove(listener)
\ No newline at end of file
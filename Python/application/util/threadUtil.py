@@ -7,15 +7,18 @@ def runInBackground(function, *args, **kwargs):
     QThreadPool.globalInstance().start(runnable)
 
 
-def interruptibleSleep(duration, ignore=False, interval=0.25):
-    start = time.time()
-    elapsed = time.time() - start
+def interruptibleSleep(duration, ignore=False):
+    """
+    Sleep for the given duration, waking up as soon as the sequence is interrupted
+    :param ignore: Sleep the full duration even when interrupted
+    """
+    duration = max(duration, 0)
+    if ignore:
+        time.sleep(duration)
+        return
 
-    while elapsed < duration:
-        sleepTime = max(min(interval, duration - elapsed), 0)
-        time.sleep(sleepTime)
-        exceptionUtil.checkInterrupt(ignore)
-        elapsed = time.time() - start
+    exceptionUtil.waitForInterrupt(duration)
+    exceptionUtil.checkInterrupt()
 
 class GenericRunnable(QRunnable):
 
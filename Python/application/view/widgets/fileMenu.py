@@ -38,7 +38,7 @@ class FileMenu(QMenuBar):
         if savedLocation is not None and path.exists(savedLocation):
             dialogLocation = savedLocation
 
-        fileInfo = QFileDialog.getOpenFileName(self, 'Open Sequence File', dialogLocation, "Sequence files (*.json)")
+        fileInfo = QFileDialog.getOpenFileName(self, 'Open Sequence File', dialogLocation, "Sequence files (*.json *.dseq)")
         selectedFile = fileInfo[0]
 
         if selectedFile:
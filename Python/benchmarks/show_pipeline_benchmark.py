@@ -0,0 +1,380 @@
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import cflib.crtp
+from cflib.crazyflie.mem import LighthouseBsGeometry
+from application.common import SettingsKey, AppSettings
+from application.controllers.sequenceController import SequenceController
+from application.controllers.swarmController import SwarmController
+from application.simulation import SimulatedSwarm, SimulatedLinkDriver, LinkModel
+from application.telemetry import FlightRecorder
+from application.util import exceptionUtil, Logger
+
+"""
+Flies whole shows against the simulated link, headless, & times every phase of the pipeline:
+
+    python benchmarks/show_pipeline_benchmark.py [--drones 5 14 50 100] [--output results.json] [--baseline old.json]
+
+Every swarm size runs SequenceController.run on a fresh virtual swarm, with the shipped sequence
+that has the most tracks fitting the swarm; drones without a track stay on the ground as spares.
+Reports the wall time, packets sent & received & the peak thread count of every phase as JSON. Against a
+baseline of an earlier run, phases that got slower or chattier than the tolerance fail the run.
+"""
+
+SWARM_SIZES = [5, 14, 50, 100]
+SPARE_HEIGHT = 0.1
+SEQUENCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+
+# Phases of the run in order, as (name, method) of the swarm & sequence controller
+SWARM_PHASES = [('connect', 'connectSwarm'), ('initializeSensors', 'initializeSensors')]
+SEQUENCE_PHASES = [('uploadFlightData', 'uploadFlightData'), ('synchronizedTakeoff', 'synchronizedTakeoff'),
+                   ('setInitialPositions', 'setInitialPositions'), ('flight', 'runSequence'),
+                   ('landing', 'landDrones'), ('disconnect', 'completeSequence')]
+
+# Packets of a phase may vary this much from the baseline, the lossy link resends a few at random
+PACKET_TOLERANCE = 0.05
+
+
+class Signal():
+
+    def __init__(self):
+        self.count = 0
+
+    def emit(self, *args):
+        self.count += 1
+
+
+class BenchmarkSettings():
+
+    def __init__(self, sequence, droneCount, channels=AppSettings.DEFAULT_RADIO_CHANNELS):
+        self.sequences = [sequence]
+        self.channels = channels
+
+        # Just enough addresses per channel, so the drones are spread evenly over the channels
+        self.addressCount = math.ceil(droneCount / len(channels))
+
+    def getValue(self, key, default=None, valueType=None):
+        values = {
+            SettingsKey.RADIO_CHANNELS: self.channels,
+            SettingsKey.RADIO_ADDRESSES: ['E7E7E7E700', format(0xE7E7E7E700 + self.addressCount - 1, 'X')]
+        }
+        return values.get(key, default)
+
+
+class SimulatedBaseStations():
+    """
+    Two fixed base stations in place of the OpenVR tracked ones
+    """
+
+    def __init__(self):
+        self.geometryOne = SimulatedBaseStations.geometry([-2.0, 2.0, 2.5])
+        self.geometryTwo = SimulatedBaseStations.geometry([2.0, -2.0, 2.5])
+
+    @staticmethod
+    def geometry(origin):
+        geometry = LighthouseBsGeometry()
+        geometry.origin = origin
+        geometry.rotation_matrix = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+        geometry.valid = True
+        return geometry
+
+    def checkForMovement(self):
+        # The virtual drones of a fresh swarm don't hold any geometry yet, like after moving the stations
+        return True
+
+    def sensorsUploaded(self):
+        pass
+
+
+class BenchmarkController():
+    """
+    Stands in for the ApplicationController, with every signal counting its emits instead of
+    reaching the GUI
+    """
+
+    def __init__(self, settings):
+        self.sequenceOrderUpdated = Signal()
+        self.sequenceUpdated = Signal()
+        self.connectionFailed = Signal()
+        self.startTimer = Signal()
+        self.droneDisconnected = Signal()
+        self.takeoffTestComplete = Signal()
+
+        self.trajectoryEnabled = True
+        self.positioningEnabled = True
+        self.colorSequenceEnabled = True
+
+        self.baseStationController = SimulatedBaseStations()
+        self.swarmController = SwarmController(self, settings)
+        self.sequenceController = SequenceController(self, settings)
+        self.completed = False
+
+    @property
+    def availableDrones(self):
+        return len(self.swarmController.availableDrones)
+
+    def updateSequence(self):
+        pass
+
+    def onSequenceCompleted(self):
+        self.completed = True
+
+
+class ThreadMonitor():
+    """
+    Samples the number of live threads in the background, the monitor's own thread not counted
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='thread monitor', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            self.sample()
+            time.sleep(self.interval)
+
+    def sample(self):
+        count = threading.active_count() - 1
+        self.peak = max(self.peak, count)
+        return count
+
+    def reset(self):
+        # Restart the peak from the threads alive right now
+        self.peak = 0
+        return self.sample()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+class PhaseRecorder():
+    """
+    Times the phases of a run. Each phase records its wall time, the packets that crossed the
+    simulated radio channels while it ran & the most threads alive at once
+    """
+
+    def __init__(self, swarm, monitor):
+        self.swarm = swarm
+        self.monitor = monitor
+        self.phases = []
+
+    def packets(self):
+        totals = {'packetsSent': 0, 'packetsReceived': 0, 'bytesSent': 0, 'bytesReceived': 0, 'retries': 0, 'dropped': 0}
+        for counters in self.swarm.counters().values():
+            for key in totals:
+                totals[key] += counters[key]
+        return totals
+
+    @contextmanager
+    def measure(self, name):
+        packets = self.packets()
+        self.monitor.reset()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            phase = {'name': name, 'wallTime': elapsed, 'peakThreads': max(self.monitor.peak, self.monitor.sample())}
+            phase.update({key: value - packets[key] for key, value in self.packets().items()})
+            self.phases.append(phase)
+
+    def wrap(self, owner, method, name):
+        function = getattr(owner, method)
+
+        def timed(*args, **kwargs):
+            with self.measure(name):
+                return function(*args, **kwargs)
+
+        setattr(owner, method, timed)
+
+
+def pickSequence(droneCount, files):
+    """
+    :return: The sequence with the most tracks that still fit the swarm, the shortest one of those
+    """
+    candidates = []
+    for file in files:
+        with open(file, 'r') as sequence:
+            data = json.load(sequence)
+        if data['DroneCount'] <= droneCount:
+            candidates.append((data['DroneCount'], -data['Length'], file))
+
+    if len(candidates) == 0:
+        raise ValueError("No sequence fits a swarm of " + str(droneCount) + " drones")
+    return max(candidates)[2]
+
+
+def runShow(droneCount, sequencePath, linkModel):
+    swarm = SimulatedSwarm(droneCount, linkModel)
+    SimulatedSwarm.CURRENT = swarm
+    monitor = ThreadMonitor()
+    recorder = PhaseRecorder(swarm, monitor)
+    baselineThreads = monitor.sample()
+
+    settings = BenchmarkSettings(sequencePath, droneCount)
+    app = BenchmarkController(settings)
+    swarmController = app.swarmController
+    sequenceController = app.sequenceController
+    sequenceController.recorder = FlightRecorder(tempfile.mkdtemp(prefix='benchmark'))
+
+    timings = []
+
+    def collectTimings(logTimings=swarmController.logTimings):
+        # The pool is gone after the swarm disconnects, keep the timings of the drone phases first
+        poolTimings = swarmController.pool.timings if swarmController.pool is not None else []
+        timings.extend(swarmController.orchestrator.timings + poolTimings)
+        logTimings()
+
+    swarmController.logTimings = collectTimings
+    spareHeights = []
+
+    def checkSpares(runSequence=sequenceController.runSequence):
+        # Spares stay on the ground, their height at the end of the flight shows they never took off
+        runSequence()
+        spareHeights.extend(drone.currentPosition[2] for drone in swarmController.connectedDrones if drone.trackIndex is None)
+
+    sequenceController.runSequence = checkSpares
+    for name, method in SWARM_PHASES:
+        recorder.wrap(swarmController, method, name)
+    for name, method in SEQUENCE_PHASES:
+        recorder.wrap(sequenceController, method, name)
+
+    start = time.perf_counter()
+    try:
+        with recorder.measure('scan'):
+            swarmController.scan()
+
+        sequenceController.selectSequence(0)
+        sequence = SequenceController.CURRENT
+        exceptionUtil.setInterrupt(False)
+        sequenceController.run()
+    finally:
+        totalTime = time.perf_counter() - start
+        swarmController.orchestrator.stop()
+        swarm.stop()
+        SimulatedSwarm.CURRENT = None
+        monitor.stop()
+
+    return {
+        'drones': droneCount,
+        'connected': len(swarmController.connectedDrones),
+        'sequence': os.path.basename(sequencePath),
+        'tracks': sequence.trackCount,
+        'sequenceDuration': sequence.duration,
+        'spares': len(spareHeights),
+        'completed': app.completed and app.connectionFailed.count == 0 and max(spareHeights, default=0.0) < SPARE_HEIGHT,
+        'totalTime': totalTime,
+        'baselineThreads': baselineThreads,
+        'peakThreads': max(phase['peakThreads'] for phase in recorder.phases),
+        'lateTicks': swarm.lateTicks,
+        'phases': recorder.phases,
+        'tasks': [{'name': timing.name, 'drones': timing.tasks, 'elapsed': timing.elapsed,
+                   'startLatency': timing.startLatency, 'slowest': timing.slowest}
+                  for timing in sorted(timings, key=lambda timing: timing.submitTime)]
+    }
+
+
+def printRun(run, output=sys.stderr):
+    status = "completed" if run['completed'] else "FAILED"
+    print("\n{} drones, {} ({} tracks, {:.1f}s): {} in {:.2f}s, peak {} threads".format(
+        run['drones'], run['sequence'], run['tracks'], run['sequenceDuration'], status, run['totalTime'], run['peakThreads']), file=output)
+    print("  {:<22}{:>10}{:>10}{:>10}{:>12}{:>9}".format("phase", "time (s)", "sent", "received", "bytes sent", "threads"), file=output)
+    for phase in run['phases']:
+        print("  {:<22}{:>10.3f}{:>10}{:>10}{:>12}{:>9}".format(
+            phase['name'], phase['wallTime'], phase['packetsSent'], phase['packetsReceived'], phase['bytesSent'], phase['peakThreads']), file=output)
+
+
+def compare(results, baseline, tolerance):
+    """
+    :return: Descriptions of the phases that regressed against the baseline results
+    """
+    regressions = []
+    previousRuns = {run['drones']: run for run in baseline['runs']}
+
+    for run in results['runs']:
+        previous = previousRuns.get(run['drones'])
+        if previous is None:
+            continue
+        if previous['completed'] and not run['completed']:
+            regressions.append("{} drones: the show no longer completes".format(run['drones']))
+
+        previousPhases = {phase['name']: phase for phase in previous['phases']}
+        for phase in run['phases']:
+            old = previousPhases.get(phase['name'])
+            if old is None:
+                continue
+            if phase['wallTime'] > old['wallTime'] * (1 + tolerance) + 0.05:
+                regressions.append("{} drones, {}: {:.3f}s, was {:.3f}s".format(run['drones'], phase['name'], phase['wallTime'], old['wallTime']))
+            if phase['packetsSent'] > old['packetsSent'] * (1 + PACKET_TOLERANCE) + 10:
+                regressions.append("{} drones, {}: {} packets sent, was {}".format(run['drones'], phase['name'], phase['packetsSent'], old['packetsSent']))
+
+    return regressions
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description="Time every phase of a show flown by a simulated swarm")
+    parser.add_argument("--drones", type=int, nargs='+', default=SWARM_SIZES, help="Swarm sizes to fly")
+    parser.add_argument("--sequence", help="Sequence file to fly at every size, defaults to the best fitting shipped one")
+    parser.add_argument("--latency", type=float, default=2.0, help="Link latency, in milliseconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="Chance of a transmission getting lost")
+    parser.add_argument("--output", help="File to write the JSON results to, printed if not given")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Fraction a phase may get slower than the baseline")
+    parser.add_argument("--verbose", action='store_true', help="Print the log of the shows")
+    options = parser.parse_args(arguments)
+
+    if options.verbose:
+        Logger.initialize()
+        Logger.bind_handler(lambda entry: print(*entry, file=sys.stderr))
+
+    cflib.crtp.init_drivers()
+    SimulatedLinkDriver.register()
+    linkModel = LinkModel(latency=options.latency / 1000, loss=options.loss)
+    files = sorted(glob.glob(os.path.join(SEQUENCES, '*.json')))
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'link': {'latency': linkModel.latency, 'loss': linkModel.loss, 'bandwidth': linkModel.bandwidth},
+        'runs': []
+    }
+
+    for droneCount in options.drones:
+        sequencePath = options.sequence or pickSequence(droneCount, files)
+        run = runShow(droneCount, os.path.abspath(sequencePath), linkModel)
+        results['runs'].append(run)
+        printRun(run)
+
+    if options.output:
+        with open(options.output, 'w') as outputFile:
+            json.dump(results, outputFile, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    regressions = []
+    if options.baseline:
+        with open(options.baseline, 'r') as baselineFile:
+            regressions = compare(results, json.load(baselineFile), options.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+
+    failed = any(not run['completed'] for run in results['runs'])
+    return 1 if failed or len(regressions) > 0 else 0
+
+
+sys.exit(main(sys.argv[1:]))
\ No newline at end of file
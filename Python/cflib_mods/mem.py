@@ -48,6 +48,9 @@ CHAN_INFO = 0
 CHAN_READ = 1
 CHAN_WRITE = 2
 
+# Data that fits in a single memory write packet
+MAX_WRITE_LENGTH = 25
+
 # Commands used when accessing the Settings port
 CMD_INFO_VER = 0
 CMD_INFO_NBR = 1
@@ -1032,12 +1035,13 @@ class _ReadRequest:
 
 class _WriteRequest:
     """
-    Class used to handle memory reads that will split up the read in multiple
-    packets in necessary
+    Class used to handle memory writes that will split up the write in
+    multiple packets if necessary. Up to window packets are kept in flight,
+    replies are matched to their chunk using the address.
     """
-    MAX_DATA_LENGTH = 25
+    MAX_DATA_LENGTH = MAX_WRITE_LENGTH
 
-    def __init__(self, mem, addr, data, cf):
+    def __init__(self, mem, addr, data, cf, window=1):
         """Initialize the object with good defaults"""
         self.mem = mem
         self.addr = addr
@@ -1045,61 +1049,72 @@ class _WriteRequest:
         self._data = data
         self.data = bytearray()
         self.cf = cf
+        self._window = max(1, int(window))
 
-        self._current_addr = addr
-
-        self._sent_packet = None
-        self._sent_reply = None
+        # Chunks waiting to be sent, as (address, data) in address order
+        self._chunks = []
+        for offset in range(0, len(data), _WriteRequest.MAX_DATA_LENGTH):
+            self._chunks.append(
+                (addr + offset,
+                 data[offset:offset + _WriteRequest.MAX_DATA_LENGTH]))
+        if len(self._chunks) == 0:
+            self._chunks.append((addr, data))
 
-        self._addr_add = 0
+        # Chunks that have been sent but not acknowledged, by address
+        self._in_flight = {}
 
     def start(self):
-        """Start the fetching of the data"""
-        self._write_new_chunk()
+        """Start the writing of the data"""
+        self._fill_window()
 
-    def resend(self):
+    def resend(self, addr=None):
+        """
+        Resend a chunk that failed, or every chunk in flight if no
+        address is given
+        """
         logger.debug('Sending write again...')
-        self.cf.send_packet(
-            self._sent_packet, expected_reply=self._sent_reply, timeout=1)
-
-    def _write_new_chunk(self):
+        addresses = [addr] if addr is not None else list(self._in_flight)
+        for chunk_addr in addresses:
+            if chunk_addr in self._in_flight:
+                pk, reply = self._in_flight[chunk_addr]
+                self.cf.send_packet(pk, expected_reply=reply, timeout=1)
+
+    def _fill_window(self):
+        """Send new chunks until the window is full or all are sent"""
+        while len(self._in_flight) < self._window and len(self._chunks) > 0:
+            chunk_addr, data = self._chunks.pop(0)
+            self._write_new_chunk(chunk_addr, data)
+
+    def _write_new_chunk(self, chunk_addr, data):
         """
-        Called to request a new chunk of data to be read from the Crazyflie
+        Called to write a new chunk of data to the Crazyflie
         """
-        # Figure out the length of the next request
-        new_len = len(self._data)
-        if new_len > _WriteRequest.MAX_DATA_LENGTH:
-            new_len = _WriteRequest.MAX_DATA_LENGTH
-
         logger.debug('Writing new chunk of {}bytes at 0x{:X}'.format(
-            new_len, self._current_addr))
-
-        data = self._data[:new_len]
-        self._data = self._data[new_len:]
+            len(data), chunk_addr))
 
         pk = CRTPPacket()
         pk.set_header(CRTPPort.MEM, CHAN_WRITE)
-        pk.data = struct.pack('<BI', self.mem.id, self._current_addr)
-        # Create a tuple used for matching the reply using id and address
+        pk.data = struct.pack('<BI', self.mem.id, chunk_addr)
+        # Create a tuple used for matching the reply using id and address.
+        # Every chunk has its own pattern, so a lost packet is resent on
+        # its own when the link needs resending
         reply = struct.unpack('<BBBBB', pk.data)
-        self._sent_reply = reply
         # Add the data
         pk.data += struct.pack('B' * len(data), *data)
-        self._sent_packet = pk
+        self._in_flight[chunk_addr] = (pk, reply)
         self.cf.send_packet(pk, expected_reply=reply, timeout=1)
 
-        self._addr_add = len(data)
-
     def write_done(self, addr):
         """Callback when data is received from the Crazyflie"""
-        if not addr == self._current_addr:
+        if addr not in self._in_flight:
             logger.warning(
-                'Address did not match when adding data to read request!')
+                'Address did not match when adding data to write request!')
             return
 
-        if len(self._data) > 0:
-            self._current_addr += self._addr_add
-            self._write_new_chunk()
+        del self._in_flight[addr]
+        self._fill_window()
+
+        if len(self._in_flight) > 0:
             return False
         else:
             logger.debug('This write request is done')
@@ -1134,6 +1149,9 @@ class Memory():
         self.cf.disconnected.add_callback(self._disconnected)
         self._write_requests_lock = Lock()
 
+        # Number of chunks a write keeps in flight, 1 waits for every reply
+        self.write_window = 1
+
         self._clear_state()
 
     def _clear_state(self):
@@ -1190,7 +1208,7 @@ class Memory():
 
     def write(self, memory, addr, data, flush_queue=False):
         """Write the specified data to the given memory at the given address"""
-        wreq = _WriteRequest(memory, addr, data, self.cf)
+        wreq = _WriteRequest(memory, addr, data, self.cf, self.write_window)
         if memory.id not in self._write_requests:
             self._write_requests[memory.id] = []
 
@@ -1224,6 +1242,13 @@ class Memory():
 
         return True
 
+    def cancel_read(self, memory):
+        """
+        Drop the read operation ongoing for the given memory, e.g. after it
+        timed out, so the memory can be read again
+        """
+        self._read_requests.pop(memory.id, None)
+
     def refresh(self, refresh_done_callback):
         """Start fetching all the detected memories"""
         self._refresh_callback = refresh_done_callback
@@ -1395,8 +1420,9 @@ class Memory():
             logger.debug(
                 'WRITE: Mem={}, addr=0x{:X}, status=0x{}'.format(
                     id, addr, status))
-            # Find the read request
-            if id in self._write_requests:
+            # Find the write request. Writes broadcast to the whole swarm
+            # get replies nobody is waiting for, those are dropped
+            if len(self._write_requests.get(id, [])) > 0:
                 self._write_requests_lock.acquire()
                 wreq = self._write_requests[id][0]
                 if status == 0:
@@ -1412,7 +1438,7 @@ class Memory():
                 else:
                     logger.debug(
                         'Status {}: write resending...'.format(status))
-                    wreq.resend()
+                    wreq.resend(addr)
                 self._write_requests_lock.release()
 
         if chan == CHAN_READ:
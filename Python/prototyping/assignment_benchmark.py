@@ -0,0 +1,132 @@
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.planner.assignment import distanceMatrix, linearAssignment, linear_sum_assignment
+from application.planner.matcher import DroneMatcher
+
+"""
+Times the drone to track assignment for growing swarms: the cost matrix build, the NumPy solver
+& SciPy's solver when the optional scipy package is installed. Drones start spread over the floor, tracks start anywhere in the arena.
+
+First checks the solver on rectangular matrices & the matcher with spare drones, missing drones &
+track priorities against a brute force search over every assignment of small swarms.
+"""
+
+SWARM_SIZES = [14, 50, 200, 500]
+REPEATS = 3
+
+
+def timed(function, *args):
+    best = np.inf
+    result = None
+    for _ in range(0, REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def nestedCostMatrix(origins, targets):
+    # The cost matrix as it used to be built, one Python call per drone & track pair
+    return [[float(np.sqrt(sum((a - b) ** 2 for a, b in zip(origin, target)))) for target in targets] for origin in origins]
+
+
+class FakeDrone():
+
+    def __init__(self, position):
+        self.currentPosition = position
+        self.trackIndex = None
+        self.targetPosition = None
+
+
+def bruteForce(costs):
+    """
+    :return: Lowest total cost of assigning every row of the smaller dimension, trying every assignment
+    """
+    rows, columns = costs.shape
+    if rows <= columns:
+        return min(sum(costs[row, column] for row, column in enumerate(order)) for order in itertools.permutations(range(columns), rows))
+    return min(sum(costs[row, column] for column, row in enumerate(order)) for order in itertools.permutations(range(rows), columns))
+
+
+def checkRectangular(generator):
+    for rows, columns in [(3, 6), (6, 3), (4, 5), (5, 4), (1, 4), (4, 1)]:
+        costs = generator.uniform(0.0, 10.0, (rows, columns))
+        for useScipy in [False, True]:
+            assignedRows, assignedColumns = linearAssignment(costs, useScipy)
+            assert len(assignedRows) == min(rows, columns), "Not every row of the smaller dimension was assigned"
+            assert len(set(assignedRows)) == len(assignedRows) and len(set(assignedColumns)) == len(assignedColumns)
+            assert abs(costs[assignedRows, assignedColumns].sum() - bruteForce(costs)) < 1e-9, \
+                "Rectangular {}x{} assignment isn't optimal".format(rows, columns)
+
+
+def matchedDistance(drones, costs):
+    return sum(costs[index, drone.trackIndex] for index, drone in enumerate(drones) if drone.trackIndex is not None)
+
+
+def checkMatcher(generator):
+    positions = [tuple(position) for position in generator.uniform((-2.0, -2.0, 0.5), (2.0, 2.0, 2.5), (5, 3))]
+
+    # Fewer drones than tracks, every drone flies & the best subset of tracks is filled
+    drones = [FakeDrone(tuple(position)) for position in generator.uniform((-2.0, -2.0, 0.0), (2.0, 2.0, 0.0), (3, 3))]
+    DroneMatcher.assign(drones, positions)
+    costs = DroneMatcher.getCostMatrix(drones, positions)
+    assert all(drone.trackIndex is not None for drone in drones), "A drone was left without a track"
+    assert all(drone.targetPosition == positions[drone.trackIndex] for drone in drones)
+    assert abs(matchedDistance(drones, costs) - bruteForce(costs)) < 1e-9, "Short swarm matching isn't optimal"
+
+    # More drones than tracks, the spares get no track & stay where they are
+    drones = [FakeDrone(tuple(position)) for position in generator.uniform((-2.0, -2.0, 0.0), (2.0, 2.0, 0.0), (7, 3))]
+    DroneMatcher.assign(drones, positions)
+    costs = DroneMatcher.getCostMatrix(drones, positions)
+    spares = [drone for drone in drones if drone.trackIndex is None]
+    assert len(spares) == 2, "Expected 2 spares, got " + str(len(spares))
+    assert all(drone.targetPosition == drone.currentPosition for drone in spares), "A spare was sent somewhere"
+    assert sorted(drone.trackIndex for drone in drones if drone.trackIndex is not None) == list(range(0, 5))
+    assert abs(matchedDistance(drones, costs) - bruteForce(costs)) < 1e-9, "Matching with spares isn't optimal"
+
+    # With priorities the hero tracks are filled first, even when they're the furthest away
+    heroes = [(10.0, 10.0, 1.0), (-10.0, 10.0, 1.0)]
+    priorities = [0, 0, 0, 0, 0, 2, 1]
+    drones = [FakeDrone(tuple(position)) for position in generator.uniform((-2.0, -2.0, 0.0), (2.0, 2.0, 0.0), (3, 3))]
+    DroneMatcher.assign(drones, positions + heroes, priorities)
+    tracks = set(drone.trackIndex for drone in drones)
+    assert {5, 6} <= tracks, "Hero tracks weren't filled first: " + str(tracks)
+
+    # Between tracks of equal priority distance still decides
+    costs = DroneMatcher.getCostMatrix(drones, positions + heroes)
+    heroCosts = costs[:, 5:7]
+    best = min(heroCosts[first, 0] + heroCosts[second, 1] + costs[third, :5].min()
+               for first, second, third in itertools.permutations(range(0, 3)))
+    assert abs(matchedDistance(drones, costs) - best) < 1e-9, "Matching with priorities isn't optimal"
+
+
+generator = np.random.default_rng(42)
+for _ in range(0, 20):
+    checkRectangular(generator)
+    checkMatcher(generator)
+print("Rectangular & priority assignments match the brute force search")
+
+print("{:>6} {:>12} {:>12} {:>12} {:>12}".format("drones", "nested (ms)", "numpy (ms)", "solve (ms)", "scipy (ms)"))
+
+for count in SWARM_SIZES:
+    origins = generator.uniform((-2.0, -2.0, 0.5), (2.0, 2.0, 0.5), (count, 3))
+    targets = generator.uniform((-2.0, -2.0, 0.5), (2.0, 2.0, 2.5), (count, 3))
+
+    _, nestedTime = timed(nestedCostMatrix, origins.tolist(), targets.tolist())
+    costs, buildTime = timed(distanceMatrix, origins, targets)
+
+    (rows, columns), solveTime = timed(linearAssignment, costs, False)
+    total = costs[rows, columns].sum()
+
+    scipyTime = float('nan')
+    if linear_sum_assignment is not None:
+        (scipyRows, scipyColumns), scipyTime = timed(linear_sum_assignment, costs)
+        assert abs(costs[scipyRows, scipyColumns].sum() - total) < 1e-9, "SciPy found a different optimum"
+
+    print("{:>6} {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f}".format(count, nestedTime, buildTime, solveTime, scipyTime))
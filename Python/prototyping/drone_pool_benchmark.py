@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.common.exceptions import DroneException, SequenceInterrupt
+from application.controllers.dronePool import DronePool
+from application.util import exceptionUtil
+
+"""
+Runs the phases of a show for a 50 drone swarm with fake drones that spend a fixed time talking
+to their radio in every phase. Compares a new default ThreadPoolExecutor per phase, which caps
+the workers at min(32, cpu + 4), with one swarm sized DronePool. Then checks that the pool
+cancels waiting tasks on an interrupt & fails a phase when a drone hangs, also next to a failing one.
+"""
+
+DRONES = 50
+PHASES = ["connect", "sensors", "upload", "takeoff", "starting positions", "battery"]
+PHASE_TIME = 0.1
+
+
+def droneTask(drone):
+    time.sleep(PHASE_TIME)
+    return drone
+
+
+def runExecutorPerPhase():
+    for _ in PHASES:
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(droneTask, drone) for drone in range(0, DRONES)]
+            wait(futures)
+
+
+def runPool(pool):
+    for phase in PHASES:
+        pool.run(droneTask, list(range(0, DRONES)), phase=phase)
+
+
+start = time.perf_counter()
+runExecutorPerPhase()
+executorTime = time.perf_counter() - start
+
+pool = DronePool(DRONES)
+start = time.perf_counter()
+runPool(pool)
+poolTime = time.perf_counter() - start
+
+print("Executor per phase: {:.2f}s, swarm sized pool: {:.2f}s, lower bound {:.2f}s".format(executorTime, poolTime, len(PHASES) * PHASE_TIME))
+for timing in pool.timings:
+    print("    " + str(timing))
+
+# Interrupt while most tasks are still queued on a small pool
+smallPool = DronePool(4)
+threading.Timer(0.15, exceptionUtil.setInterrupt, (True,)).start()
+start = time.perf_counter()
+try:
+    smallPool.run(droneTask, list(range(0, DRONES)))
+    raise AssertionError("Interrupt was not raised")
+except SequenceInterrupt:
+    print("Interrupted run returned after {:.2f}s".format(time.perf_counter() - start))
+exceptionUtil.setInterrupt(False)
+
+# A drone that never finishes
+try:
+    pool.run(lambda drone: time.sleep(2.0 if drone == 3 else 0.01), list(range(0, DRONES)), timeout=0.5)
+    raise AssertionError("Timeout was not raised")
+except DroneException as e:
+    print("Timed out: " + str(e))
+
+# A connection that hangs fails as a connection error instead
+try:
+    pool.run(lambda drone: time.sleep(2.0 if drone == 3 else 0.01), list(range(0, DRONES)), timeout=0.5, timeoutError=ConnectionAbortedError)
+    raise AssertionError("Timeout was not raised")
+except ConnectionAbortedError as e:
+    print("Connection timed out: " + str(e))
+
+# A drone that fails while another one hangs, the failure is raised without waiting for the hung drone
+def failOrHang(drone):
+    if drone == 1:
+        raise DroneException("Drone 1 failed")
+    time.sleep(5.0 if drone == 3 else 0.01)
+
+for timeout in [None, 0.5]:
+    start = time.perf_counter()
+    try:
+        pool.run(failOrHang, list(range(0, DRONES)), timeout=timeout)
+        raise AssertionError("Failure was not raised")
+    except DroneException as e:
+        elapsed = time.perf_counter() - start
+        assert str(e) == "Drone 1 failed", "The failure should be raised, not the timeout"
+        assert elapsed < 2.0, "A hung drone should not block the failed run"
+        print("Failed next to a hung drone (timeout {}): {} after {:.2f}s".format(timeout, e, elapsed))
+
+pool.shutdown()
+smallPool.shutdown()
+assert poolTime < executorTime, "Pool should not be slower than an executor per phase"
@@ -0,0 +1,131 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import openvr
+from cflib.crazyflie.mem import LighthouseBsGeometry
+from application.constants import Constants
+from application.controllers.baseStationController import BaseStationController
+from application.model import GeometryCache, UploadRegistry
+
+"""
+Checks the base station pose cache against its tolerances: poses within them count as unmoved &
+are snapped back to the recorded pose, poses beyond them count as moved & are recorded. Then polls
+virtual base stations through BaseStationController.checkForMovement, with tracking noise & with
+a station being moved, also between sessions.
+"""
+
+POSITION_TOLERANCE = Constants.BASE_STATION_POSITION_TOLERANCE
+ROTATION_TOLERANCE = Constants.BASE_STATION_ROTATION_TOLERANCE
+
+
+def geometry(origin, rotation=np.eye(3)):
+    geometry = LighthouseBsGeometry()
+    geometry.origin = list(origin)
+    geometry.rotation_matrix = [list(row) for row in rotation]
+    geometry.valid = True
+    return geometry
+
+
+def rotationZ(angle):
+    return np.array([[np.cos(angle), -np.sin(angle), 0.0], [np.sin(angle), np.cos(angle), 0.0], [0.0, 0.0, 1.0]])
+
+
+class Pose():
+
+    def __init__(self, matrix):
+        self.bPoseIsValid = True
+        self.mDeviceToAbsoluteTracking = matrix
+
+
+class FakeVrSystem():
+    """
+    Two base stations at the given OpenVR poses, as 3x4 matrixes
+    """
+
+    def __init__(self):
+        self.matrixes = [np.hstack((np.eye(3), [[-2.0], [2.5], [2.0]])), np.hstack((np.eye(3), [[2.0], [2.5], [-2.0]]))]
+
+    def getTrackedDeviceClass(self, index):
+        return openvr.TrackedDeviceClass_TrackingReference if index < len(self.matrixes) else 0
+
+    def getStringTrackedDeviceProperty(self, index, prop):
+        return "LHB-" + str(index)
+
+    def getDeviceToAbsoluteTrackingPose(self, universe, predictedTime, count):
+        return [Pose(matrix.tolist()) for matrix in self.matrixes]
+
+
+class FakeAppController():
+
+    def __init__(self):
+        self.vrSystem = FakeVrSystem()
+
+
+def checkCache(directory):
+    file = os.path.join(directory, 'baseStations.json')
+    cache = GeometryCache(file, POSITION_TOLERANCE, ROTATION_TOLERANCE)
+    origin = np.array([1.0, -1.0, 2.0])
+
+    assert cache.update([('A', geometry(origin))]) == ['A'], "An unknown base station counts as moved"
+
+    # Tracking noise within the tolerances is replaced with the recorded pose
+    noisy = geometry(origin + 0.9 * POSITION_TOLERANCE, rotationZ(0.9 * ROTATION_TOLERANCE))
+    assert cache.update([('A', noisy)]) == [], "Noise within the tolerances counts as unmoved"
+    assert np.allclose(noisy.origin, origin) and np.allclose(noisy.rotation_matrix, np.eye(3)), "Unmoved pose should be the recorded one"
+
+    # Just beyond either tolerance counts as moved & becomes the new recorded pose
+    shifted = origin + [1.1 * POSITION_TOLERANCE, 0.0, 0.0]
+    assert cache.update([('A', geometry(shifted))]) == ['A'], "Moving beyond the position tolerance counts as moved"
+    turned = rotationZ(1.1 * ROTATION_TOLERANCE)
+    assert cache.update([('A', geometry(shifted, turned))]) == ['A'], "Turning beyond the rotation tolerance counts as moved"
+    assert cache.update([('A', geometry(shifted, turned))]) == [], "The moved pose should be recorded"
+
+    # The recorded poses survive a restart
+    restarted = GeometryCache(file, POSITION_TOLERANCE, ROTATION_TOLERANCE)
+    assert restarted.update([('A', geometry(shifted, turned)), ('B', geometry(origin))]) == ['B'], "Poses should be read back from disk"
+    print("Geometry cache: noise within {}m & {} snapped back, moves beyond recorded".format(POSITION_TOLERANCE, ROTATION_TOLERANCE))
+
+
+def checkForMovement(directory):
+    # The controller keeps its cache at the default path, relative to the working directory
+    os.chdir(directory)
+    appController = FakeAppController()
+    controller = BaseStationController(appController)
+    assert len(controller.baseStations) == 2, "Both virtual base stations should be found"
+    assert controller.checkForMovement(), "Unknown base stations count as moved until the drones get them"
+    controller.sensorsUploaded()
+
+    digest = UploadRegistry.digestObjects({0: controller.geometryOne, 1: controller.geometryTwo})
+    matrixes = appController.vrSystem.matrixes
+
+    matrixes[0][:, 3] += 0.5 * POSITION_TOLERANCE
+    matrixes[1][:3, :3] = rotationZ(0.5 * ROTATION_TOLERANCE)
+    assert not controller.checkForMovement(), "Tracking noise shouldn't count as movement"
+    assert UploadRegistry.digestObjects({0: controller.geometryOne, 1: controller.geometryTwo}) == digest, \
+        "Unmoved base stations should keep the same geometry, so drones don't need a new upload"
+
+    matrixes[1][:, 3] += [0.0, 0.0, 2.0 * POSITION_TOLERANCE]
+    assert controller.checkForMovement(), "Moving a base station should be noticed"
+    assert UploadRegistry.digestObjects({0: controller.geometryOne, 1: controller.geometryTwo}) != digest, "Moved geometry should change"
+    assert controller.checkForMovement(), "A move should be reported until the drones get the new geometry"
+    controller.sensorsUploaded()
+    assert not controller.checkForMovement(), "The moved pose should be recorded"
+
+    # Poses are compared to the ones of the last session at startup
+    assert not BaseStationController(appController).checkForMovement(), "Unmoved base stations between sessions"
+    matrixes[0][:, 3] += [2.0 * POSITION_TOLERANCE, 0.0, 0.0]
+    assert BaseStationController(appController).checkForMovement(), "Moving a base station between sessions should be noticed"
+    print("checkForMovement: noise ignored, moved base station found, also between sessions")
+
+
+with tempfile.TemporaryDirectory() as directory:
+    checkCache(directory)
+    workingDirectory = os.getcwd()
+    try:
+        checkForMovement(directory)
+    finally:
+        os.chdir(workingDirectory)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import cflib.crtp
+from cflib.crazyflie.mem import LighthouseBsGeometry
+from application.common import SettingsKey
+from application.model import UploadRegistry
+from application.controllers.swarmController import SwarmController
+from application.controllers.geometryDistributor import GeometryDistributor
+from application.simulation import SimulatedSwarm, SimulatedLinkDriver, LinkModel
+from application.simulation.simulatedFirmware import MEMORY_LIGHTHOUSE, SimulatedFirmware
+from application.util import calibration
+
+"""
+Distributes the base station data to a swarm of virtual drones over the broadcast links: first to
+a fresh swarm, then to a swarm that already holds it, then after some drones lost their data & a
+couple of those miss every broadcast, so they have to be found by the read back & written to directly.
+"""
+
+DRONES = 12
+
+
+class SimulationSettings():
+
+    def getValue(self, key, default=None):
+        values = {
+            SettingsKey.RADIO_CHANNELS: [80, 90],
+            SettingsKey.RADIO_ADDRESSES: ['E7E7E7E700', 'E7E7E7E70F']
+        }
+        return values.get(key, default)
+
+
+def geometry(origin):
+    geometry = LighthouseBsGeometry()
+    geometry.origin = origin
+    geometry.rotation_matrix = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    geometry.valid = True
+    return geometry
+
+
+def wipe(firmware):
+    memoryId = next(ident for ident, memoryType, _ in SimulatedFirmware.MEMORIES if memoryType == MEMORY_LIGHTHOUSE)
+    memory = firmware.memories[memoryId]
+    memory[:] = bytes(len(memory))
+
+
+def deafen(firmware):
+    # The drone still answers its own link, but misses every broadcast
+    receive = firmware.receive
+    firmware.receive = lambda packet, broadcast=False: None if broadcast else receive(packet)
+
+
+def checkAll(drones):
+    missing = [drone.swarmIndex for drone in drones if not drone.verifyBaseStationData(geometries, calibration.CALIBRATION_DATA)]
+    assert len(missing) == 0, "Drones without the base station data: " + str(missing)
+
+
+cflib.crtp.init_drivers()
+swarm = SimulatedSwarm(DRONES, LinkModel(latency=0.002))
+SimulatedSwarm.CURRENT = swarm
+SimulatedLinkDriver.register()
+
+swarmController = SwarmController(None, SimulationSettings())
+swarmController.scan()
+swarmController.connectSwarm(-1)
+drones = swarmController.connectedDrones
+geometries = {0: geometry([-2.0, 2.0, 2.5]), 1: geometry([2.0, -2.0, 2.5])}
+distributor = GeometryDistributor(swarmController)
+
+# A fresh swarm gets everything over the broadcasts
+updated = distributor.distribute(drones, geometries, calibration.CALIBRATION_DATA)
+assert len(updated) == DRONES and distributor.broadcasted == DRONES and distributor.fallbacks == 0, \
+    "Fresh swarm: {} updated, {} broadcast to, {} written directly".format(len(updated), distributor.broadcasted, distributor.fallbacks)
+checkAll(drones)
+print("Fresh swarm: broadcast to all {} drones".format(distributor.broadcasted))
+
+# Drones recorded with the same data are skipped
+updated = distributor.distribute(drones, geometries, calibration.CALIBRATION_DATA)
+assert len(updated) == 0 and distributor.broadcasted == 0 and distributor.fallbacks == 0, "Up to date swarm should be skipped"
+print("Up to date swarm: skipped")
+
+# Drones that lost their data are found by reading back, the ones missing the broadcast get direct writes
+lost = drones[0:2] + drones[-2:]
+deaf = [drones[0], drones[-1]]
+for drone in lost:
+    wipe(swarm.firmware(drone.address))
+for drone in deaf:
+    deafen(swarm.firmware(drone.address))
+
+updated = distributor.distribute(drones, geometries, calibration.CALIBRATION_DATA, verifyFirst=True)
+assert set(updated) == set(lost), "Only the drones that lost their data should be updated"
+assert distributor.broadcasted == len(lost) and distributor.fallbacks == len(deaf), \
+    "{} broadcast to, {} written directly".format(distributor.broadcasted, distributor.fallbacks)
+checkAll(drones)
+digest = UploadRegistry.digestObjects(geometries, calibration.CALIBRATION_DATA)
+assert all(GeometryDistributor.isRecorded(drone, digest) for drone in drones), "Every drone should be recorded with the data"
+print("Lost data: {} broadcast to, {} written directly after missing the broadcast".format(distributor.broadcasted, distributor.fallbacks))
+
+swarmController.disconnectSwarm()
+swarm.stop()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.common.exceptions import SequenceInterrupt
+from application.util import exceptionUtil, threadUtil
+
+"""
+Measures how long sleeping workers take to notice an abort. A swarm's worth of threads sleep
+through a long phase, the sequence is interrupted partway & every worker records when its sleep
+raised. Sleeps that ignore the interrupt have to run their full duration.
+"""
+
+WORKERS = 50
+SLEEP = 10.0
+INTERRUPT_AFTER = 0.5
+MAX_LATENCY = 0.05
+
+wakeTimes = [None] * WORKERS
+ignoredDurations = []
+
+
+def sleeper(index):
+    try:
+        threadUtil.interruptibleSleep(SLEEP)
+    except SequenceInterrupt:
+        wakeTimes[index] = time.perf_counter()
+
+
+def ignoringSleeper():
+    start = time.perf_counter()
+    threadUtil.interruptibleSleep(1.0, True)
+    ignoredDurations.append(time.perf_counter() - start)
+
+
+exceptionUtil.setInterrupt(False)
+threads = [threading.Thread(target=sleeper, args=(index,)) for index in range(0, WORKERS)]
+threads.append(threading.Thread(target=ignoringSleeper))
+for thread in threads:
+    thread.start()
+
+time.sleep(INTERRUPT_AFTER)
+interruptTime = time.perf_counter()
+exceptionUtil.setInterrupt(True)
+
+for thread in threads:
+    thread.join()
+exceptionUtil.setInterrupt(False)
+
+latencies = [(wakeTime - interruptTime) * 1000 for wakeTime in wakeTimes]
+print("{} sleeping workers, abort noticed after {:.2f} ms on average, {:.2f} ms worst".format(
+    WORKERS, sum(latencies) / WORKERS, max(latencies)))
+print("Sleep ignoring the interrupt ran {:.2f}s of 1.00s".format(ignoredDurations[0]))
+
+assert max(latencies) < MAX_LATENCY * 1000, "Abort took too long to reach the workers"
+assert ignoredDurations[0] >= 1.0, "Sleep ignoring the interrupt was cut short"
@@ -0,0 +1,123 @@
+import os
+import queue
+import random
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cflib_mods'))
+from cflib.crtp.crtpstack import CRTPPacket, CRTPPort
+from cflib.utils.callbacks import Caller
+import mem
+
+"""
+Benchmarks windowed memory writes against a fake radio link. The link sends one packet at a time,
+the fake firmware acknowledges every write after a fixed latency & a small fraction of packets is
+lost, to be resent after a timeout. Uploads a 500 byte trajectory & a 600 byte LED timing blob,
+the way a drone gets its flight data before a sequence.
+"""
+
+AIRTIME = 0.001
+REPLY_LATENCY = 0.004
+LOSS_RATE = 0.02
+RESEND_TIMEOUT = 0.05
+WINDOWS = [1, 2, 4, 8, 16]
+REPEATS = 3
+
+
+class FakeCrazyflie():
+
+    def __init__(self, seed):
+        self.disconnected = Caller()
+        self.callbacks = []
+        self.random = random.Random(seed)
+        self.packets = queue.Queue()
+        self.firmware = {}
+        self.sentPackets = 0
+        self.resentPackets = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+
+        self.radio = threading.Thread(target=self.transmit, daemon=True)
+        self.radio.start()
+
+    def add_port_callback(self, port, callback):
+        self.callbacks.append(callback)
+
+    def send_packet(self, pk, expected_reply=(), resend=False, timeout=0.2):
+        # Like the cflib link, keep resending until a reply matching the pattern comes back
+        with self.lock:
+            self.pending[expected_reply] = pk
+        self.packets.put((pk, expected_reply))
+
+    def transmit(self):
+        while True:
+            pk, expectedReply = self.packets.get()
+            time.sleep(AIRTIME)
+            self.sentPackets += 1
+
+            if self.random.random() < LOSS_RATE:
+                threading.Timer(RESEND_TIMEOUT, self.resend, (expectedReply,)).start()
+                continue
+
+            memoryId, address = struct.unpack('<BI', bytes(pk.data[:5]))
+            self.firmware[(memoryId, address)] = bytes(pk.data[5:])
+            threading.Timer(REPLY_LATENCY, self.reply, (memoryId, address, expectedReply)).start()
+
+    def resend(self, expectedReply):
+        with self.lock:
+            pk = self.pending.get(expectedReply)
+        if pk is not None:
+            self.resentPackets += 1
+            self.packets.put((pk, expectedReply))
+
+    def reply(self, memoryId, address, expectedReply):
+        with self.lock:
+            if self.pending.pop(expectedReply, None) is None:
+                return
+
+        pk = CRTPPacket()
+        pk.set_header(CRTPPort.MEM, mem.CHAN_WRITE)
+        pk.data = struct.pack('<BIB', memoryId, address, 0)
+        for callback in self.callbacks:
+            callback(pk)
+
+
+def upload(window, seed):
+    crazyflie = FakeCrazyflie(seed)
+    memory = mem.Memory(crazyflie)
+    memory.write_window = window
+
+    trajectory = mem.TrajectoryMemory(0, mem.MemoryElement.TYPE_TRAJ, 4096, memory)
+    ledTimings = mem.TrajectoryMemory(1, mem.MemoryElement.TYPE_DRIVER_LEDTIMING, 4096, memory)
+    for element in (trajectory, ledTimings):
+        memory.mems.append(element)
+        memory.mem_write_cb.add_callback(element.write_done)
+
+    trajectoryData = bytes(random.Random(seed).getrandbits(8) for _ in range(500))
+    ledData = bytes(random.Random(seed + 1).getrandbits(8) for _ in range(600))
+
+    start = time.perf_counter()
+    for element, data in ((trajectory, trajectoryData), (ledTimings, ledData)):
+        done = threading.Event()
+        element.write_raw_data(data, lambda *args: done.set())
+        done.wait()
+    elapsed = time.perf_counter() - start
+
+    for memoryId, data in ((0, trajectoryData), (1, ledData)):
+        written = b''.join(chunk for (chunkId, _), chunk in sorted(crazyflie.firmware.items()) if chunkId == memoryId)
+        assert written == data, "Memory {} does not match the uploaded data".format(memoryId)
+
+    return elapsed, crazyflie.sentPackets, crazyflie.resentPackets
+
+
+print("{:>6} {:>12} {:>10} {:>10}".format("window", "upload (ms)", "packets", "resent"))
+baseline = None
+for window in WINDOWS:
+    results = [upload(window, seed) for seed in range(0, REPEATS)]
+    elapsed = sum(result[0] for result in results) / REPEATS
+    baseline = baseline if baseline is not None else elapsed
+    print("{:>6} {:>12.1f} {:>10.1f} {:>10.1f}   {:.1f}x".format(
+        window, elapsed * 1000, sum(result[1] for result in results) / REPEATS,
+        sum(result[2] for result in results) / REPEATS, baseline / elapsed))
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.common.exceptions import DroneException, SequenceInterrupt
+from application.controllers.dronePool import DronePool
+from application.controllers.orchestrator import Orchestrator
+from application.telemetry import TelemetryStream
+from application.util import exceptionUtil
+
+"""
+Simulates the starting positions phase for 10, 50 & 100 drones. Every fake drone streams its
+telemetry from a single radio thread & reaches its target after a random travel time. Compares a
+swarm sized DronePool, blocking a thread per drone in TelemetryStream.waitUntil, with the
+Orchestrator, running a coroutine per drone on one event loop. Reports the peak thread count &
+how long after the last drone arrived the phase returned. Then checks that an interrupt & a
+missed deadline cancel the running coroutines.
+"""
+
+SWARM_SIZES = [10, 50, 100]
+PERIOD = 0.01
+MAX_TRAVEL_TIME = 1.0
+
+
+class FakeDrone():
+
+    def __init__(self, index):
+        self.index = index
+        self.telemetry = TelemetryStream(None, periodMs=PERIOD * 1000)
+        self.arrival = None
+
+    def reset(self, start):
+        self.arrival = start + random.uniform(0.2, MAX_TRAVEL_TIME)
+
+    def feed(self, now):
+        z = 1.0 if now >= self.arrival else 0.3
+        self.telemetry.onData(0, {
+            'kalman.stateX': 0.0, 'kalman.stateY': 0.0, 'kalman.stateZ': z,
+            'kalman.varPX': 0.0, 'kalman.varPY': 0.0, 'kalman.varPZ': 0.0,
+            'pm.batteryLevel': 100
+        }, None)
+
+
+def atTarget(sample):
+    return sample.position[2] > 0.9
+
+
+def waitBlocking(drone):
+    drone.telemetry.waitUntil(atTarget, MAX_TRAVEL_TIME + 1.0)
+
+
+async def waitAsync(drone):
+    await drone.telemetry.waitUntilAsync(atTarget, MAX_TRAVEL_TIME + 1.0)
+
+
+def measure(drones, runPhase):
+    """
+    :return: Peak thread count while the phase ran & seconds between the last arrival & the phase returning
+    """
+    stop = threading.Event()
+    peak = [threading.active_count()]
+    start = time.time()
+    for drone in drones:
+        drone.reset(start)
+
+    def radio():
+        while not stop.is_set():
+            now = time.time()
+            for drone in drones:
+                drone.feed(now)
+            peak[0] = max(peak[0], threading.active_count())
+            time.sleep(PERIOD)
+
+    feeder = threading.Thread(target=radio, daemon=True)
+    feeder.start()
+    runPhase(drones)
+    returned = time.time()
+    stop.set()
+    feeder.join()
+    return peak[0], returned - max(drone.arrival for drone in drones)
+
+
+orchestrator = Orchestrator()
+orchestrator.start()
+
+print("{:>6} {:>14} {:>14} {:>16} {:>16}".format("drones", "pool threads", "async threads", "pool latency", "async latency"))
+for size in SWARM_SIZES:
+    drones = [FakeDrone(index) for index in range(0, size)]
+
+    pool = DronePool(size)
+    poolThreads, poolLatency = measure(drones, lambda drones: pool.run(waitBlocking, drones))
+    pool.shutdown()
+    pool.executor.shutdown(wait=True)
+
+    asyncThreads, asyncLatency = measure(drones, lambda drones: orchestrator.runPhase(waitAsync, drones))
+
+    print("{:>6} {:>14} {:>14} {:>13.1f} ms {:>13.1f} ms".format(size, poolThreads, asyncThreads, poolLatency * 1000, asyncLatency * 1000))
+    assert asyncThreads < poolThreads, "Orchestrator should not need a thread per drone"
+
+
+async def hang(drone):
+    await asyncio.sleep(10.0)
+
+cancelled = []
+
+async def hangUntilCancelled(drone):
+    try:
+        await asyncio.sleep(10.0)
+    except asyncio.CancelledError:
+        cancelled.append(drone)
+        raise
+
+# Interrupt while every drone is still waiting
+drones = list(range(0, 50))
+threading.Timer(0.2, exceptionUtil.setInterrupt, (True,)).start()
+start = time.perf_counter()
+try:
+    orchestrator.runPhase(hangUntilCancelled, drones)
+    raise AssertionError("Interrupt was not raised")
+except SequenceInterrupt:
+    print("Interrupted phase returned after {:.2f}s, {} coroutine(s) cancelled".format(time.perf_counter() - start, len(cancelled)))
+exceptionUtil.setInterrupt(False)
+assert len(cancelled) == len(drones), "Every coroutine should be cancelled before the phase returns"
+
+# A drone that never finishes
+try:
+    orchestrator.runPhase(lambda drone: hang(drone) if drone == 3 else asyncio.sleep(0.01), drones, deadline=0.5, phase="hang")
+    raise AssertionError("Deadline was not raised")
+except DroneException as e:
+    print("Missed deadline: " + str(e))
+
+orchestrator.stop()
\ No newline at end of file
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.constants import Constants
+from application.model import sequenceFile
+from application.trajectory import TrajectoryBatch, checkSeparation, decodeTrajectory, encodeHold
+
+"""
+Cross checks the grid hashed separation check against a brute-force check of every pair of drones
+at every time step, on the whole sequence library & on drones holding position closer than the
+minimum separation. Prints the time both take per sequence.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+
+
+def bruteForce(batch, minimumDistance, rate, searchRadius):
+    """
+    :return: Closest pair distance per time step within the search radius, & every
+    (track, track, time index) closer than the minimum distance
+    """
+    times = batch.timeGrid(rate)
+    positions = batch.positions(times)
+    minimumSeparation = np.full(len(times), np.inf)
+    tooClose = set()
+
+    for one in range(0, batch.droneCount):
+        for two in range(one + 1, batch.droneCount):
+            distances = np.linalg.norm(positions[one] - positions[two], axis=1)
+            nearby = distances < searchRadius
+            minimumSeparation[nearby] = np.minimum(minimumSeparation[nearby], distances[nearby])
+            tooClose.update((one, two, index) for index in np.nonzero(distances < minimumDistance)[0])
+
+    return minimumSeparation, tooClose
+
+
+def violationSamples(report):
+    samples = set()
+    for violation in report.violations:
+        indexes = np.nonzero((report.times >= violation.startTime) & (report.times <= violation.endTime))[0]
+        samples.update((violation.trackOne, violation.trackTwo, index) for index in indexes)
+    return samples
+
+
+def compare(name, batch, minimumDistance=Constants.MIN_SEPARATION, rate=Constants.PREFLIGHT_SAMPLE_RATE):
+    report = checkSeparation(batch, minimumDistance, rate)
+
+    start = time.perf_counter()
+    expectedMinimum, expectedClose = bruteForce(batch, minimumDistance, rate, 2.0 * minimumDistance)
+    bruteForceTime = time.perf_counter() - start
+
+    assert np.allclose(report.minimumSeparation, expectedMinimum), "Closest distances differ on " + name
+    assert violationSamples(report) == expectedClose, "Violations differ on " + name
+
+    print("{:<45} {:3d} tracks  closest {:5.2f}m  {:3d} violation(s)  {:6.1f} ms, brute force {:7.1f} ms".format(
+        name, batch.droneCount, report.closestDistance, len(report.violations), report.elapsed * 1000, bruteForceTime * 1000))
+    return report
+
+
+for fileName in sorted(os.listdir(SEQUENCE_DIRECTORY)):
+    if fileName.endswith('.json'):
+        sequence = sequenceFile.loadJson(os.path.join(SEQUENCE_DIRECTORY, fileName))
+        compare(fileName, TrajectoryBatch.fromSequence(sequence))
+
+# Two drones holding 10cm apart for the whole hold, a third one far away
+holds = [encodeHold(position, 5.0) for position in [(0.0, 0.0, 1.0), (0.1, 0.0, 1.0), (2.0, 2.0, 1.0)]]
+report = compare("holding positions", TrajectoryBatch([decodeTrajectory(data) for data in holds]))
+assert len(report.violations) == 1, "The close pair should be a single violation"
+violation = report.violations[0]
+assert (violation.trackOne, violation.trackTwo) == (0, 1)
+assert abs(violation.closestDistance - 0.1) < 1e-3
+
+# A large swarm holding on a grid, where checking every pair gets expensive
+rng = np.random.default_rng(5)
+gridPositions = [(x * 0.5 + rng.uniform(-0.2, 0.2), y * 0.5 + rng.uniform(-0.2, 0.2), 1.0) for x in range(0, 10) for y in range(0, 10)]
+compare("100 drones holding on a grid", TrajectoryBatch([decodeTrajectory(encodeHold(position, 20.0)) for position in gridPositions]))
\ No newline at end of file
@@ -0,0 +1,67 @@
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.model import SequenceCache, sequenceFile
+
+"""
+Checks the on-disk sequence cache on a copy of a shipped sequence: a first load misses & a second
+one hits, while touching or editing the sequence, an entry of an older packed format & a damaged
+entry all miss & leave a single fresh entry behind.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+SEQUENCE = 'Five Drone Pyramid.json'
+
+
+def expectLoad(name, cache, file, hit):
+    hits, misses = cache.hits, cache.misses
+    sequence = cache.load(file)
+    assert (cache.hits - hits, cache.misses - misses) == ((1, 0) if hit else (0, 1)), name + ": expected a " + ("hit" if hit else "miss")
+
+    original = sequenceFile.loadJson(file)
+    assert sequence.trackCount == original.trackCount and abs(sequence.duration - original.duration) < 1e-5, name + ": wrong sequence"
+    assert all(bytes(sequence.getTrack(index).trajectory) == bytes(original.getTrack(index).trajectory)
+               for index in range(0, original.trackCount)), name + ": trajectory mismatch"
+
+    entries = os.listdir(cache.directory)
+    assert len(entries) == 1, name + ": expected a single cache entry, found " + str(entries)
+    print("{:<32} {}".format(name, "hit" if hit else "miss"))
+    return os.path.join(cache.directory, entries[0])
+
+
+with tempfile.TemporaryDirectory() as directory:
+    file = os.path.join(directory, SEQUENCE)
+    shutil.copyfile(os.path.join(SEQUENCE_DIRECTORY, SEQUENCE), file)
+    cache = SequenceCache(os.path.join(directory, 'cache'))
+
+    expectLoad("First load", cache, file, hit=False)
+    entry = expectLoad("Second load", cache, file, hit=True)
+    assert "-v" + str(sequenceFile.VERSION) + "-" in os.path.basename(entry), "Entries should be keyed by the format version"
+
+    # A newer modification time invalidates the entry
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    expectLoad("Touched sequence", cache, file, hit=False)
+
+    # So does a different size, even with the modification time kept
+    stat = os.stat(file)
+    with open(file, 'a') as sequence:
+        sequence.write('\n')
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    entry = expectLoad("Edited sequence", cache, file, hit=False)
+    entry = expectLoad("Edited sequence again", cache, file, hit=True)
+
+    # Entries packed by an older version of the format are replaced
+    os.rename(entry, entry.replace("-v" + str(sequenceFile.VERSION) + "-", "-v" + str(sequenceFile.VERSION - 1) + "-"))
+    expectLoad("Older format entry", cache, file, hit=False)
+
+    # A damaged entry is rebuilt
+    entry = expectLoad("Rebuilt entry", cache, file, hit=True)
+    with open(entry, 'r+b') as damaged:
+        damaged.truncate(16)
+    expectLoad("Damaged entry", cache, file, hit=False)
+
+    print("\nHit rate {:.2f} over {} loads".format(cache.hitRate, cache.hits + cache.misses))
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.model import sequenceFile
+
+"""
+Round trip check for the packed sequence format. Converts every shipped JSON sequence,
+loads both versions back and compares them track by track.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+
+
+def compareSequences(original, packed):
+    assert original.drones == packed.drones, "Drone count mismatch"
+    assert abs(original.duration - packed.duration) < 1e-5, "Length mismatch"
+    assert original.trackCount == packed.trackCount, "Track count mismatch"
+    assert all(abs(a - b) < 1e-5 for a, b in zip(original.allPriorities, packed.allPriorities)), "Priority mismatch"
+    assert not packed.tracksLoaded, "Packed tracks should only be loaded on first access"
+
+    for index in range(0, original.trackCount):
+        first = original.getTrack(index)
+        second = packed.getTrack(index)
+        assert first.name == second.name, "Name mismatch on track " + str(index)
+        assert abs(first.length - second.length) < 1e-5, "Track length mismatch on track " + str(index)
+        assert original.getStartingColor(index) == packed.getStartingColor(index), "Start color mismatch on track " + str(index)
+        assert all(abs(a - b) < 1e-5 for a, b in zip(original.getStartingPosition(index), packed.getStartingPosition(index))), \
+            "Start position mismatch on track " + str(index)
+
+        assert isinstance(second.trajectory, memoryview), "Packed trajectory should be a memoryview"
+        assert bytes(first.trajectory) == bytes(second.trajectory), "Trajectory mismatch on track " + str(index)
+        assert bytes(first.ledTimings) == bytes(second.ledTimings), "LED timing mismatch on track " + str(index)
+
+    original.evictTracks()
+    packed.evictTracks()
+    assert not original.tracksLoaded and not packed.tracksLoaded, "Tracks should be evicted"
+
+
+with tempfile.TemporaryDirectory() as outputDirectory:
+    for fileName in sorted(os.listdir(SEQUENCE_DIRECTORY)):
+        if not fileName.endswith('.json'):
+            continue
+
+        jsonFile = os.path.join(SEQUENCE_DIRECTORY, fileName)
+        packedFile = os.path.join(outputDirectory, os.path.splitext(fileName)[0] + sequenceFile.EXTENSION)
+        sequenceFile.convert(jsonFile, packedFile)
+
+        start = time.perf_counter()
+        original = sequenceFile.loadJson(jsonFile)
+        jsonTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        packed = sequenceFile.loadPacked(packedFile)
+        packedTime = time.perf_counter() - start
+
+        compareSequences(original, packed)
+        print("{:<45} json: {:7.2f} ms ({:7d} bytes)   packed: {:5.2f} ms ({:6d} bytes)".format(
+            fileName, jsonTime * 1000, os.path.getsize(jsonFile), packedTime * 1000, os.path.getsize(packedFile)))
+
+        # Drop the references so the mapping is released before the directory is removed
+        del packed
+
+print("\nAll sequences round-tripped successfully")
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import cflib.crtp
+from cflib.crazyflie.mem import MemoryElement
+from application.common import SettingsKey
+from application.controllers.swarmController import SwarmController
+from application.simulation import SimulatedSwarm, SimulatedLinkDriver, LinkModel
+
+"""
+Scans & connects a swarm of virtual drones over lossy simulated links, writes a memory on one of
+them & reads it back, then takes the swarm off & lands it with the broadcasters.
+"""
+
+DRONES = 20
+
+
+class SimulationSettings():
+
+    def getValue(self, key, default=None):
+        values = {
+            SettingsKey.RADIO_CHANNELS: [80, 90],
+            SettingsKey.RADIO_ADDRESSES: ['E7E7E7E700', 'E7E7E7E70F']
+        }
+        return values.get(key, default)
+
+
+cflib.crtp.init_drivers()
+SimulatedSwarm.CURRENT = SimulatedSwarm(DRONES, LinkModel(latency=0.002, loss=0.05))
+SimulatedLinkDriver.register()
+
+swarmController = SwarmController(None, SimulationSettings())
+swarmController.scan()
+assert len(swarmController.availableDrones) == DRONES, "Every virtual drone should be found"
+
+start = time.perf_counter()
+swarmController.connectSwarm(-1)
+print("Connected {} drones in {:.2f}s".format(len(swarmController.connectedDrones), time.perf_counter() - start))
+
+drone = swarmController.connectedDrones[0]
+memory = drone.crazyflie.cf.mem.get_mems(MemoryElement.TYPE_TRAJ)[0]
+data = bytes(range(256)) * 4
+drone.crazyflie.cf.mem.mem_write_cb.add_callback(drone.writeComplete)
+drone.write(lambda: drone.crazyflie.cf.mem.write(memory, 0, data))
+assert drone.readMemory(memory, 0, 20) == data[:20], "Memory should read back what was written"
+print("Memory written & read back")
+
+swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.takeoff(0.5, 1.0))
+time.sleep(1.5)
+heights = swarmController.telemetryStore.latest()[:, 2]
+assert (heights > 0.45).all(), "Every drone should have taken off"
+
+swarmController.broadcast(lambda broadcaster: broadcaster.high_level_commander.land(0.0, 1.0))
+time.sleep(1.5)
+swarmController.disconnectSwarm()
+
+for channel, counters in SimulatedSwarm.CURRENT.counters().items():
+    print("Channel {}: {}".format(channel, counters))
\ No newline at end of file
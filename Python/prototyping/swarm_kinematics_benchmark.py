@@ -0,0 +1,82 @@
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cflib.crtp.crtpstack import CRTPPacket, CRTPPort
+from application.model import sequenceFile
+from application.simulation import SimulatedSwarm, SwarmKinematics
+from application.trajectory import TrajectoryBatch, decodeTrajectory
+
+"""
+Flies 200 virtual drones through the tracks of a shipped sequence. Times a single step of the
+whole swarm against the 10 ms budget of the 100 Hz simulation, checks the playback against the
+planned trajectories & that a go to settles within its duration. Then plays a trajectory written
+to the memory of a simulated firmware, started by a broadcast packet.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+DRONES = 200
+TICKS = 500
+
+sequence = sequenceFile.loadJson(os.path.join(SEQUENCE_DIRECTORY, 'Massive Formation (Intense).json'))
+tracks = [sequence.getTrack(index % sequence.trackCount).trajectory for index in range(0, DRONES)]
+trajectories = [decodeTrajectory(track) for track in tracks]
+
+kinematics = SwarmKinematics()
+for index, trajectory in enumerate(trajectories):
+    kinematics.addDrone(trajectory.start[:3])
+    kinematics.startTrajectory(index, trajectory, 0.0)
+
+# Step through the show faster than real time, the cost per step is the same
+duration = max(trajectory.duration for trajectory in trajectories)
+times = np.linspace(0.0, duration, TICKS)
+start = time.perf_counter()
+for now in times:
+    kinematics.tick(now)
+tickTime = (time.perf_counter() - start) / TICKS
+
+planned = TrajectoryBatch(trajectories).positions(times[-1:])[:, 0]
+error = np.max(np.abs(kinematics.positions - planned))
+print("{} drones: {:.2f} ms per step, {:.0f}% of the 100 Hz budget, playback error {:.2e} m".format(
+    DRONES, tickTime * 1000, tickTime * SwarmKinematics.RATE * 100, error))
+assert tickTime < 1.0 / SwarmKinematics.RATE, "A step should fit in the simulation period"
+assert error < 1e-6, "Playback should follow the planned trajectories"
+
+# Go to settles within its duration
+kinematics = SwarmKinematics()
+kinematics.addDrone((0.0, 0.0, 0.0))
+kinematics.goTo(0, (1.0, 2.0, 1.5), 2.0)
+for tick in range(0, 2 * SwarmKinematics.RATE + 1):
+    kinematics.tick(tick / SwarmKinematics.RATE)
+distance = np.linalg.norm(kinematics.positions[0] - (1.0, 2.0, 1.5))
+print("Go to: {:.3f} m from the target after its duration".format(distance))
+assert distance < 0.1, "A go to should be within the target threshold after its duration"
+
+# A trajectory uploaded to a simulated firmware & started with a broadcast
+swarm = SimulatedSwarm(1)
+firmware = swarm.addDrone(80, 'E7E7E7E701', trajectories[0].start[:3])
+firmware.memories[0][0:len(tracks[0])] = tracks[0]
+
+
+def highLevelPacket(data):
+    packet = CRTPPacket()
+    packet.set_header(CRTPPort.SETPOINT_HL, 0)
+    packet.data = data
+    return packet
+
+
+firmware.receive(highLevelPacket(struct.pack('<BBBBIB', 6, 1, 0, 1, 0, 1)), broadcast=True)
+firmware.receive(highLevelPacket(struct.pack('<BBBBBf', 5, 0, 0, 0, 1, 1.0)), broadcast=True)
+started = time.perf_counter()
+time.sleep(2.0)
+elapsed = time.perf_counter() - started
+
+expected = TrajectoryBatch(trajectories[:1]).positions([elapsed])[0, 0]
+distance = np.linalg.norm(np.array(firmware.position) - expected)
+print("Firmware playback: {:.3f} m from the planned position after {:.1f}s, {} late step(s)".format(distance, elapsed, swarm.lateTicks))
+assert distance < 0.1, "The firmware should play the trajectory from its memory"
+swarm.stop()
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.telemetry.telemetryStore import TelemetryStore, VARIANCE, CHANNEL_COUNT
+
+"""
+Feeds a swarm telemetry store the way a full show would, every drone streaming at 100 Hz, and
+times adding samples & checking the whole swarm for a settled estimator. Checks the running
+statistics & the vectorized convergence check against plain numpy over the stored window.
+"""
+
+DRONES = 100
+RATE = 100
+DURATION = 5.0
+WINDOW = 10
+THRESHOLD = 0.001
+
+random = np.random.default_rng(0)
+store = TelemetryStore(DRONES, WINDOW)
+steps = int(DURATION * RATE)
+
+# Variance decays as the estimators settle, some drones never do
+settled = random.random(DRONES) > 0.1
+samples = random.normal(0.0, 1.0, (steps, DRONES, CHANNEL_COUNT))
+decay = np.exp(-np.arange(0, steps) / RATE * 3.0)[:, np.newaxis, np.newaxis]
+samples[:, :, VARIANCE] = np.abs(samples[:, :, VARIANCE]) * 0.01 * np.where(settled[np.newaxis, :, np.newaxis], decay, 1.0)
+samples[:, :, 2] *= 0.01
+
+addTime = 0.0
+checkTime = 0.0
+for step in range(0, steps):
+    start = time.perf_counter()
+    for drone in range(0, DRONES):
+        store.add(drone, step / RATE, samples[step, drone])
+    addTime += time.perf_counter() - start
+
+    start = time.perf_counter()
+    converged = store.converged(THRESHOLD, 0.25)
+    checkTime += time.perf_counter() - start
+
+window = samples[-WINDOW:].transpose(1, 2, 0)
+assert np.allclose(store.mean(), window.mean(axis=2)), "Running mean is off"
+assert np.allclose(store.std(), window.std(axis=2), atol=1e-6), "Running standard deviation is off"
+expected = np.all(np.ptp(window[:, VARIANCE, :], axis=2) < THRESHOLD, axis=1) & (samples[-1, :, 2] < 0.25)
+assert np.array_equal(converged, expected), "Convergence check disagrees with numpy"
+
+print("{} drones at {} Hz for {:.0f}s, {} samples".format(DRONES, RATE, DURATION, steps * DRONES))
+print("Add: {:.1f} us per sample, {:.1f}% of one core".format(addTime / (steps * DRONES) * 1e6, addTime / DURATION * 100))
+print("Swarm convergence check: {:.1f} us per call".format(checkTime / steps * 1e6))
+print("Converged: {} of {} drones ({} settle)".format(np.sum(converged), DRONES, np.sum(settled)))
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.telemetry import Tracer, tracer
+
+"""
+Traces a made up show: a connect phase & an upload phase for drones on two channels, with one
+slow drone in every phase. Checks that the summary names the slow drone & its channel as the
+critical path, that the Chrome trace has a process per channel & a thread per drone, and that
+tracing without a current tracer does nothing.
+"""
+
+DRONES = 8
+CHANNELS = [20, 80]
+SLOW_DRONE = 5
+
+
+class FakeDrone():
+
+    def __init__(self, index):
+        self.swarmIndex = index
+        self.channel = CHANNELS[index % len(CHANNELS)]
+
+
+def step(drone, name, duration, size=None):
+    with Tracer.span(name, drone=drone, size=size):
+        time.sleep(duration * (3 if drone.swarmIndex == SLOW_DRONE else 1))
+
+
+def runPhase(name, drones, duration, size=None):
+    with Tracer.span(name, tracer.PHASE):
+        threads = [threading.Thread(target=step, args=(drone, name, duration, size)) for drone in drones]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+drones = [FakeDrone(index) for index in range(0, DRONES)]
+
+with Tracer.span("untraced", drone=drones[0]) as span:
+    assert span is None, "Nothing should be traced without a current tracer"
+
+Tracer.CURRENT = Tracer("tracer_test")
+runPhase("connect", drones, 0.02)
+runPhase("upload", drones, 0.01, size=500)
+with Tracer.span("broadcast", tracer.CHANNEL, channel=CHANNELS[0], size=100):
+    pass
+showTracer = Tracer.CURRENT
+Tracer.CURRENT = None
+
+summary = showTracer.summary()
+print(summary)
+for phase in summary.phases:
+    assert phase.criticalDrone == SLOW_DRONE, "The slow drone should be on the critical path of " + phase.name
+    assert phase.criticalChannel == drones[SLOW_DRONE].channel
+    assert phase.criticalFinish > phase.medianFinish
+assert summary.phases[1].size == DRONES * 500
+assert sum(channel.size for channel in summary.channels) == DRONES * 500 + 100
+
+directory = tempfile.mkdtemp()
+with open(showTracer.save(directory), 'r') as traceFile:
+    events = json.load(traceFile)['traceEvents']
+
+spans = [event for event in events if event['ph'] == 'X']
+processes = set(event['args']['name'] for event in events if event['name'] == 'process_name')
+threads = [event for event in events if event['name'] == 'thread_name']
+assert len(spans) == 2 * DRONES + 3
+assert processes == {"Sequence"} | set("Channel " + str(channel) for channel in CHANNELS)
+assert len(threads) == DRONES + 2, "A thread per drone, plus the phases & the broadcast"
+print("\n{} spans written to {}".format(len(spans), directory))
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.model import sequenceFile
+from application.telemetry import FlightRecorder, TelemetrySample, loadRecording, computeTrackingError, flightRecorder
+from application.trajectory import TrajectoryBatch
+
+"""
+Records a fake show & checks the tracking error report against it. Every drone flies its planned
+trajectory with a known lag & some position noise, sampled at the telemetry rate with jitter. The
+report has to find the lags & rank the drone with the worst tracking first.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+DRONES = 50
+RATE = 10
+NOISE = 0.02
+
+random = np.random.default_rng(1)
+fileName = sorted(name for name in os.listdir(SEQUENCE_DIRECTORY) if name.endswith('.json'))[0]
+sequence = sequenceFile.loadJson(os.path.join(SEQUENCE_DIRECTORY, fileName))
+batch = TrajectoryBatch.fromSequence(sequence)
+
+tracks = np.arange(0, DRONES) % batch.droneCount
+lags = np.round(random.uniform(0.0, 0.3, DRONES), 2)
+noise = np.full(DRONES, NOISE)
+noise[7] = 0.2
+
+directory = tempfile.mkdtemp()
+recorder = FlightRecorder(directory)
+path = recorder.start({'sequence': None, 'telemetryPeriodMs': 1000 / RATE, 'drones': [{'index': drone, 'address': None} for drone in range(0, DRONES)]})
+
+# The marker is queued directly, to give it a known time
+start = 1000.0
+recorder.queue.put((start, flightRecorder.MARKER, -1, (flightRecorder.MARKER_TRAJECTORY_START,)))
+for drone in range(0, DRONES):
+    recorder.recordAssignment(drone, int(tracks[drone]))
+
+    single = TrajectoryBatch([batch.trajectories[tracks[drone]]])
+    times = np.arange(-2.0, single.duration + 2.0, 1.0 / RATE) + random.uniform(0.0, 0.01)
+    positions = single.positions(times - lags[drone])[0] + random.normal(0.0, noise[drone], (len(times), 3))
+    for sampleTime, position in zip(times, positions):
+        recorder.recordSample(drone, TelemetrySample(start + sampleTime, tuple(position), (0.0, 0.0, 0.0), 100))
+
+recorder.stop()
+recording = loadRecording(path)
+
+begin = time.perf_counter()
+report = computeTrackingError(recording, batch, rate=RATE)
+elapsed = time.perf_counter() - begin
+
+found = np.array([entry.lag for entry in report.entries])
+print(report)
+print("\n{} drones, {:.0f}s show, analysed in {:.2f}s".format(DRONES, batch.duration, elapsed))
+print("Largest lag error: {:.3f}s".format(np.max(np.abs(found - lags))))
+
+assert report.ranked[0].drone == 7, "Noisiest drone should rank worst"
+assert np.max(np.abs(found - lags)) <= 0.05, "Lag not recovered"
+assert len(report.saveCurves(os.path.join(directory, 'curves'))) == DRONES
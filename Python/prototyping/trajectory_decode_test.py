@@ -0,0 +1,127 @@
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.model import sequenceFile
+from application.trajectory import TrajectoryBatch, decodeTrajectory, encodeHold, trajectoryLength
+
+"""
+Round trip check for the trajectory decoder. Every track of every shipped sequence is read straight
+from its compressed bytes & evaluated with de Casteljau's algorithm on the Bezier control points,
+then compared with the decoded power basis evaluated through TrajectoryBatch, at random times & on
+every segment boundary. Velocities are checked against finite differences of the reference.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+POSITION_TOLERANCE = 1e-9
+VELOCITY_TOLERANCE = 1e-4
+SAMPLES = 500
+STEP = 1e-5
+
+
+def referenceSegments(data):
+    """
+    :return: Start position, a list of (start time, duration, control points per axis) per segment
+    & the length of the data that's flown
+    """
+    buffer = bytes(data)
+    current = np.array(struct.unpack_from('<3h', buffer, 0), dtype=float) * 0.001
+    start = current.copy()
+    offset = 8
+    elapsed = 0.0
+    segments = []
+
+    while offset + 3 <= len(buffer):
+        segmentType, duration = struct.unpack_from('<BH', buffer, offset)
+        if duration == 0:
+            break
+        offset += 3
+
+        curves = []
+        for axis in range(0, 4):
+            count = {0: 0, 1: 1, 2: 3, 3: 7}[(segmentType >> (2 * axis)) & 0x03]
+            points = [float(value) for value in struct.unpack_from('<' + str(count) + 'h', buffer, offset)]
+            offset += 2 * count
+            if axis < 3:
+                points = [current[axis]] + [value * 0.001 for value in points]
+                current[axis] = points[-1]
+                curves.append(points)
+
+        segments.append((elapsed, duration / 1000.0, curves))
+        elapsed += duration / 1000.0
+
+    return start, segments, offset
+
+
+def deCasteljau(points, t):
+    points = list(points)
+    while len(points) > 1:
+        points = [a + (b - a) * t for a, b in zip(points[:-1], points[1:])]
+    return points[0]
+
+
+def referencePosition(start, segments, time):
+    if len(segments) == 0:
+        return start
+
+    for segmentStart, duration, curves in segments:
+        if time <= segmentStart + duration:
+            t = min(max((time - segmentStart) / duration, 0.0), 1.0)
+            return np.array([deCasteljau(points, t) for points in curves])
+    return np.array([points[-1] for points in segments[-1][2]])
+
+
+def checkTrack(name, data):
+    # Data after a zero duration segment is never flown, the decoder has to stop where the firmware does
+    start, segments, length = referenceSegments(data)
+    assert trajectoryLength(data) == length, name + ": trajectory length mismatch"
+    trajectory = decodeTrajectory(data)
+    batch = TrajectoryBatch([trajectory])
+    assert trajectory.segmentCount == len(segments), name + ": segment count mismatch"
+    assert np.allclose(trajectory.start[:3], start), name + ": start mismatch"
+
+    duration = batch.duration
+    boundaries = [segmentStart for segmentStart, _, _ in segments] + [duration]
+    times = np.sort(np.concatenate((generator.uniform(0.0, duration, SAMPLES), boundaries)))
+    times = np.round(times, 6)
+
+    positions, velocities, _ = batch.evaluate(times)
+    expected = np.array([referencePosition(start, segments, time) for time in times])
+    error = np.max(np.abs(positions[0] - expected))
+    assert error < POSITION_TOLERANCE, "{}: position off by {:.2e}m".format(name, error)
+
+    # Central differences inside the trajectory, away from the boundaries where the velocity may jump
+    inside = [time for time in times if all(abs(time - boundary) > 2 * STEP for boundary in boundaries)]
+    differences = np.array([(referencePosition(start, segments, time + STEP) - referencePosition(start, segments, time - STEP)) / (2 * STEP)
+                            for time in inside]).reshape(-1, 3)
+    if len(inside) > 0:
+        _, insideVelocities, _ = batch.evaluate(np.array(inside))
+        error = np.max(np.abs(insideVelocities[0] - differences))
+        assert error < VELOCITY_TOLERANCE, "{}: velocity off by {:.2e}m/s".format(name, error)
+
+    return len(segments)
+
+
+generator = np.random.default_rng(4)
+
+# Holds encode & decode to the same position
+for position, duration in [((0.0, 0.0, 1.0), 5.0), ((-1.5, 2.25, 0.5), 70.0), ((1.0, -1.0, 2.0), 0.5)]:
+    hold = decodeTrajectory(encodeHold(position, duration))
+    positions = TrajectoryBatch([hold]).positions(np.linspace(0.0, duration, 50))
+    assert np.allclose(positions, position, atol=5e-4) and abs(hold.duration - duration) < 1e-3, "Hold round trip failed"
+print("Holds round-tripped")
+
+for fileName in sorted(os.listdir(SEQUENCE_DIRECTORY)):
+    if not fileName.endswith('.json'):
+        continue
+
+    sequence = sequenceFile.loadJson(os.path.join(SEQUENCE_DIRECTORY, fileName))
+    segmentCount = 0
+    for index in range(0, sequence.trackCount):
+        segmentCount += checkTrack("{} track {}".format(fileName, index), sequence.getTrack(index).trajectory)
+    print("{:<45} {:3d} tracks {:6d} segments".format(fileName, sequence.trackCount, segmentCount))
+
+print("\nAll trajectories decoded & evaluated consistently")
\ No newline at end of file
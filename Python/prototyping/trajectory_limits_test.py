@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.constants import Constants
+from application.model import sequenceFile
+from application.trajectory import TrajectoryBatch, checkLimits
+
+"""
+Runs the dynamic limits validator across the whole sequence library. Cross checks the vectorized
+peaks against a plain per-track evaluation, then prints a summary of every sequence.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+
+
+def checkPeaks(batch, report):
+    for index, trajectory in enumerate(batch.trajectories):
+        single = TrajectoryBatch([trajectory])
+        _, velocities, accelerations = single.evaluate(report.times)
+        assert abs(np.max(np.linalg.norm(velocities, axis=2)) - report.peakSpeeds[index]) < 1e-9, \
+            "Peak speed mismatch on track " + str(index)
+        assert abs(np.max(np.linalg.norm(accelerations, axis=2)) - report.peakAccelerations[index]) < 1e-9, \
+            "Peak acceleration mismatch on track " + str(index)
+
+    for violation in report.violations:
+        assert violation.startTime <= violation.endTime, "Invalid interval " + str(violation)
+        assert violation.peak > violation.limit, "Violation below its limit " + str(violation)
+
+
+failures = 0
+for fileName in sorted(os.listdir(SEQUENCE_DIRECTORY)):
+    if not fileName.endswith('.json'):
+        continue
+
+    sequence = sequenceFile.loadJson(os.path.join(SEQUENCE_DIRECTORY, fileName))
+    start = time.perf_counter()
+    batch = TrajectoryBatch.fromSequence(sequence)
+    report = checkLimits(batch, Constants.MAX_TRAJECTORY_SPEED, Constants.MAX_TRAJECTORY_ACCELERATION,
+                         Constants.ARENA_MIN, Constants.ARENA_MAX, Constants.PREFLIGHT_SAMPLE_RATE)
+    elapsed = time.perf_counter() - start
+    checkPeaks(batch, report)
+
+    print("{:<45} {:3d} tracks  speed {:5.2f}m/s  acceleration {:5.2f}m/s²  {:3d} violation(s)  {:6.1f} ms".format(
+        fileName, batch.droneCount, report.peakSpeed, report.peakAcceleration, len(report.violations), elapsed * 1000))
+    for violation in report.violations:
+        print("    " + str(violation))
+
+    if not report.passed:
+        failures += 1
+
+print("\n{} sequence(s) exceed the configured limits".format(failures))
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.constants import Constants
+from application.model import sequenceFile
+from application.planner.assignment import distanceMatrix, linearAssignment
+from application.planner.transition import goToProgress, planTransition
+
+"""
+Compares the transition planner against the old altitude layer staging, for every sequence in the
+library & a few larger synthetic swarms. Drones start hovering on a floor grid, are matched to the
+track start positions, then both plans are replayed on a fine time grid to measure the staging
+time & the closest approach between any two drones. The planner has to leave no conflicts.
+"""
+
+SEQUENCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sequences')
+MAX_VELOCITY = 0.5
+SAFETY_DISTANCE = Constants.TRANSITION_SEPARATION
+GRID_SPACING = 0.5
+REPLAY_STEP = 0.01
+
+# The planner checks moves on a coarser time grid than the replay, so they may dip a little closer
+GRID_TOLERANCE = 0.02
+
+
+def floorGrid(count):
+    columns = int(np.ceil(np.sqrt(count)))
+    indexes = np.arange(0, count)
+    x = (indexes % columns - (columns - 1) / 2.0) * GRID_SPACING
+    y = (indexes // columns - (columns - 1) / 2.0) * GRID_SPACING
+    return np.stack([x, y, np.full(count, Constants.MIN_HEIGHT)], axis=1)
+
+
+def layerPlan(starts, goals):
+    # The staging used so far: higher layers leave first, each layer a quarter of the longest move later
+    travelTimes = np.linalg.norm(goals - starts, axis=1) / MAX_VELOCITY
+    layers = np.round(goals[:, 2] * 10).astype(int)
+    rank = np.searchsorted(np.unique(-layers), -layers)
+    return rank * 0.25 * np.max(travelTimes), travelTimes
+
+
+def replay(starts, goals, delays, travelTimes):
+    end = np.max(delays + travelTimes)
+    times = np.arange(0, end + REPLAY_STEP, REPLAY_STEP)
+    phases = (times[np.newaxis, :] - delays[:, np.newaxis]) / np.maximum(travelTimes, 1e-9)[:, np.newaxis]
+    positions = starts[:, np.newaxis, :] + (goals - starts)[:, np.newaxis, :] * goToProgress(phases)[..., np.newaxis]
+
+    # Pairs that are already too close at their starts or goals are left out
+    inherent = np.minimum(distanceMatrix(starts, starts), distanceMatrix(goals, goals)) < SAFETY_DISTANCE
+    closest = np.inf
+    for index in range(0, len(starts)):
+        others = np.flatnonzero(~inherent[index, index + 1:]) + index + 1
+        if len(others) > 0:
+            distances = np.linalg.norm(positions[others] - positions[index], axis=2)
+            closest = min(closest, float(distances.min()))
+    return end, closest
+
+
+def compare(name, starts, goals):
+    _, columns = linearAssignment(distanceMatrix(starts, goals))
+    goals = goals[columns]
+
+    layerDelays, layerTimes = layerPlan(starts, goals)
+    layerDuration, layerClosest = replay(starts, goals, layerDelays, layerTimes)
+
+    plan = planTransition(starts, goals, MAX_VELOCITY, SAFETY_DISTANCE)
+    planDuration, planClosest = replay(starts, goals[plan.goalIndexes], plan.delays, plan.travelTimes)
+    assert len(plan.conflicts) == 0, name + ": planner left conflicts " + str(plan.conflicts)
+    assert planClosest >= SAFETY_DISTANCE - GRID_TOLERANCE, name + ": drones pass {:.2f}m apart".format(planClosest)
+    assert sorted(plan.goalIndexes) == list(range(0, len(goals))), name + ": goals were lost while trading"
+
+    print("{:<42} {:4d}   layers {:6.2f}s {:5.2f}m   planner {:6.2f}s {:5.2f}m {:3d} conflict(s) {:8.1f} ms".format(
+        name, len(starts), layerDuration, layerClosest, planDuration, planClosest, len(plan.conflicts), plan.elapsed * 1000))
+
+
+print("{:<42} {:>4}   {:>22}   {:>22}".format("", "", "staging time & closest", "staging time & closest"))
+for fileName in sorted(os.listdir(SEQUENCE_DIRECTORY)):
+    if fileName.endswith('.json'):
+        sequence = sequenceFile.loadJson(os.path.join(SEQUENCE_DIRECTORY, fileName))
+        goals = np.array(sequence.allStartingPositions, dtype=float)
+        compare(fileName, floorGrid(len(goals)), goals)
+
+generator = np.random.default_rng(7)
+for count in [50, 100, 200]:
+    side = np.sqrt(count) * 0.45
+    goals = np.stack([
+        generator.uniform(-side / 2, side / 2, count),
+        generator.uniform(-side / 2, side / 2, count),
+        generator.uniform(1.0, 2.5, count)
+    ], axis=1)
+    compare("Random formation", floorGrid(count), goals)
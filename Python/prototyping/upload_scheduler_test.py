@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from application.controllers.uploadScheduler import UploadScheduler
+
+"""
+Runs the upload scheduler against fake drones spread unevenly over three radio channels. Every
+channel is a shared medium that moves one packet at a time, so the whole upload can't finish
+before the busiest channel has sent all of its data. Checks that no drone runs two uploads at
+once, that the per channel cap holds, and compares the total time against the busiest channel.
+"""
+
+PACKET_SIZE = 25
+PACKET_TIME = 0.0005
+PER_CHANNEL = 4
+CHANNEL_SIZES = {20: 25, 40: 15, 80: 10}
+
+
+class FakeDrone():
+
+    def __init__(self, address):
+        self.address = address
+        self.uploading = False
+
+
+class FakeRadio():
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.packets = 0
+
+    def transfer(self, drone, size):
+        assert not drone.uploading, "Drone " + drone.address + " is running two uploads at once"
+        drone.uploading = True
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+        for _ in range(0, (size + PACKET_SIZE - 1) // PACKET_SIZE):
+            with self.lock:
+                time.sleep(PACKET_TIME)
+                self.packets += 1
+
+        with self.lock:
+            self.active -= 1
+        drone.uploading = False
+
+
+radios = {channel: FakeRadio() for channel in CHANNEL_SIZES}
+scheduler = UploadScheduler(PER_CHANNEL)
+
+for channel, count in CHANNEL_SIZES.items():
+    for index in range(0, count):
+        drone = FakeDrone("radio://0/{}/2M/E7E7E7E7{:02X}".format(channel, index))
+        radio = radios[channel]
+        scheduler.add(drone, "trajectory", lambda drone=drone, radio=radio: radio.transfer(drone, 500), 500)
+        scheduler.add(drone, "ledTimings", lambda drone=drone, radio=radio: radio.transfer(drone, 600), 600)
+
+start = time.time()
+reports = scheduler.run()
+elapsed = time.time() - start
+
+for report in reports:
+    radio = radios[report.channel]
+    assert radio.peak <= PER_CHANNEL, "Channel {} had {} uploads in flight".format(report.channel, radio.peak)
+    print(str(report) + ", peak {} in flight, {} packets".format(radio.peak, radio.packets))
+
+busiest = max(radio.packets for radio in radios.values()) * PACKET_TIME
+print("\nTotal {:.2f}s, busiest channel needs at least {:.2f}s".format(elapsed, busiest))
@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import cflib.crtp
+from cflib.crazyflie.mem import MemoryElement
+from cflib.crtp.crtpstack import CRTPPort
+from application.common import SettingsKey
+from application.controllers.swarmController import SwarmController
+from application.simulation import SimulatedSwarm, SimulatedLinkDriver, LinkModel
+from application.simulation.simulatedFirmware import MEMORY_READ_CHANNEL, MEMORY_TRAJECTORY, SimulatedFirmware
+from application.trajectory import encodeHold
+
+"""
+Uploads flight data to a virtual drone the way a show does, checking that unchanged data is
+skipped, while changed data & data the drone lost, e.g. to a reboot, are written again. Also
+checks that a memory read that times out doesn't block later reads of the memory.
+"""
+
+
+class SimulationSettings():
+
+    def getValue(self, key, default=None):
+        values = {
+            SettingsKey.RADIO_CHANNELS: [80],
+            SettingsKey.RADIO_ADDRESSES: ['E7E7E7E700', 'E7E7E7E700']
+        }
+        return values.get(key, default)
+
+
+def expectUpload(name, upload, written, skipped):
+    registry = swarmController.uploadRegistry
+    before = (registry.written, registry.skipped)
+    upload()
+    change = (registry.written - before[0], registry.skipped - before[1])
+    assert change == (written, skipped), "{}: expected {} written & {} skipped, got {} & {}".format(name, written, skipped, *change)
+    print("{}: {} written, {} skipped".format(name, *change))
+
+
+def trajectoryMemory(firmware):
+    memoryId = next(ident for ident, memoryType, _ in SimulatedFirmware.MEMORIES if memoryType == MEMORY_TRAJECTORY)
+    return firmware.memories[memoryId]
+
+
+cflib.crtp.init_drivers()
+swarm = SimulatedSwarm(1, LinkModel(latency=0.002))
+SimulatedSwarm.CURRENT = swarm
+SimulatedLinkDriver.register()
+
+swarmController = SwarmController(None, SimulationSettings())
+swarmController.scan()
+swarmController.connectSwarm(-1)
+drone = swarmController.connectedDrones[0]
+firmware = swarm.firmware(drone.address)
+
+trajectory = encodeHold((0.0, 0.0, 1.0), 5.0)
+otherTrajectory = encodeHold((0.5, 0.0, 1.0), 5.0)
+ledTimings = bytes(range(0, 40))
+
+expectUpload("New trajectory", lambda: drone.writeTrajectory(trajectory), 1, 0)
+expectUpload("Same trajectory", lambda: drone.writeTrajectory(trajectory), 0, 1)
+expectUpload("Changed trajectory", lambda: drone.writeTrajectory(otherTrajectory), 1, 0)
+
+# The drone forgets its memory contents when it reboots, the read back has to catch that
+memory = trajectoryMemory(firmware)
+memory[:] = bytes(len(memory))
+expectUpload("Trajectory after a reboot", lambda: drone.writeTrajectory(otherTrajectory), 1, 0)
+assert bytes(memory[:len(otherTrajectory)]) == bytes(otherTrajectory), "The trajectory should be written again"
+
+expectUpload("New LED timings", lambda: drone.writeLedTimings(ledTimings), 1, 0)
+expectUpload("Same LED timings", lambda: drone.writeLedTimings(ledTimings), 0, 1)
+
+# A read the drone never answers times out, after which the memory can be read again
+receive = firmware.receive
+firmware.receive = lambda packet, broadcast=False: None if (packet.port, packet.channel) == (CRTPPort.MEM, MEMORY_READ_CHANNEL) \
+    else receive(packet, broadcast)
+cfMemory = drone.crazyflie.cf.mem.get_mems(MemoryElement.TYPE_TRAJ)[0]
+assert drone.readMemory(cfMemory, 0, 20) is None, "An unanswered read should time out"
+firmware.receive = receive
+assert drone.readMemory(cfMemory, 0, 20) == bytes(memory[:20]), "The memory should be readable after a timed out read"
+print("Timed out read: memory readable again")
+
+swarmController.disconnectSwarm()
+swarm.stop()
\ No newline at end of file